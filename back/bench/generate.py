@@ -0,0 +1,160 @@
+# back/bench/generate.py
+"""
+Generador de datos sintéticos: N familias con sus 8 seguimientos, datos que
+pasan la validación de SeguimientoData, comentarios e imágenes de varios
+tamaños. Escribe con el backend configurado (STORAGE_BACKEND, por defecto la
+carpeta documents/) y regenera el catálogo y los índices al terminar.
+
+Se ejecuta desde back/src (las rutas relativas de la aplicación parten de ahí):
+
+    python ../bench/generate.py --familias 200 --asesores 5
+"""
+import argparse
+import io
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from PIL import Image, ImageDraw
+
+from routes.documents import serialize_seguimiento
+from storage import storage, MAX_SEGUIMIENTOS
+from utils import aggregates, catalog, compromisos, search
+
+DIMENSIONES = ("Salud", "Educación", "Habitabilidad", "Ingresos", "Trabajo", "Dinámica familiar", "Identificación")
+APELLIDOS = ("Pérez", "Gómez", "Rodríguez", "Martínez", "López", "Muñoz", "Díaz", "Torres", "Ramírez", "Castaño")
+NOMBRES = ("María", "José", "Ana", "Luis", "Carmen", "Jorge", "Lucía", "Andrés", "Sofía", "Camilo")
+ROLES = ("Madre", "Padre", "Hijo", "Hija", "Abuela", "Tío", "Cuidadora")
+PALABRAS = (
+    "familia", "acompañamiento", "educación", "asistencia", "escolar", "convivencia", "acuerdo", "salud",
+    "vivienda", "ingresos", "empleo", "proyecto", "comunidad", "avance", "seguimiento", "compromiso",
+    "orientación", "autonomía", "red", "apoyo", "capacitación", "emprendimiento", "cuidado", "nutrición",
+)
+# (ancho, alto): de una foto de móvil reducida a una a resolución completa
+IMAGE_SIZES = ((320, 240), (800, 600), (1600, 1200), (3000, 2000))
+
+
+def _texto(rng: random.Random, palabras: int) -> str:
+    frase = " ".join(rng.choice(PALABRAS) for _ in range(palabras))
+    return frase.capitalize() + "."
+
+
+def seguimiento_payload(rng: random.Random, numero: int) -> Dict:
+    """ Datos de un seguimiento como los envía el formulario """
+    hoy = date.today()
+    return {
+        "dimensiones": rng.sample(DIMENSIONES, rng.randint(1, 4)),
+        "fecha": (hoy - timedelta(days=(MAX_SEGUIMIENTOS - numero) * 30)).isoformat(),
+        "hora": f"{rng.randint(8, 17):02d}:{rng.choice((0, 15, 30, 45)):02d}",
+        "objetivo": _texto(rng, rng.randint(10, 40)),
+        "aspectos": _texto(rng, rng.randint(20, 120)),
+        "avances": _texto(rng, rng.randint(20, 120)),
+        "retos": _texto(rng, rng.randint(10, 80)),
+        "oportunidades": _texto(rng, rng.randint(10, 80)),
+        "compromisos": [
+            {
+                "descripcion": _texto(rng, rng.randint(5, 20)),
+                "fecha_cumplimiento": (hoy + timedelta(days=rng.randint(-60, 60))).isoformat(),
+                "responsable": rng.choice(NOMBRES)
+            }
+            for _ in range(rng.randint(0, 6))
+        ],
+        "participantes": [
+            {"nombre": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}", "rol": rng.choice(ROLES)}
+            for _ in range(rng.randint(1, 5))
+        ]
+    }
+
+
+def image_pool(rng: random.Random) -> List[bytes]:
+    """ Un JPEG por tamaño, con ruido suficiente para que pesen como fotos """
+    pool = []
+    for width, height in IMAGE_SIZES:
+        image = Image.effect_noise((width, height), 64).convert("RGB")
+        draw = ImageDraw.Draw(image)
+        for _ in range(20):
+            x, y = rng.randrange(width), rng.randrange(height)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.rectangle((x, y, x + width // 5, y + height // 5), fill=color)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85)
+        pool.append(buffer.getvalue())
+    return pool
+
+
+def generate(
+    familias: int,
+    asesores: int = 5,
+    seguimientos: int = MAX_SEGUIMIENTOS,
+    comentarios: int = 3,
+    imagenes: int = 2,
+    seed: int = 1
+) -> Dict[str, int]:
+    """
+    Crea las familias con el backend de almacenamiento y regenera los índices
+
+    Args:
+        familias: número de familias
+        asesores: se reparten entre asesor_1 .. asesor_N
+        seguimientos: seguimientos con datos por familia (los primeros)
+        comentarios: máximo de comentarios por seguimiento
+        imagenes: máximo de imágenes por seguimiento
+
+    Returns:
+        Totales generados
+    """
+    rng = random.Random(seed)
+    backend = storage.backend
+    pool = image_pool(rng)
+    totals = {"familias": 0, "seguimientos": 0, "comentarios": 0, "imagenes": 0}
+
+    for i in range(familias):
+        adviser = f"asesor_{i % asesores + 1}"
+        doc_number = str(10_000_000 + i)
+        folder = f"documento_{doc_number}_{adviser}"
+        if backend.family_exists(folder):
+            continue
+        backend.create_family(folder, {
+            "apellido": rng.choice(APELLIDOS), "doc_number": doc_number, "creado_por": adviser
+        })
+        totals["familias"] += 1
+
+        for numero in range(1, seguimientos + 1):
+            seguimiento = f"seguimiento_{numero}"
+            data = seguimiento_payload(rng, numero)
+            backend.save_seguimiento(folder, seguimiento, data, serialize_seguimiento(data))
+            totals["seguimientos"] += 1
+            for _ in range(rng.randint(0, comentarios)):
+                backend.add_comment(folder, seguimiento, {
+                    "fecha": f"{data['fecha']}T{data['hora']}:00", "usuario": adviser, "comentario": _texto(rng, 12)
+                })
+                totals["comentarios"] += 1
+            for k in range(rng.randint(0, imagenes)):
+                backend.save_image(folder, seguimiento, f"foto_{k + 1}.jpg", io.BytesIO(rng.choice(pool)))
+                totals["imagenes"] += 1
+
+    catalog.rebuild()
+    search.rebuild()
+    aggregates.rebuild()
+    compromisos.rebuild()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de seguimientos")
+    parser.add_argument("--familias", type=int, default=100)
+    parser.add_argument("--asesores", type=int, default=5)
+    parser.add_argument("--seguimientos", type=int, default=MAX_SEGUIMIENTOS)
+    parser.add_argument("--comentarios", type=int, default=3, help="máximo por seguimiento")
+    parser.add_argument("--imagenes", type=int, default=2, help="máximo por seguimiento")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = generate(args.familias, args.asesores, args.seguimientos, args.comentarios, args.imagenes, args.seed)
+    print(", ".join(f"{value} {key}" for key, value in totals.items()), f"en {time.perf_counter() - start:.1f} s")
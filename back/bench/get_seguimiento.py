@@ -0,0 +1,118 @@
+# back/bench/get_seguimiento.py
+"""
+Coste de CPU por petición de get-seguimiento: ruta anterior (json.load,
+modelos Pydantic construidos a mano y serialización de FastAPI) frente a la
+respuesta serializada al guardar (leer bytes y anteponer numero e imagenes).
+
+Se ejecuta desde back/src:
+
+    python ../bench/get_seguimiento.py --iteraciones 2000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models.seguimiento import SeguimientoResponse, Compromiso, Participante
+from routes.documents import serialize_seguimiento, seguimiento_response_bytes
+from storage import FileSystemBackend
+
+FOLDER = "documento_bench_asesor"
+SEGUIMIENTO = "seguimiento_3"
+TEXTO = "La familia avanza en los acuerdos de convivencia y en la asistencia escolar de los hijos. " * 6
+
+
+def sample_data(compromisos: int, participantes: int) -> dict:
+    return {
+        "dimensiones": ["Salud", "Educación", "Habitabilidad", "Ingresos"],
+        "fecha": "2025-03-14",
+        "hora": "10:30",
+        "objetivo": TEXTO,
+        "aspectos": TEXTO,
+        "avances": TEXTO,
+        "retos": TEXTO,
+        "oportunidades": TEXTO,
+        "compromisos": [
+            {"descripcion": f"Compromiso {i}: {TEXTO[:120]}", "fecha_cumplimiento": "2025-04-01",
+             "responsable": f"Responsable {i}"}
+            for i in range(compromisos)
+        ],
+        "participantes": [{"nombre": f"Participante {i}", "rol": "Madre"} for i in range(participantes)],
+    }
+
+
+def old_path(backend: FileSystemBackend, imagenes: list) -> bytes:
+    """ Lo que hacía get_seguimiento antes de guardar la respuesta serializada """
+    seguimiento_data = backend.load_seguimiento(FOLDER, SEGUIMIENTO)
+    compromisos = [
+        Compromiso(descripcion=c["descripcion"], fecha_cumplimiento=c["fecha_cumplimiento"],
+                   responsable=c["responsable"])
+        for c in seguimiento_data.get("compromisos", [])
+    ]
+    participantes = [Participante(nombre=p["nombre"], rol=p["rol"]) for p in seguimiento_data.get("participantes", [])]
+    result = SeguimientoResponse(
+        numero=SEGUIMIENTO.replace("seguimiento_", ""),
+        imagenes=imagenes,
+        dimensiones=seguimiento_data.get("dimensiones", []),
+        fecha=seguimiento_data.get("fecha"),
+        hora=seguimiento_data.get("hora"),
+        objetivo=seguimiento_data.get("objetivo"),
+        aspectos=seguimiento_data.get("aspectos"),
+        avances=seguimiento_data.get("avances"),
+        retos=seguimiento_data.get("retos"),
+        oportunidades=seguimiento_data.get("oportunidades"),
+        compromisos=compromisos,
+        participantes=participantes
+    )
+    # FastAPI con response_model: valida de nuevo, pasa a tipos JSON y serializa
+    validated = SeguimientoResponse.model_validate(result.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def new_path(backend: FileSystemBackend, imagenes: list) -> bytes:
+    body = backend.load_seguimiento_response(FOLDER, SEGUIMIENTO)
+    return seguimiento_response_bytes(SEGUIMIENTO.replace("seguimiento_", ""), imagenes, body)
+
+
+def measure(func, backend, imagenes, iteraciones: int) -> float:
+    """ Microsegundos de CPU por llamada """
+    for _ in range(min(100, iteraciones)):
+        func(backend, imagenes)
+    start = time.process_time()
+    for _ in range(iteraciones):
+        func(backend, imagenes)
+    return (time.process_time() - start) / iteraciones * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de get-seguimiento")
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    parser.add_argument("--compromisos", type=int, default=10)
+    parser.add_argument("--participantes", type=int, default=6)
+    parser.add_argument("--imagenes", type=int, default=5)
+    args = parser.parse_args()
+
+    backend = FileSystemBackend(tempfile.mkdtemp(prefix="bench_seguimiento_"))
+    backend.create_family(FOLDER, {"apellido": "Bench", "doc_number": "bench", "creado_por": "asesor"})
+    data = sample_data(args.compromisos, args.participantes)
+    backend.save_seguimiento(FOLDER, SEGUIMIENTO, data, serialize_seguimiento(data))
+    imagenes = [f"foto_{i}.jpg" for i in range(args.imagenes)]
+
+    assert json.loads(old_path(backend, imagenes)) == json.loads(new_path(backend, imagenes))
+
+    old_us = measure(old_path, backend, imagenes, args.iteraciones)
+    new_us = measure(new_path, backend, imagenes, args.iteraciones)
+    print(f"Ruta anterior:         {old_us:8.1f} µs de CPU por petición")
+    print(f"Respuesta serializada: {new_us:8.1f} µs de CPU por petición")
+    print(f"Reducción:             {(1 - new_us / old_us) * 100:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# back/bench/harness.py
+"""
+Benchmark de extremo a extremo de la API de seguimientos.
+
+Para cada tamaño de datos crea un entorno aislado en una carpeta temporal
+(documents/, catalog.db, caché de PDFs...), lo llena con generate.py y lanza
+contra la `app` de main.py, en el mismo proceso (httpx.ASGITransport, sin
+red), los escenarios: dashboard, get_seguimiento, save_seguimiento,
+upload_file, get_image y download_pdf. Informa del rendimiento (peticiones/s)
+y de los percentiles de latencia. La cola de los pools de procesos se
+amplía hasta la concurrencia del benchmark; si aun así responden 503
+(contrapresión), se cuentan aparte de los errores.
+
+Los resultados se pueden guardar como línea base y comparar después; una
+comparación con regresiones termina con código 1:
+
+    python back/bench/harness.py --sizes 50,200 --save-baseline local
+    python back/bench/harness.py --sizes 50,200 --compare local
+
+Requiere las dependencias de requirements-dev.txt.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+FRONT_DIR = BENCH_DIR.parents[1] / "front"
+BASELINES_DIR = BENCH_DIR / "baselines"
+
+SCENARIOS = ("dashboard", "get_seguimiento", "save_seguimiento", "upload_file", "get_image", "download_pdf")
+COOKIES = {"auth": "true", "user": "bench", "role": "superadmin", "name": "Benchmark"}
+# Métricas que se comparan con la línea base: (clave, True si más es mejor)
+COMPARED_METRICS = (("rps", True), ("p50_ms", False), ("p99_ms", False))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """ Percentil por rango más cercano de una lista ordenada """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+async def _measure(send: Callable, requests: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = rejected = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors, rejected
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - start)
+            # 503: el pool de procesos rechazó la petición por estar lleno (contrapresión)
+            if response.status_code == 503:
+                rejected += 1
+            elif response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rejected": rejected,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(_percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0
+    }
+
+
+async def run_suite(requests: int, concurrency: int, seed: int, scenarios=SCENARIOS) -> Dict[str, Dict]:
+    """ Lanza los escenarios contra la aplicación (ya con datos generados) """
+    import httpx
+
+    import main
+    from generate import image_pool, seguimiento_payload
+    from storage import storage
+    from utils.process_pool import pdf_pool, image_pool as thumbnails_pool
+
+    rng = random.Random(seed)
+    backend = storage.backend
+    folders = sorted(backend.list_families())
+    targets = [(folder, seguimiento) for folder in folders for seguimiento in backend.seguimientos_with_data(folder)]
+    images = [
+        (folder, seguimiento, name)
+        for folder, seguimiento in rng.sample(targets, min(len(targets), 200))
+        for name in backend.list_images(folder, seguimiento)
+    ]
+    upload = image_pool(rng)[0]
+
+    def target(i: int):
+        return targets[(i * 7919) % len(targets)]
+
+    def family_url(folder: str, seguimiento: str) -> str:
+        # Las rutas de subida reciben "{doc_number}_{user}" y el número de seguimiento
+        return f"{folder.replace('documento_', '', 1)}/{seguimiento.replace('seguimiento_', '')}"
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=COOKIES) as client:
+        senders = {
+            "dashboard": lambda i: client.get("/seguimientos/dashboard"),
+            "get_seguimiento": lambda i: client.get("/seguimientos/get-seguimiento/{}/{}".format(*target(i))),
+            "save_seguimiento": lambda i: client.post(
+                "/seguimientos/save-seguimiento/{}/{}".format(*target(i)),
+                json=seguimiento_payload(rng, int(target(i)[1].replace("seguimiento_", "")))
+            ),
+            "upload_file": lambda i: client.post(
+                f"/seguimientos/upload-file/{family_url(*target(i))}",
+                files={"files": (f"bench_{i}.jpg", io.BytesIO(upload), "image/jpeg")}
+            ),
+            "get_image": lambda i: client.get(
+                "/seguimientos/image/{}/{}/{}".format(*images[i % len(images)]), params={"w": 256}
+            ),
+            "download_pdf": lambda i: client.get("/seguimientos/download-pdf/{}/{}".format(*target(i))),
+        }
+        results = {}
+        for name in scenarios:
+            if not targets or (name == "get_image" and not images):
+                continue
+            # Calentamiento: plantillas, cachés y procesos de trabajo
+            await _measure(senders[name], min(requests, 5), 1)
+            results[name] = await _measure(senders[name], requests, concurrency)
+
+    pdf_pool.shutdown()
+    thumbnails_pool.shutdown()
+    return results
+
+
+def _sandbox(root: Path) -> Path:
+    """ Carpeta de trabajo con la misma estructura relativa que back/src (../../front) """
+    (root / "front").symlink_to(FRONT_DIR, target_is_directory=True)
+    workdir = root / "back" / "src"
+    workdir.mkdir(parents=True)
+    return workdir
+
+
+def run_size(familias: int, args) -> Dict:
+    """ Genera un entorno con `familias` familias y mide en un proceso nuevo """
+    with tempfile.TemporaryDirectory(prefix="bench_seguimientos_") as tmp:
+        workdir = _sandbox(Path(tmp))
+        output = Path(tmp) / "resultados.json"
+        env = {**os.environ, "PYTHONPATH": str(SRC_DIR), "STORAGE_BACKEND": args.backend}
+        # Que la cola de los pools admita toda la concurrencia: se mide rendimiento, no rechazos
+        for pool in ("PDF_POOL", "IMAGE_POOL"):
+            env.setdefault(f"{pool}_MAX_PENDING", str(args.concurrency))
+        command = [
+            sys.executable, str(Path(__file__).resolve()), "--worker",
+            "--familias", str(familias), "--requests", str(args.requests),
+            "--concurrency", str(args.concurrency), "--seed", str(args.seed), "--output", str(output)
+        ]
+        subprocess.run(command, cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+        return json.loads(output.read_text(encoding="utf-8"))
+
+
+def _worker(args):
+    sys.path.insert(0, str(SRC_DIR))
+    from generate import generate
+
+    start = time.perf_counter()
+    totals = generate(args.familias, seed=args.seed)
+    generated = time.perf_counter() - start
+    results = asyncio.run(run_suite(args.requests, args.concurrency, args.seed))
+    Path(args.output).write_text(
+        json.dumps({"datos": totals, "generado_s": round(generated, 1), "escenarios": results}),
+        encoding="utf-8"
+    )
+
+
+def print_report(results: Dict[str, Dict]):
+    print(
+        f"{'familias':>8}  {'escenario':<18}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        f"{'errores':>9}{'503':>6}"
+    )
+    for size, result in results.items():
+        for name, metrics in result["escenarios"].items():
+            print(
+                f"{size:>8}  {name:<18}{metrics['rps']:>9}{metrics['p50_ms']:>9}{metrics['p90_ms']:>9}"
+                f"{metrics['p99_ms']:>9}{metrics['max_ms']:>9}{metrics['errors']:>9}{metrics['rejected']:>6}"
+            )
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, threshold: float) -> List[str]:
+    """ Regresiones mayores que `threshold` (fracción) respecto a la línea base """
+    regressions = []
+    for size, result in results.items():
+        base_result = baseline["resultados"].get(size)
+        if base_result is None:
+            continue
+        for name, metrics in result["escenarios"].items():
+            base_metrics = base_result["escenarios"].get(name)
+            if base_metrics is None:
+                continue
+            for key, higher_is_better in COMPARED_METRICS:
+                old, new = base_metrics[key], metrics[key]
+                if not old:
+                    continue
+                change = (new - old) / old
+                if (-change if higher_is_better else change) > threshold:
+                    regressions.append(f"{size} familias, {name}: {key} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo de la API de seguimientos")
+    parser.add_argument("--sizes", default="20,100", help="tamaños de datos (familias), separados por comas")
+    parser.add_argument("--requests", type=int, default=100, help="peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--backend", default="filesystem", choices=["filesystem", "memory", "sqlite"])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="NOMBRE", help="guardar en baselines/NOMBRE.json")
+    parser.add_argument("--compare", metavar="NOMBRE", help="comparar con baselines/NOMBRE.json")
+    parser.add_argument("--threshold", type=float, default=0.2, help="regresión tolerada (0.2 = 20 %%)")
+    # Uso interno: un tamaño de datos en su propio proceso
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--familias", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    results = {}
+    for size in (int(value) for value in args.sizes.split(",")):
+        print(f"Midiendo con {size} familias...", file=sys.stderr)
+        results[str(size)] = run_size(size, args)
+    print_report(results)
+
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        path = BASELINES_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps({
+            "meta": {
+                "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "cpus": os.cpu_count(),
+                "backend": args.backend,
+                "requests": args.requests,
+                "concurrency": args.concurrency
+            },
+            "resultados": results
+        }, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Línea base guardada en {path}")
+
+    if args.compare:
+        baseline = json.loads((BASELINES_DIR / f"{args.compare}.json").read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Regresiones respecto a la línea base:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Sin regresiones respecto a la línea base")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,15 +26,34 @@
 # app.include_router(documents.router)
 # app.include_router(files.router)
 
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 
-from routes import auth, dashboard, documents, files
+from routes import auth, dashboard, documents, export, files, metrics, pdf_jobs
+from utils.process_pool import pdf_pool, image_pool
+from utils import aggregates, catalog, compromisos, papelera, search
+from utils.metrics import MetricsMiddleware
+from utils.profiling import ProfilingMiddleware
 
-app = FastAPI(title="Sistema de Gestión de Documentos")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Catálogo e índices listos (y regenerados si son nuevos) antes de atender peticiones
+    for index in (catalog, search, aggregates, compromisos):
+        await asyncio.to_thread(index.init)
+    # Purga de la papelera en segundo plano
+    reaper = asyncio.create_task(papelera.reaper())
+    yield
+    reaper.cancel()
+    # Cerrar los procesos de trabajo al apagar el servidor
+    pdf_pool.shutdown()
+    image_pool.shutdown()
+
+app = FastAPI(title="Sistema de Gestión de Documentos", lifespan=lifespan)
 
 # Middleware
 app.add_middleware(
@@ -43,6 +62,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+# Perfiles por muestreo bajo demanda (cabecera X-Profile o PROFILE_SLOW_MS)
+app.add_middleware(ProfilingMiddleware)
+# Latencia, tamaño y estado de cada petición (se exponen en /seguimientos/metrics)
+app.add_middleware(MetricsMiddleware)
 
 # Crear router principal con prefijo
 main_router = APIRouter(prefix="/seguimientos")
@@ -52,10 +75,14 @@ main_router.include_router(auth.router)
 main_router.include_router(dashboard.router)
 main_router.include_router(documents.router)
 main_router.include_router(files.router)
+main_router.include_router(pdf_jobs.router)
+main_router.include_router(export.router)
+main_router.include_router(metrics.router)
 
 # Montar la aplicación principal
 app.include_router(main_router)
 
 # Montar archivos estáticos (también bajo /seguimientos)
 app.mount("/seguimientos/static", StaticFiles(directory="../../front/static"), name="static")
-app.mount("/seguimientos/documents", StaticFiles(directory="documents"), name="documents")
\ No newline at end of file
+# documents/ ya no se monta: las carpetas están repartidas por hash y las
+# URLs antiguas de imágenes se resuelven en routes/files.py
\ No newline at end of file
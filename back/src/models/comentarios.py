@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ComentarioEntry(BaseModel):
+    fecha: str
+    usuario: Optional[str] = None
+    comentario: str
+
+class ComentariosPage(BaseModel):
+    comentarios: List[ComentarioEntry] = []
+    next_cursor: Optional[str] = None
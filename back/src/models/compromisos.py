@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class CompromisoIndexado(BaseModel):
+    folder: str
+    doc_number: str
+    doc_adviser: str
+    seguimiento: str
+    numero: str
+    descripcion: str
+    responsable: str
+    fecha_cumplimiento: str
+
+class CompromisosPage(BaseModel):
+    compromisos: List[CompromisoIndexado] = []
+    next_cursor: Optional[str] = None
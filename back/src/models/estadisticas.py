@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List
+
+class AsesorStats(BaseModel):
+    adviser: str
+    familias: int
+    enviados: int
+    tasa_completado: float
+
+class EmbudoPaso(BaseModel):
+    numero: str
+    enviados: int
+
+class ConteoItem(BaseModel):
+    clave: str
+    etiqueta: str
+    total: int
+
+class EstadisticasPrograma(BaseModel):
+    asesores: List[AsesorStats] = []
+    embudo: List[EmbudoPaso] = []
+    dimensiones: List[ConteoItem] = []
+    responsables: List[ConteoItem] = []
+    actualizado: int = 0
@@ -0,0 +1,45 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from models.imagenes import ImagenInfo
+from models.seguimiento import SeguimientoResponse
+
+class SeguimientoEstado(BaseModel):
+    id: str
+    numero: str
+    enviado: bool
+
+class FamiliaResumen(BaseModel):
+    folder: str
+    doc_adviser: str
+    doc_number: str
+    apellido: str
+    completados: int
+    seguimientos: List[SeguimientoEstado] = []
+
+class FamiliasPage(BaseModel):
+    familias: List[FamiliaResumen] = []
+    next_cursor: Optional[str] = None
+
+class BusquedaHit(BaseModel):
+    folder: str
+    doc_number: str
+    doc_adviser: str
+    apellido: str
+    seguimiento: str
+    numero: str
+    score: float
+
+class BusquedaResult(BaseModel):
+    query: str
+    hits: List[BusquedaHit] = []
+
+class SeguimientoFamilia(BaseModel):
+    numero: int
+    enviado: bool
+    comentarios: int
+    imagenes: List[ImagenInfo] = []
+    datos: SeguimientoResponse
+
+class FamiliaCompleta(BaseModel):
+    folder: str
+    seguimientos: List[SeguimientoFamilia] = []
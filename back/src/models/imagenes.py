@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ImagenInfo(BaseModel):
+    name: str
+    size: int
+    version: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    sha256: Optional[str] = None
+    url: str
+    thumbnail_url: str
+    thumbnail: Optional[str] = None
+
+class ImageManifest(BaseModel):
+    folder: str
+    seguimiento: str
+    imagenes: List[ImagenInfo] = []
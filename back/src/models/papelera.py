@@ -0,0 +1,14 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import List
+
+class FamiliaEliminada(BaseModel):
+    trash_id: str
+    folder: str
+    doc_number: str
+    doc_adviser: str
+    eliminado: datetime
+    expira: datetime
+
+class Papelera(BaseModel):
+    familias: List[FamiliaEliminada] = []
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+
+class PDFJobCreate(BaseModel):
+    scope: Literal["familia", "asesor"]
+    folder: Optional[str] = None
+    adviser: Optional[str] = None
+
+class PDFJobStatus(BaseModel):
+    id: str
+    scope: str
+    target: str
+    status: str
+    total: int = 0
+    done: int = 0
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    created: str
@@ -1,11 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
+from utils.helpers import parse_fecha
 
 class Compromiso(BaseModel):
     descripcion: str
     fecha_cumplimiento: str
     responsable: str
 
+    @field_validator("fecha_cumplimiento")
+    @classmethod
+    def normalizar_fecha(cls, value: str) -> str:
+        # Se guarda siempre como AAAA-MM-DD para poder indexar y ordenar
+        fecha = parse_fecha(value)
+        if fecha is None:
+            raise ValueError("Fecha de cumplimiento no válida")
+        return fecha.isoformat()
+
 class Participante(BaseModel):
     nombre: str
     rol: str
@@ -1,15 +1,26 @@
-import json
-import os
-from fastapi import APIRouter, Request, HTTPException
+import asyncio
+from fastapi import APIRouter, Request, HTTPException, Query
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from typing import Literal, Optional
 from utils.helpers import require_auth
-from pathlib import Path
-from utils.dependencies import templates
+from utils.dependencies import templates, TEMPLATES_DIR
+from utils import aggregates, catalog, compromisos, http_cache, search
+from utils.fragments import fragment_cache
+from models.familias import FamiliasPage, BusquedaResult
+from models.estadisticas import EstadisticasPrograma
+from models.compromisos import CompromisosPage
 
 router = APIRouter()
 
-DOCUMENTS_BASE_PATH = "documents"
+FAMILIES_PAGE_SIZE = 25
+SortOption = Literal["doc_number", "-doc_number", "apellido", "-apellido", "completados", "-completados"]
+EstadoOption = Literal["sin_iniciar", "en_curso", "completa"]
+
+# La página depende de index.html y de las plantillas parciales de cada familia
+TEMPLATE_MTIME = max(
+    path.stat().st_mtime_ns
+    for path in [TEMPLATES_DIR / "index.html", *TEMPLATES_DIR.glob("partials/*.html")]
+)
 
 @router.get("/", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -22,95 +33,129 @@ async def dashboard(request: Request):
     user = request.cookies.get("user")
     name = request.cookies.get("name")
     user_role = request.cookies.get("role")
+
+    # La página solo cambia cuando cambia el catálogo (o la plantilla)
+    catalog_version, updated_at = await asyncio.to_thread(catalog.version)
+    etag = http_cache.etag_from_text(f"{catalog_version}|{user}|{user_role}|{name}|{TEMPLATE_MTIME}")
+    last_modified = max(updated_at, TEMPLATE_MTIME / 1e9)
+    headers = http_cache.cache_headers("dashboard", etag, last_modified)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified_response(headers)
     
-    documents = []
-    
-    for doc_dir in Path(DOCUMENTS_BASE_PATH).iterdir():
-        apellido = ""
-        
-        if doc_dir.is_dir() and doc_dir.name.startswith("documento_") and doc_dir.name.endswith(f"_{user}"):
-            # doc_number sin el prefijo y sin el sufijo del user
-            base_name = doc_dir.name.replace("documento_", "")
-            doc_number = base_name.rsplit("_", 1)[0]
-            doc_adviser = base_name.rsplit("_", 1)[1]
-            
-            # Obtener apellido del archivo familia
-            apellido = ""
-            for file in doc_dir.iterdir():
-                if file.name.startswith("familia_") and file.name.endswith(".json"):
-                    with open(file, encoding="utf-8") as f:
-                        try:
-                            data = json.load(f)
-                            apellido = data.get("apellido", "")
-                        except:
-                            pass
-                    break
-
-            # Leer seguimientos
-            seguimientos = []
-            for item in os.listdir(doc_dir):
-                if item.startswith("seguimiento_"):
-                    seg_num = item.split("_")[1]
-                    seg_path = doc_dir / item
-                    enviado = (seg_path / "seguimiento.json").exists()
-                    seguimientos.append({
-                        "id": item,
-                        "numero": seg_num,
-                        "enviado": enviado
-                    })
-
-            seguimientos.sort(key=lambda x: int(x["numero"]))
-
-            documents.append({
-                "doc_adviser": doc_adviser,
-                "doc_number": doc_number,
-                "apellido": apellido,
-                "seguimientos": seguimientos
-            })
-        elif user_role == "superadmin":
-            # Si es el administrador, listar todos los documentos
-            base_name = doc_dir.name.replace("documento_", "")
-            doc_number = base_name.rsplit("_", 1)[0]
-            doc_adviser = base_name.rsplit("_", 1)[1]
-            
-            # Obtener apellido del archivo familia
-            apellido = ""
-            for file in doc_dir.iterdir():
-                if file.name.startswith("familia_") and file.name.endswith(".json"):
-                    with open(file, encoding="utf-8") as f:
-                        try:
-                            data = json.load(f)
-                            apellido = data.get("apellido", "")
-                        except:
-                            pass
-                    break
-
-            seguimientos = []
-            for item in os.listdir(doc_dir):
-                if item.startswith("seguimiento_"):
-                    seg_num = item.split("_")[1]
-                    seg_path = doc_dir / item
-                    enviado = (seg_path / "seguimiento.json").exists()
-                    seguimientos.append({
-                        "id": item,
-                        "numero": seg_num,
-                        "enviado": enviado
-                    })
-
-            seguimientos.sort(key=lambda x: int(x["numero"]))
-
-            documents.append({
-                "doc_adviser": doc_adviser,
-                "doc_number": doc_number,
-                "apellido": apellido,
-                "seguimientos": seguimientos
-            })
+    # Solo se renderiza la primera página; el resto lo pide index.js a /api/families
+    documents, next_cursor = await asyncio.to_thread(
+        catalog.page_families, _visible_adviser(request), limit=FAMILIES_PAGE_SIZE
+    )
 
     return templates.TemplateResponse("index.html", {
         "request": request,
         "user": user,
         "user_role": user_role,
-        "documents": documents,
+        "family_cards": fragment_cache.cards(documents, user_role),
+        "next_cursor": next_cursor,
         "name": name
-    })
+    }, headers=headers)
+
+def _visible_adviser(request: Request, adviser: Optional[str] = None) -> Optional[str]:
+    """Los superadmin ven todas las familias (o filtran por asesor); los asesores solo las suyas"""
+    if request.cookies.get("role") == "superadmin":
+        return adviser or None
+    return request.cookies.get("user")
+
+@router.get("/api/families", response_model=FamiliasPage)
+async def api_families(
+    request: Request,
+    adviser: Optional[str] = None,
+    apellido: Optional[str] = None,
+    estado: Optional[EstadoOption] = None,
+    sort: SortOption = "doc_number",
+    limit: int = Query(FAMILIES_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    Familias visibles para el usuario, por páginas
+
+    Filtra por asesor (solo superadmin), prefijo de apellido y estado, y
+    ordena por documento, apellido o seguimientos completados. La siguiente
+    página se pide con ?cursor=<next_cursor>.
+    """
+    require_auth(request)
+    familias, next_cursor = await asyncio.to_thread(
+        catalog.page_families, _visible_adviser(request, adviser), apellido, estado, sort, limit, cursor
+    )
+    return FamiliasPage(familias=familias, next_cursor=next_cursor)
+
+@router.get("/api/families/cards", response_class=HTMLResponse)
+async def api_family_cards(
+    request: Request,
+    adviser: Optional[str] = None,
+    apellido: Optional[str] = None,
+    estado: Optional[EstadoOption] = None,
+    sort: SortOption = "doc_number",
+    limit: int = Query(FAMILIES_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    La misma página que /api/families, ya renderizada con la plantilla de
+    cada familia (desde la caché de fragmentos); el cursor siguiente va en la
+    cabecera X-Next-Cursor
+    """
+    require_auth(request)
+    familias, next_cursor = await asyncio.to_thread(
+        catalog.page_families, _visible_adviser(request, adviser), apellido, estado, sort, limit, cursor
+    )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return HTMLResponse(fragment_cache.cards(familias, request.cookies.get("role")), headers=headers)
+
+@router.get("/api/fragments/stats")
+async def fragment_stats(request: Request):
+    """Aciertos/fallos de la caché de tarjetas de familia (de este worker)"""
+    require_auth(request)
+    return fragment_cache.stats()
+
+@router.get("/api/search", response_model=BusquedaResult)
+async def api_search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    adviser: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Busca en el texto de los seguimientos (objetivo, aspectos, avances, retos,
+    oportunidades y compromisos), sin distinguir tildes y por raíz de palabra
+    """
+    require_auth(request)
+    hits = await asyncio.to_thread(search.search, q, _visible_adviser(request, adviser), limit)
+    return BusquedaResult(query=q, hits=hits)
+
+@router.get("/api/stats", response_model=EstadisticasPrograma)
+async def api_stats(request: Request):
+    """
+    Indicadores del programa (completado por asesor, embudo de seguimientos,
+    dimensiones y compromisos por responsable) desde los agregados
+    materializados, sin recorrer los documentos
+    """
+    require_auth(request)
+    if request.cookies.get("role") != "superadmin":
+        raise HTTPException(status_code=403, detail="Solo disponible para superadmin")
+    return await asyncio.to_thread(aggregates.report)
 
+@router.get("/api/compromisos/{estado}", response_model=CompromisosPage)
+async def api_compromisos(
+    request: Request,
+    estado: Literal["vencidos", "proximos"],
+    adviser: Optional[str] = None,
+    responsable: Optional[str] = None,
+    dias: int = Query(7, ge=0, le=366),
+    limit: int = Query(FAMILIES_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    Compromisos vencidos (fecha anterior a hoy) o próximos (en los siguientes
+    `dias`), ordenados por fecha y paginados con ?cursor=<next_cursor>
+    """
+    require_auth(request)
+    items, next_cursor = await asyncio.to_thread(
+        compromisos.query, estado, _visible_adviser(request, adviser), responsable, dias, limit, cursor
+    )
+    return CompromisosPage(compromisos=items, next_cursor=next_cursor)
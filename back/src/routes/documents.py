@@ -1,83 +1,136 @@
-from itertools import zip_longest
-import os
-import shutil
-from typing import Dict, List, Union
-from fastapi import APIRouter, Request, Form, HTTPException, logger
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, FileResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
+import asyncio
 import json
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Request, Form, HTTPException, Query
+from fastapi import Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from fastapi.responses import JSONResponse, RedirectResponse, FileResponse
 from datetime import datetime
-from utils.helpers import require_auth, create_document_structure, load_seguimiento_data, save_seguimiento_data
-from models.seguimiento import SeguimientoResponse, Compromiso, Participante
+from utils.helpers import require_auth
+from models.seguimiento import SeguimientoResponse
 from models.save_seguimiento import SeguimientoData
 from models.documents import DocumentCreate
+from models.comentarios import ComentariosPage
+from models.papelera import Papelera
+from models.familias import FamiliaCompleta
+from utils import aggregates, catalog, http_cache, locks, papelera, search, staging
+from utils import compromisos as compromisos_index
+from storage import storage, MAX_SEGUIMIENTOS
+
+from utils.pdf_cache import pdf_cache, get_or_render
+from utils.fragments import fragment_cache
+from utils.family_cache import family_cache
+from routes.files import describe_seguimiento_images
 
-from utils.generate_pdf import PDFGenerator
+router = APIRouter()
 
-pdf_generator = PDFGenerator()
+# Campos de SeguimientoResponse que no se guardan: se añaden al responder
+RESPONSE_DYNAMIC_FIELDS = {"numero", "imagenes"}
+
+
+def serialize_seguimiento(seguimiento_data: Dict) -> bytes:
+    """
+    Serializa los datos ya validados como SeguimientoResponse, sin numero ni
+    imagenes y sin la llave de apertura ('"dimensiones":[...],...}').
+    Se hace una vez al guardar; get_seguimiento solo antepone lo dinámico.
+    """
+    body = SeguimientoResponse.model_validate({**seguimiento_data, "numero": ""}).model_dump_json(
+        exclude=RESPONSE_DYNAMIC_FIELDS
+    )
+    return body[1:].encode()
+
+
+def seguimiento_response_bytes(numero: str, imagenes: List[str], body: bytes) -> bytes:
+    """ Une numero e imagenes con el cuerpo serializado al guardar """
+    head = json.dumps({"numero": numero, "imagenes": imagenes}, ensure_ascii=False, separators=(",", ":"))
+    return head[:-1].encode() + b"," + body
 
-router = APIRouter()
-templates = Jinja2Templates(directory="../../front/templates")
-DOCUMENTS_BASE_PATH = "documents"
 
 @router.get("/get-seguimiento/{folder}/{follow_up}", response_model= SeguimientoResponse)
 async def get_seguimiento(folder: str, follow_up: str, request: Request):
     """Obtiene los datos de un seguimiento específico"""
     require_auth(request)
 
-    doc_path = Path(DOCUMENTS_BASE_PATH) / f"{folder}/{follow_up}"
-    if not doc_path.exists():
+    if not await storage.seguimiento_exists(folder, follow_up):
         raise HTTPException(status_code=404, detail="Documento no encontrado")
-    
-    seguimiento_path = doc_path
-    imagenes = [f.name for f in (seguimiento_path / "imagenes").iterdir() if f.is_file()] if seguimiento_path.exists() else []
-        
-    # Cargar datos del seguimiento
-    seguimiento_data = load_seguimiento_data(seguimiento_path)
-
-    # Convertir compromisos
-    compromisos = [
-        Compromiso(
-            descripcion=c["descripcion"],
-            fecha_cumplimiento=c["fecha_cumplimiento"],
-            responsable=c["responsable"]
-        ) for c in seguimiento_data.get("compromisos", [])
-    ]
-    
-    # Convertir participantes
-    participantes = [
-        Participante(
-            nombre=p["nombre"],
-            rol=p["rol"]
-        ) for p in seguimiento_data.get("participantes", [])
-    ]
-    
-    # Convertir comentarios
-    # comentarios = [
-    #     Comentario(
-    #         autor=c["autor"],
-    #         contenido=c["contenido"],
-    #         fecha=c["fecha"]
-    #     ) for c in seguimiento_data.get("comentarios", [])
-    # ]
-        
-    return SeguimientoResponse(
-        numero=follow_up.replace("seguimiento_", ""),
-        imagenes=imagenes,
-        dimensiones=seguimiento_data.get("dimensiones", []),
-        fecha=seguimiento_data.get("fecha"),
-        hora=seguimiento_data.get("hora"),
-        objetivo=seguimiento_data.get("objetivo"),
-        aspectos=seguimiento_data.get("aspectos"),
-        avances=seguimiento_data.get("avances"),
-        retos=seguimiento_data.get("retos"),
-        oportunidades=seguimiento_data.get("oportunidades"),
-        compromisos=compromisos,
-        participantes=participantes
-        # comentarios=comentarios
+
+    async with locks.seguimiento_lock(folder, follow_up):
+        # Validador que cambia con los datos y con las imágenes (al subir/borrar)
+        version, last_modified = await storage.seguimiento_version(folder, follow_up)
+        etag = http_cache.etag_from_text(version)
+        headers = http_cache.cache_headers("get_seguimiento", etag, last_modified)
+        if http_cache.is_not_modified(request, etag, last_modified):
+            return http_cache.not_modified_response(headers)
+        imagenes = await storage.list_images(folder, follow_up)
+
+        # Respuesta serializada al guardar; los datos anteriores a este
+        # formato (o sin guardar aún) se serializan aquí hasta el próximo guardado
+        body = await storage.load_seguimiento_response(folder, follow_up)
+        if body is None:
+            body = serialize_seguimiento(await storage.load_seguimiento(folder, follow_up))
+
+    # Los datos ya se validaron con SeguimientoData al guardar: se devuelven
+    # los bytes tal cual, sin volver a construir ni validar el modelo
+    return Response(
+        content=seguimiento_response_bytes(follow_up.replace("seguimiento_", ""), imagenes, body),
+        media_type="application/json",
+        headers=headers
     )
 
+async def _family_seguimiento(folder: str, numero: int, enviado: bool) -> bytes:
+    """ Un seguimiento de /family: lo mismo que get-seguimiento más manifiesto y comentarios """
+    follow_up = f"seguimiento_{numero}"
+    async with locks.seguimiento_lock(folder, follow_up):
+        _, imagenes = await describe_seguimiento_images(folder, follow_up)
+        comentarios = await storage.count_comments(folder, follow_up)
+        body = await storage.load_seguimiento_response(folder, follow_up) if enviado else None
+        if body is None:
+            body = serialize_seguimiento(await storage.load_seguimiento(folder, follow_up))
+
+    datos = seguimiento_response_bytes(str(numero), [img["name"] for img in imagenes], body)
+    head = json.dumps(
+        {"numero": numero, "enviado": enviado, "comentarios": comentarios, "imagenes": imagenes},
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return head[:-1].encode() + b',"datos":' + datos + b"}"
+
+
+@router.get("/family/{folder}", response_model=FamiliaCompleta)
+async def get_family(folder: str, request: Request):
+    """
+    Todos los seguimientos de una familia en una sola respuesta (datos,
+    manifiesto de imágenes y número de comentarios), para que el formulario
+    navegue entre ellos sin más peticiones
+    """
+    require_auth(request)
+
+    if not await storage.family_exists(folder):
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+
+    # La versión se lee antes de montar la respuesta: si entretanto se
+    # escribe algo, la próxima petición verá otra versión y la rehará
+    version = await storage.family_version(folder)
+    etag = http_cache.etag_from_text(version)
+    headers = http_cache.cache_headers("get_family", etag)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(headers)
+
+    body = family_cache.get(folder, version)
+    if body is None:
+        enviados = set(await storage.seguimientos_with_data(folder))
+        seguimientos = await asyncio.gather(*(
+            _family_seguimiento(folder, numero, f"seguimiento_{numero}" in enviados)
+            for numero in range(1, MAX_SEGUIMIENTOS + 1)
+        ))
+        body = (
+            b'{"folder":' + json.dumps(folder, ensure_ascii=False).encode()
+            + b',"seguimientos":[' + b",".join(seguimientos) + b"]}"
+        )
+        family_cache.put(folder, version, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.post("/create-document")
 async def create_document(document_data: DocumentCreate, request: Request):
     require_auth(request)
@@ -85,24 +138,22 @@ async def create_document(document_data: DocumentCreate, request: Request):
     if not user_id:
         raise HTTPException(status_code=403, detail="Usuario no autenticado")
     
-    doc_path = Path(DOCUMENTS_BASE_PATH) / f"documento_{document_data.doc_number}_{user_id}"
-    if doc_path.exists():
-        raise HTTPException(status_code=400, detail="El documento ya existe")
-    
-    # Crear estructura de archivos
-    create_document_structure(document_data.doc_number, request)
-
-    # Crear JSON con los datos de la familia
-    apellido = document_data.apellido.lower().replace(" ", "_")
-    json_path = doc_path / f"familia_{apellido}.json"
-    json_content = {
-        "apellido": document_data.apellido,
-        "doc_number": document_data.doc_number,
-        "creado_por": user_id
-    }
-
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(json_content, f, ensure_ascii=False, indent=4)
+    folder = f"documento_{document_data.doc_number}_{user_id}"
+    async with locks.document_lock(folder, exclusive=True):
+        if await storage.family_exists(folder):
+            raise HTTPException(status_code=400, detail="El documento ya existe")
+
+        # Crear la familia con sus datos
+        json_content = {
+            "apellido": document_data.apellido,
+            "doc_number": document_data.doc_number,
+            "creado_por": user_id
+        }
+        await storage.create_family(folder, json_content)
+
+    await asyncio.to_thread(catalog.upsert_family, folder, document_data.apellido)
+    await asyncio.to_thread(aggregates.family_created, folder)
+    fragment_cache.invalidate(folder)
     
     full_doc_id = f"{document_data.doc_number}_{user_id}"
     return {
@@ -127,8 +178,7 @@ async def save_seguimiento(
     if not user_id:
         raise HTTPException(status_code=403, detail="Usuario no autenticado")
     
-    seguimiento_path = Path(DOCUMENTS_BASE_PATH) / f"{folder}/{follow_up}"
-    if not seguimiento_path.exists():
+    if not await storage.seguimiento_exists(folder, follow_up):
         raise HTTPException(status_code=404, detail="Seguimiento no encontrado")
 
     # Cargar datos del seguimiento existente
@@ -136,75 +186,172 @@ async def save_seguimiento(
 
     # result = pdf_generator.create_reporte_pdf(seguimiento_data)
 
+    # Respuesta de get-seguimiento serializada una sola vez, fuera del bloqueo
+    response_body = serialize_seguimiento(seguimiento_data)
+
     # Guardar datos del seguimiento
-    save_seguimiento_data(seguimiento_path, seguimiento_data)
+    async with locks.seguimiento_lock(folder, follow_up, exclusive=True):
+        await storage.save_seguimiento(folder, follow_up, seguimiento_data, response_body)
+
+    return await seguimiento_saved(folder, follow_up, seguimiento_data)
+
+
+async def seguimiento_saved(folder: str, follow_up: str, seguimiento_data: Dict) -> Dict:
+    """ Actualiza catálogo, índices y cachés tras guardar; respuesta con el siguiente seguimiento """
+    numero = int(follow_up.replace("seguimiento_", ""))
+    await asyncio.to_thread(catalog.set_enviado, folder, numero)
+    await asyncio.to_thread(search.index_seguimiento, folder, numero, seguimiento_data)
+    await asyncio.to_thread(aggregates.seguimiento_saved, folder, numero, seguimiento_data)
+    await asyncio.to_thread(compromisos_index.index_seguimiento, folder, numero, seguimiento_data)
+    fragment_cache.invalidate(folder)
     
     # Determinar el siguiente seguimiento
-    next_seguimiento = int(follow_up.replace("seguimiento_", "")) + 1
-    max_seguimientos = 8  # Número total de seguimientos
+    next_seguimiento = numero + 1
     
     return {
         "success": True,
-        "next_seguimiento": next_seguimiento if next_seguimiento <= max_seguimientos else None,
+        "next_seguimiento": next_seguimiento if next_seguimiento <= MAX_SEGUIMIENTOS else None,
         "message": "Datos guardados exitosamente"
     }
 
 
-@router.post("/add-comment/{doc_number}/{seguimiento_num}")
-async def add_comment(request: Request, doc_number: str, seguimiento_num: int, comentario: str = Form(...)):
+def _validate_seguimiento(raw: bytes) -> Dict:
+    """ Campo "data" de un guardado multipart, con los mismos errores 422 que el JSON """
+    try:
+        return SeguimientoData.model_validate_json(raw).dict()
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", "data", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+
+
+@router.post("/save-seguimiento-with-files/{folder}/{follow_up}")
+async def save_seguimiento_with_files(folder: str, follow_up: str, request: Request):
+    """
+    Guarda los datos y las imágenes de un seguimiento en una sola petición
+    multipart ("data": JSON de SeguimientoData, "files": imágenes). O se
+    guarda todo o no se guarda nada.
+    """
     require_auth(request)
-    doc_path = Path(DOCUMENTS_BASE_PATH) / f"documento_{doc_number}"
-    comments_file = doc_path / f"seguimiento_{seguimiento_num}" / "comentarios.json"
-    comentarios = []
+    user_id = request.cookies.get("user")
+
+    if not user_id:
+        raise HTTPException(status_code=403, detail="Usuario no autenticado")
+
+    if not await storage.seguimiento_exists(folder, follow_up):
+        raise HTTPException(status_code=404, detail="Seguimiento no encontrado")
+
+    async with staging.receive(request, _validate_seguimiento) as staged:
+        seguimiento_data = staged.data
+        response_body = serialize_seguimiento(seguimiento_data)
+        async with locks.seguimiento_lock(folder, follow_up, exclusive=True):
+            await storage.commit_seguimiento(folder, follow_up, seguimiento_data, response_body, staged.images)
+
+    result = await seguimiento_saved(folder, follow_up, seguimiento_data)
+    result["files"] = [name for name, _ in staged.images]
+    return result
 
-    if comments_file.exists():
-        with open(comments_file, 'r', encoding='utf-8') as f:
-            comentarios = json.load(f)
 
+@router.post("/add-comment/{doc_number}/{seguimiento_num}")
+async def add_comment(request: Request, doc_number: str, seguimiento_num: int, comentario: str = Form(...)):
+    require_auth(request)
     nuevo_comentario = {
         "fecha": datetime.now().isoformat(),
         "usuario": request.cookies.get("user"),
         "comentario": comentario
     }
-    comentarios.append(nuevo_comentario)
-
-    with open(comments_file, 'w', encoding='utf-8') as f:
-        json.dump(comentarios, f, ensure_ascii=False, indent=2)
+    folder, seguimiento = f"documento_{doc_number}", f"seguimiento_{seguimiento_num}"
+    # Un comentarios.json antiguo se convierte antes, con el seguimiento en exclusiva
+    if await storage.has_legacy_comments(folder, seguimiento):
+        async with locks.seguimiento_lock(folder, seguimiento, exclusive=True):
+            await storage.migrate_comments(folder, seguimiento)
+    # Compartido: las escrituras con O_APPEND no se pisan; solo la compactación es exclusiva
+    async with locks.seguimiento_lock(folder, seguimiento):
+        await storage.add_comment(folder, seguimiento, nuevo_comentario)
 
     return RedirectResponse(url=f"/document/{doc_number}", status_code=302)
 
 
+@router.get("/comments/{folder}/{follow_up}", response_model=ComentariosPage)
+async def list_comments(
+    request: Request,
+    folder: str,
+    follow_up: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = None
+):
+    """
+    Comentarios de un seguimiento, del más reciente hacia atrás
+
+    Devuelve los `limit` comentarios más recientes (en orden cronológico) y un
+    `next_cursor`; para la página anterior se envía ?before=<next_cursor>.
+    """
+    require_auth(request)
+    if not await storage.seguimiento_exists(folder, follow_up):
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    async with locks.seguimiento_lock(folder, follow_up):
+        comentarios, next_cursor = await storage.list_comments(folder, follow_up, limit, before)
+    return ComentariosPage(comentarios=comentarios, next_cursor=next_cursor)
+
+
 @router.delete("/delete-document/{folder}")
 async def delete_document(folder: str, request: Request):
     """
-    Elimina carpeta de un documento y todos sus seguimientos
-    
+    Mueve a la papelera la carpeta de un documento con todos sus seguimientos
+
+    Se puede restaurar con /restore-document hasta la fecha `expira`; después
+    la purga en segundo plano (utils/papelera.py).
+
     Args:
         folder: nombre de la carpeta del documento a eliminar
         
     Returns:
-        Mensaje de éxito o error
+        Mensaje de éxito o error, con el identificador en la papelera
     """
     require_auth(request)
 
-    doc_path = Path(DOCUMENTS_BASE_PATH) / f"{folder}"
-
-    if not doc_path.exists():
-        raise HTTPException(status_code=404, detail="Documento no encontrado")
-
     try:
-        # Eliminar todo el directorio y su contenido recursivamente
-        shutil.rmtree(doc_path)
-
-        return JSONResponse(status_code=200, content={"message": "Documento eliminado exitosamente"})
+        entry = await papelera.trash(folder, _own_adviser(request))
+        return JSONResponse(status_code=200, content={
+            "message": "Documento eliminado exitosamente",
+            "trash_id": entry["trash_id"],
+            "expira": entry["expira"].isoformat()
+        })
 
     except PermissionError:
         raise HTTPException(
             status_code=403, detail="Sin permisos para eliminar el documento")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al eliminar el documento: {str(e)}")
 
+def _own_adviser(request: Request) -> Optional[str]:
+    """Asesor al que se limita la papelera: ninguno para los superadmin"""
+    return None if request.cookies.get("role") == "superadmin" else request.cookies.get("user")
+
+@router.get("/papelera", response_model=Papelera)
+async def list_trash(request: Request):
+    """Familias eliminadas que aún se pueden restaurar (los asesores solo ven las suyas)"""
+    require_auth(request)
+    return Papelera(familias=await papelera.list_entries(_own_adviser(request)))
+
+@router.post("/restore-document/{trash_id}")
+async def restore_document(trash_id: str, request: Request):
+    """
+    Restaura una familia eliminada, con sus seguimientos, comentarios e imágenes
+
+    Args:
+        trash_id: identificador devuelto por delete-document (o listado en /papelera)
+    """
+    require_auth(request)
+    try:
+        folder = await papelera.restore(trash_id, _own_adviser(request))
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Sin permisos para restaurar el documento")
+    return {"success": True, "message": "Documento restaurado exitosamente", "folder": folder}
+
 @router.get("/download-pdf/{folder}/{filename}")
 async def download_pdf(folder: str, filename: str):
     """
@@ -218,26 +365,23 @@ async def download_pdf(folder: str, filename: str):
         Archivo PDF como respuesta de descarga
     """
     try:
-        # Verificar que el archivo existe
-        doc_path = Path(DOCUMENTS_BASE_PATH) / f"{folder}/{filename}"
-        if not doc_path.exists():
+        # Verificar que el seguimiento existe
+        if not await storage.seguimiento_exists(folder, filename):
             raise HTTPException(status_code=404, detail="Documento no encontrado")
 
         # Cargar datos del seguimiento existente
-        seguimiento_path = doc_path
+        async with locks.seguimiento_lock(folder, filename):
+            seguimiento_data = await storage.load_seguimiento(folder, filename)
 
-        seguimiento_data = load_seguimiento_data(seguimiento_path)
-
-        result = pdf_generator.create_reporte_pdf(seguimiento_data)
-        
-        print(f"Generando PDF: {result['filename']} en {result['file_path']}")
+        # Se sirve desde la caché si los datos no cambiaron; si no, se genera en el pool de procesos
+        file_path = await get_or_render(seguimiento_data)
 
         # Retornar archivo para descarga
         return FileResponse(
-            path=result['file_path'],
-            filename=result['filename'],
+            path=file_path,
+            filename=file_path.name,
             media_type='application/pdf',
-            headers={"Content-Disposition": f"attachment; filename={result['filename']}"}
+            headers={"Content-Disposition": f"attachment; filename={file_path.name}"}
         )
 
     except HTTPException:
@@ -260,16 +404,25 @@ async def delete_document_pdf(filename: str, request: Request):
     require_auth(request)
     
     try:
-        # Verificar que el archivo existe
-        doc_path = Path(DOCUMENTS_BASE_PATH) / f"pdfs/{filename}"
-        if not doc_path.exists():
+        # Eliminar el archivo PDF de la caché de reportes
+        if not await asyncio.to_thread(pdf_cache.remove, filename):
             raise HTTPException(status_code=404, detail="Documento no encontrado")
         
-        # Eliminar el archivo PDF
-        doc_path.unlink()
-        
         return JSONResponse(status_code=200, content={"message": "Documento eliminado exitosamente"})
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al eliminar el documento: {str(e)}")
 
+@router.get("/pdf-cache/stats")
+async def pdf_cache_stats(request: Request):
+    """Contadores de aciertos/fallos de la caché de PDFs (de este worker)"""
+    require_auth(request)
+    return pdf_cache.stats()
+
+@router.get("/locks/stats")
+async def lock_stats(request: Request):
+    """Esperas por bloqueos de familias y seguimientos (de este worker)"""
+    require_auth(request)
+    return locks.stats()
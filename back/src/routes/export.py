@@ -0,0 +1,37 @@
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from utils.helpers import require_auth
+from utils import export
+
+router = APIRouter()
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+@router.get("/export")
+async def export_seguimientos(
+    request: Request,
+    formato: Literal["csv", "jsonl"] = "csv",
+    gzip: bool = False,
+    adviser: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+):
+    """
+    Descarga todos los seguimientos (con sus compromisos y participantes)
+    como CSV o JSONL, generados sobre la marcha. Con ?gzip=true el archivo
+    va comprimido. Los asesores solo exportan sus propias familias.
+    """
+    require_auth(request)
+    user = request.cookies.get("user")
+    if request.cookies.get("role") != "superadmin":
+        if adviser is not None and adviser != user:
+            raise HTTPException(status_code=403, detail="Sin permisos para exportar estos documentos")
+        adviser = user
+
+    return StreamingResponse(
+        export.stream(formato, gzip, adviser, desde, hasta),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f"attachment; filename={export.filename(formato, gzip)}"}
+    )
@@ -1,42 +1,145 @@
 from fastapi import APIRouter, Request, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse
 from pathlib import Path
-from typing import List
-import shutil
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
+from urllib.parse import quote
 from utils.helpers import require_auth
+from utils import thumbnails, http_cache, locks
+from models.imagenes import ImageManifest
+from storage import storage, MAX_SEGUIMIENTOS
 
 router = APIRouter()
-DOCUMENTS_BASE_PATH = "documents"
+THUMBNAIL_WIDTH = 256
+
+async def image_paths(folder: str, seguimiento: str) -> List[Path]:
+    """Archivos locales de todas las imágenes de un seguimiento"""
+    names = await storage.list_images(folder, seguimiento)
+    paths = await asyncio.gather(*(storage.local_image_path(folder, seguimiento, name) for name in names))
+    return [path for path in paths if path is not None]
 
 @router.post("/upload-file/{doc_number}/{seguimiento_num}")
 async def upload_file(request: Request, doc_number: str, seguimiento_num: int, files: List[UploadFile] = File(...)):
     require_auth(request)
-    imagenes_path = Path(DOCUMENTS_BASE_PATH) / f"documento_{doc_number}" / f"seguimiento_{seguimiento_num}" / "imagenes"
-    imagenes_path.mkdir(parents=True, exist_ok=True)
+    folder = f"documento_{doc_number}"
+    seguimiento = f"seguimiento_{seguimiento_num}"
 
     uploaded_files = []
-    for file in files:
-        file_path = imagenes_path / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        uploaded_files.append(file.filename)
+    async with locks.seguimiento_lock(folder, seguimiento, exclusive=True):
+        for file in files:
+            await storage.save_image(folder, seguimiento, file.filename, file.file)
+            uploaded_files.append(file.filename)
 
     return {"message": f"{len(uploaded_files)} archivos subidos", "files": uploaded_files}
 
 @router.get("/image/{folder}/{seguimiento}/{filename}")
-async def get_image(request: Request, folder: str, seguimiento: str, filename: str):
+async def get_image(
+    request: Request,
+    folder: str,
+    seguimiento: str,
+    filename: str,
+    w: Optional[int] = None,
+    v: Optional[str] = None
+):
+    """
+    Devuelve una imagen del seguimiento
+
+    Con ?w= se sirve una variante reducida (miniatura o mediana) en WebP/JPEG.
+    Si además se envía ?v= con la versión actual del original, la respuesta
+    se puede guardar en caché indefinidamente.
+    """
     require_auth(request)
-    image_path = Path(DOCUMENTS_BASE_PATH) / f"{folder}" / f"{seguimiento}" / "imagenes" / filename
-    if not image_path.exists():
+    image_path = await storage.local_image_path(folder, seguimiento, filename)
+    if image_path is None:
         raise HTTPException(status_code=404, detail="Imagen no encontrada")
-    return FileResponse(image_path)
+    stat = await asyncio.to_thread(image_path.stat)
+    if w is not None and w <= 0:
+        raise HTTPException(status_code=400, detail="Ancho no válido")
+
+    # El validador depende solo del original, así una variante no se genera para responder 304
+    width = thumbnails.snap_width(w) if w is not None else None
+    fmt = thumbnails.choose_format(request.headers.get("accept")) if w is not None else ""
+    etag = http_cache.etag_from_stat(stat, extra=f"{width}:{fmt}" if width else "")
+    headers = http_cache.cache_headers("get_image", etag, stat.st_mtime)
+    if width is not None:
+        headers["Vary"] = "Accept"
+        if v is not None and v == thumbnails.image_version(stat):
+            headers["Cache-Control"] = "private, max-age=31536000, immutable"
+
+    if http_cache.is_not_modified(request, etag, stat.st_mtime):
+        return http_cache.not_modified_response(headers)
+    if width is None:
+        return FileResponse(image_path, headers=headers)
+
+    variant = await thumbnails.get_variant(image_path, width, fmt)
+    return FileResponse(
+        variant,
+        media_type="image/webp" if fmt == "webp" else "image/jpeg",
+        headers=headers
+    )
+
+@router.get("/documents/{folder}/{seguimiento}/imagenes/{filename}")
+async def legacy_document_image(folder: str, seguimiento: str, filename: str):
+    """
+    URLs del antiguo montaje estático de documents/ (documento_{n}_{user}/seguimiento_k/...):
+    las carpetas ya no están en esa ruta, así que se redirigen a /image
+    """
+    return RedirectResponse(
+        url=f"/seguimientos/image/{quote(folder)}/{quote(seguimiento)}/{quote(filename)}", status_code=308
+    )
+
+async def describe_seguimiento_images(folder: str, seguimiento: str) -> Tuple[Dict[str, Path], List[dict]]:
+    """Archivos por nombre y entradas del manifiesto (sin miniaturas en línea); con el seguimiento bloqueado"""
+    paths = {path.name: path for path in await image_paths(folder, seguimiento)}
+    imagenes = await thumbnails.describe_images(list(paths.values()))
+
+    base_url = f"/seguimientos/image/{folder}/{seguimiento}"
+    for img in imagenes:
+        img["url"] = f"{base_url}/{quote(img['name'])}"
+        img["thumbnail_url"] = f"{img['url']}?w={THUMBNAIL_WIDTH}&v={img['version']}"
+    return paths, imagenes
+
+@router.get("/image-manifest/{folder}/{seguimiento}", response_model=ImageManifest)
+async def get_image_manifest(request: Request, folder: str, seguimiento: str, inline: bool = False):
+    """
+    Devuelve en una sola respuesta todas las imágenes de un seguimiento:
+    tamaño, dimensiones, hash de contenido y URLs versionadas de original y
+    miniatura. Con ?inline=true incluye la miniatura como data URI.
+    """
+    require_auth(request)
+    async with locks.seguimiento_lock(folder, seguimiento):
+        paths, imagenes = await describe_seguimiento_images(folder, seguimiento)
+
+    if inline and imagenes:
+        fmt = thumbnails.choose_format(request.headers.get("accept"))
+        media_type = "image/webp" if fmt == "webp" else "image/jpeg"
+        variants = await asyncio.gather(
+            *(thumbnails.get_variant(paths[img["name"]], THUMBNAIL_WIDTH, fmt) for img in imagenes),
+            return_exceptions=True
+        )
+        for img, variant in zip(imagenes, variants):
+            if not isinstance(variant, Exception):
+                content = await asyncio.to_thread(variant.read_bytes)
+                encoded = base64.b64encode(content).decode("ascii")
+                img["thumbnail"] = f"data:{media_type};base64,{encoded}"
+
+    return ImageManifest(folder=folder, seguimiento=seguimiento, imagenes=imagenes)
 
 @router.delete("/delete-file/{doc_number}/{filename}")
-async def delete_file(request: Request, doc_number: str, filename: str):
+async def delete_file(request: Request, doc_number: str, filename: str, seguimiento_num: Optional[int] = None):
+    """
+    Elimina una imagen de la familia. Si no se indica ?seguimiento_num=,
+    se busca en todos los seguimientos y se elimina la primera coincidencia.
+    """
     require_auth(request)
-    file_path = Path(DOCUMENTS_BASE_PATH) / f"documento_{doc_number}" / "imagenes" / filename
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Archivo no encontrado")
-    
-    file_path.unlink()
-    return {"message": "Archivo eliminado exitosamente"}
\ No newline at end of file
+    folder = f"documento_{doc_number}"
+    numeros = [seguimiento_num] if seguimiento_num is not None else range(1, MAX_SEGUIMIENTOS + 1)
+
+    for numero in numeros:
+        seguimiento = f"seguimiento_{numero}"
+        async with locks.seguimiento_lock(folder, seguimiento, exclusive=True):
+            deleted = await storage.delete_image(folder, seguimiento, filename)
+        if deleted:
+            return {"message": "Archivo eliminado exitosamente"}
+    raise HTTPException(status_code=404, detail="Archivo no encontrado")
\ No newline at end of file
@@ -0,0 +1,52 @@
+import os
+import secrets
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import PlainTextResponse
+from utils import metrics
+from utils.helpers import require_auth
+from utils.family_cache import family_cache
+from utils.fragments import fragment_cache
+from utils.pdf_cache import pdf_cache
+from utils.process_pool import pdf_pool, image_pool
+
+router = APIRouter()
+
+# Acceso a /seguimientos/metrics: con METRICS_TOKEN definido, Prometheus debe
+# enviar "Authorization: Bearer <METRICS_TOKEN>"; sin él, solo lo ve un
+# superadmin con sesión iniciada (nunca queda abierto)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _cache_and_pool_metrics():
+    """Contadores que ya llevan las cachés y los pools, leídos al exportar"""
+    pdf = pdf_cache.stats()
+    fragments = fragment_cache.stats()
+    families = family_cache.stats()
+    return [
+        ("seguimientos_cache_hits_total", "Aciertos de las cachés", "counter",
+         [({"cache": "pdf"}, pdf["hits"]), ({"cache": "fragmentos"}, fragments["hits"]),
+          ({"cache": "familias"}, families["hits"])]),
+        ("seguimientos_cache_misses_total", "Fallos de las cachés", "counter",
+         [({"cache": "pdf"}, pdf["misses"]), ({"cache": "fragmentos"}, fragments["misses"]),
+          ({"cache": "familias"}, families["misses"])]),
+        ("seguimientos_pool_pending", "Trabajos pendientes en los pools de procesos", "gauge",
+         [({"pool": pool.name}, pool.pending) for pool in (pdf_pool, image_pool)]),
+    ]
+
+metrics.register_collector(_cache_and_pool_metrics)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(request: Request):
+    """
+    Métricas de este worker en formato de texto de Prometheus. Requiere el
+    token de METRICS_TOKEN o, si no está definido, una sesión de superadmin
+    """
+    if METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "")
+        if not secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Token de métricas no válido")
+    else:
+        require_auth(request)
+        if request.cookies.get("role") != "superadmin":
+            raise HTTPException(status_code=403, detail="Solo disponible para superadmin")
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,65 @@
+import asyncio
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import FileResponse
+from utils.helpers import require_auth
+from models.pdf_jobs import PDFJobCreate, PDFJobStatus
+from utils import catalog, pdf_jobs
+from storage import storage
+
+router = APIRouter()
+
+@router.post("/pdf-jobs", response_model=PDFJobStatus, status_code=202)
+async def create_pdf_job(job_data: PDFJobCreate, request: Request):
+    """
+    Lanza la exportación de todos los seguimientos de una familia (PDF)
+    o de todas las familias de un asesor (ZIP)
+    """
+    require_auth(request)
+    user = request.cookies.get("user")
+    user_role = request.cookies.get("role")
+
+    if job_data.scope == "familia":
+        if not job_data.folder or not await storage.family_exists(job_data.folder):
+            raise HTTPException(status_code=404, detail="Documento no encontrado")
+        _, adviser = catalog.parse_folder(job_data.folder)
+        target = job_data.folder
+        folders = [job_data.folder]
+    else:
+        adviser = job_data.adviser or user
+        target = adviser
+        folders = [doc["folder"] for doc in await asyncio.to_thread(catalog.list_families, adviser)]
+
+    if user_role != "superadmin" and adviser != user:
+        raise HTTPException(status_code=403, detail="Sin permisos para exportar estos documentos")
+
+    return await pdf_jobs.submit(job_data.scope, target, folders, requested_by=user, adviser=adviser)
+
+async def _visible_job(job_id: str, request: Request):
+    """ El trabajo, si existe y el usuario puede verlo (lo pidió, o es de sus familias) """
+    job = await asyncio.to_thread(pdf_jobs.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if not pdf_jobs.can_access(job, request.cookies.get("user"), request.cookies.get("role")):
+        raise HTTPException(status_code=403, detail="Sin permisos para ver este trabajo")
+    return job
+
+@router.get("/pdf-jobs/{job_id}", response_model=PDFJobStatus)
+async def get_pdf_job(job_id: str, request: Request):
+    """Estado y progreso de un trabajo de exportación"""
+    require_auth(request)
+    return await _visible_job(job_id, request)
+
+@router.get("/pdf-jobs/{job_id}/download")
+async def download_pdf_job(job_id: str, request: Request):
+    """Descarga el artefacto de un trabajo terminado (se transmite desde disco)"""
+    require_auth(request)
+    job = await _visible_job(job_id, request)
+    if job["status"] != "completado":
+        raise HTTPException(status_code=409, detail="El trabajo aún no ha terminado")
+
+    path = pdf_jobs.artifact_path(job)
+    if not await asyncio.to_thread(path.exists):
+        raise HTTPException(status_code=410, detail="El archivo exportado ya no está disponible")
+
+    media_type = "application/pdf" if job["scope"] == "familia" else "application/zip"
+    return FileResponse(path=path, filename=job["filename"], media_type=media_type)
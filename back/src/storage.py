@@ -0,0 +1,1399 @@
+# back/src/storage.py
+"""
+Capa de almacenamiento de familias, seguimientos, comentarios e imágenes.
+
+Las rutas usan siempre el objeto `storage` (asíncrono). Por debajo hay un
+backend síncrono intercambiable:
+
+- FileSystemBackend: la carpeta documents/ de siempre. Sus operaciones se
+  ejecutan en un hilo (asyncio.to_thread) para no bloquear el event loop.
+- MemoryBackend: todo en memoria, para pruebas y benchmarks.
+- SQLiteBackend: un único archivo SQLite.
+
+Se elige con la variable de entorno STORAGE_BACKEND (filesystem, memory o
+sqlite). Las herramientas de línea de comandos pueden usar `storage.backend`
+directamente.
+
+Los comentarios se guardan como un registro en el que solo se añade al
+final; en el sistema de archivos, junto a él se guarda cuántos tiene, así
+que contarlos solo lee lo añadido desde la última vez. Los comentarios.json
+antiguos se leen tal cual y se convierten con el seguimiento en exclusiva (al
+añadir el primer comentario nuevo o al compactar). De vez en cuando (p. ej.
+desde cron) se puede compactar y migrar todo con:
+
+    python -m storage compact-comments
+
+Las carpetas de cada seguimiento se crean en su primera escritura; un
+seguimiento sin carpeta se lee como vacío. Para borrar los árboles vacíos
+que creaban las versiones anteriores:
+
+    python -m storage prune-placeholders
+
+En el sistema de archivos cada familia vive en dos niveles de prefijo de su
+hash (documents/3f/a2/documento_..., así ningún directorio crece con el
+número de familias). Las familias de la disposición plana anterior se
+siguen encontrando; para moverlas, con la aplicación en marcha:
+
+    python -m storage migrate-layout
+
+Borrar una familia la mueve a la papelera (renombrar la carpeta, en tiempo
+constante); el borrado definitivo lo hace utils/papelera.py en segundo plano.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from utils.helpers import (
+    DOCUMENTS_BASE_PATH, SHARD_LEVELS, SHARD_WIDTH, load_seguimiento_data, save_seguimiento_data, shard_dirs
+)
+from utils.locks import document_lock_sync, seguimiento_lock_sync
+from utils.metrics import timer
+
+MAX_SEGUIMIENTOS = 8
+SEGUIMIENTO_NAMES = {f"seguimiento_{i}" for i in range(1, MAX_SEGUIMIENTOS + 1)}
+
+# Respuesta de get-seguimiento ya serializada al guardar (sin numero ni imagenes)
+RESPONSE_FILE = "respuesta.json"
+
+# Comentarios: un registro JSONL en el que solo se añade al final
+COMMENTS_LOG = "comentarios.jsonl"
+# "<inodo> <bytes> <comentarios>" del registro la última vez que se contó
+COMMENTS_COUNT_FILE = ".comentarios.count"
+LEGACY_COMMENTS_FILE = "comentarios.json"
+COMMENTS_PAGE_SIZE = 20
+
+# Familias borradas: "<folder>@<borrado en ns>" dentro de esta carpeta
+TRASH_DIR = ".papelera"
+
+# Imágenes recibidas en un guardado multipart, antes de confirmarlo
+STAGING_DIR = ".staging"
+_TAIL_CHUNK_SIZE = 8192
+
+
+def _check_name(name: str) -> str:
+    """ Evitar rutas fuera de la carpeta de documentos """
+    if not name or name in (".", "..") or "/" in name or "\\" in name:
+        raise HTTPException(status_code=400, detail="Nombre no válido")
+    return name
+
+
+def _parse_cursor(before: Optional[str]) -> Optional[int]:
+    """ Los cursores de comentarios son enteros opacos para el cliente """
+    if before is None:
+        return None
+    try:
+        cursor = int(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor no válido")
+    if cursor < 0:
+        raise HTTPException(status_code=400, detail="Cursor no válido")
+    return cursor
+
+
+def _tail_lines(f: BinaryIO, end: int, count: int) -> List[Tuple[int, bytes]]:
+    """
+    Lee hacia atrás las últimas `count` líneas completas anteriores a `end`
+
+    Solo lee los bloques necesarios, así que el coste no depende del tamaño
+    del archivo. Lo que haya después del último salto de línea (una
+    escritura a medias) se ignora.
+
+    Returns:
+        Lista de (offset, línea sin salto), de la más nueva a la más antigua
+    """
+    lines: List[Tuple[int, bytes]] = []
+    buffer = b""
+    position = end
+    trimmed = False
+    while position > 0 and len(lines) < count:
+        size = min(_TAIL_CHUNK_SIZE, position)
+        position -= size
+        f.seek(position)
+        buffer = f.read(size) + buffer
+        if not trimmed:
+            last = buffer.rfind(b"\n")
+            if last < 0:
+                continue
+            buffer = buffer[:last + 1]
+            trimmed = True
+        # El buffer empieza en `position` y termina siempre en un salto de línea
+        while buffer and len(lines) < count:
+            start = buffer.rfind(b"\n", 0, len(buffer) - 1) + 1
+            if start == 0 and position > 0:
+                break
+            lines.append((position + start, buffer[start:-1]))
+            buffer = buffer[:start]
+    return lines
+
+
+def new_trash_id(folder: str) -> str:
+    return f"{_check_name(folder)}@{time.time_ns()}"
+
+
+def parse_trash_id(trash_id: str) -> Optional[Tuple[str, int]]:
+    """ (folder, borrado en ns) de un identificador de la papelera, o None si no lo es """
+    folder, _, deleted_ns = trash_id.rpartition("@")
+    if not folder.startswith("documento_") or not deleted_ns.isdigit() or "/" in folder or "\\" in folder:
+        return None
+    return folder, int(deleted_ns)
+
+
+def familia_filename(apellido: str) -> str:
+    """ Nombre del archivo con los datos de la familia """
+    return f"familia_{apellido.lower().replace(' ', '_')}.json"
+
+
+class StorageBackend(ABC):
+    """ Interfaz síncrona que implementa cada backend """
+
+    # True si las operaciones hacen E/S bloqueante y deben ir a un hilo
+    blocking = True
+
+    # Familias
+    @abstractmethod
+    def list_families(self) -> List[str]: ...
+
+    @abstractmethod
+    def family_exists(self, folder: str) -> bool: ...
+
+    @abstractmethod
+    def create_family(self, folder: str, familia: Dict) -> None: ...
+
+    @abstractmethod
+    def read_family(self, folder: str) -> Dict: ...
+
+    @abstractmethod
+    def delete_family(self, folder: str) -> bool: ...
+
+    # Papelera
+    @abstractmethod
+    def trash_family(self, folder: str) -> Optional[str]:
+        """ Mueve la familia a la papelera; devuelve su identificador, o None si no existe """
+
+    @abstractmethod
+    def list_trash(self) -> List[str]:
+        """ Identificadores de las familias en la papelera """
+
+    @abstractmethod
+    def restore_family(self, trash_id: str) -> Optional[str]:
+        """
+        Devuelve la familia a su sitio; su folder, o None si ya no está en la
+        papelera. FileExistsError si entretanto se creó otra con el mismo folder.
+        """
+
+    @abstractmethod
+    def purge_trash(self, trash_id: str) -> bool:
+        """ Borra definitivamente una familia de la papelera """
+
+    # Seguimientos
+    @abstractmethod
+    def seguimiento_exists(self, folder: str, seguimiento: str) -> bool: ...
+
+    @abstractmethod
+    def has_seguimiento_data(self, folder: str, seguimiento: str) -> bool: ...
+
+    def seguimientos_with_data(self, folder: str) -> List[str]:
+        """ Seguimientos de la familia que ya tienen datos guardados """
+        return [
+            seguimiento for seguimiento in sorted(SEGUIMIENTO_NAMES)
+            if self.has_seguimiento_data(folder, seguimiento)
+        ]
+
+    @abstractmethod
+    def load_seguimiento(self, folder: str, seguimiento: str) -> Dict: ...
+
+    @abstractmethod
+    def save_seguimiento(self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes] = None) -> None:
+        """ Guarda los datos y, si se da, la respuesta ya serializada """
+
+    @abstractmethod
+    def load_seguimiento_response(self, folder: str, seguimiento: str) -> Optional[bytes]:
+        """ Respuesta serializada al guardar, o None si no hay (o está desfasada) """
+
+    @abstractmethod
+    def commit_seguimiento(
+        self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes], images: List[Tuple[str, Path]]
+    ) -> None:
+        """
+        Guarda los datos y las imágenes ya escritas en staging_path como una
+        sola operación: si algo falla, el seguimiento queda como estaba
+        """
+
+    @abstractmethod
+    def seguimiento_version(self, folder: str, seguimiento: str) -> Tuple[str, Optional[float]]:
+        """ (token que cambia con los datos o las imágenes, fecha de modificación) """
+
+    # Comentarios
+    @abstractmethod
+    def add_comment(self, folder: str, seguimiento: str, comentario: Dict) -> None: ...
+
+    @abstractmethod
+    def list_comments(
+        self, folder: str, seguimiento: str, limit: int, before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Página con los `limit` comentarios más recientes anteriores al cursor,
+        en orden cronológico, y el cursor para pedir los anteriores (o None)
+        """
+
+    @abstractmethod
+    def count_comments(self, folder: str, seguimiento: str) -> int: ...
+
+    def compact_comments(self, folder: str, seguimiento: str) -> int:
+        """ Reescribe el registro de comentarios; devuelve cuántos conserva """
+        return 0
+
+    def has_legacy_comments(self, folder: str, seguimiento: str) -> bool:
+        """ True si quedan comentarios en el formato antiguo por convertir """
+        return False
+
+    def migrate_comments(self, folder: str, seguimiento: str) -> bool:
+        """ Convierte los comentarios antiguos (con el seguimiento en exclusiva) """
+        return False
+
+    def family_version(self, folder: str) -> str:
+        """ Token que cambia con los datos, las imágenes o los comentarios de cualquier seguimiento """
+        return "|".join(
+            f"{self.seguimiento_version(folder, f'seguimiento_{numero}')[0]}:"
+            f"{self.count_comments(folder, f'seguimiento_{numero}')}"
+            for numero in range(1, MAX_SEGUIMIENTOS + 1)
+        )
+
+    # Imágenes
+    @abstractmethod
+    def list_images(self, folder: str, seguimiento: str) -> List[str]: ...
+
+    @abstractmethod
+    def save_image(self, folder: str, seguimiento: str, filename: str, fileobj: BinaryIO) -> None: ...
+
+    @abstractmethod
+    def delete_image(self, folder: str, seguimiento: str, filename: str) -> bool: ...
+
+    @abstractmethod
+    def local_image_path(self, folder: str, seguimiento: str, filename: str) -> Optional[Path]:
+        """ Archivo local con la imagen (para FileResponse y miniaturas), o None si no existe """
+
+
+class FileSystemBackend(StorageBackend):
+    """ Backend sobre la carpeta documents/ """
+
+    def __init__(self, base_path: str = DOCUMENTS_BASE_PATH):
+        self.base_path = Path(base_path)
+
+    def sharded_path(self, folder: str) -> Path:
+        """ documents/<h0h1>/<h2h3>/<folder>, con h = sha1 del nombre """
+        return self.base_path.joinpath(*shard_dirs(_check_name(folder)), folder)
+
+    def flat_path(self, folder: str) -> Path:
+        """ Ubicación en la disposición plana anterior (documents/<folder>) """
+        return self.base_path / _check_name(folder)
+
+    def family_path(self, folder: str) -> Path:
+        # Las familias aún sin migrar se siguen leyendo y escribiendo donde están
+        sharded = self.sharded_path(folder)
+        if not sharded.is_dir():
+            flat = self.flat_path(folder)
+            if flat.is_dir():
+                return flat
+        return sharded
+
+    def seguimiento_path(self, folder: str, seguimiento: str) -> Path:
+        return self.family_path(folder) / _check_name(seguimiento)
+
+    def _shard_dirs(self, path: Path, level: int):
+        for entry in os.scandir(path):
+            if entry.is_dir() and len(entry.name) == SHARD_WIDTH and not entry.name.startswith("."):
+                if level == 1:
+                    yield entry.path
+                else:
+                    yield from self._shard_dirs(Path(entry.path), level - 1)
+
+    def list_flat_families(self) -> List[str]:
+        """ Familias que siguen en la disposición plana """
+        if not self.base_path.is_dir():
+            return []
+        return [
+            entry.name for entry in os.scandir(self.base_path)
+            if entry.is_dir() and entry.name.startswith("documento_")
+        ]
+
+    def list_families(self) -> List[str]:
+        if not self.base_path.is_dir():
+            return []
+        with timer("scan_familias"):
+            families = set(self.list_flat_families())
+            for shard in self._shard_dirs(self.base_path, SHARD_LEVELS):
+                families.update(
+                    entry.name for entry in os.scandir(shard)
+                    if entry.is_dir() and entry.name.startswith("documento_")
+                )
+        return list(families)
+
+    def family_exists(self, folder: str) -> bool:
+        return self.sharded_path(folder).is_dir() or self.flat_path(folder).is_dir()
+
+    def migrate_family(self, folder: str) -> bool:
+        """ Mueve una familia de la disposición plana a la repartida (un rename) """
+        flat = self.flat_path(folder)
+        sharded = self.sharded_path(folder)
+        if not flat.is_dir() or sharded.exists():
+            return False
+        sharded.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(flat, sharded)
+        return True
+
+    def create_family(self, folder: str, familia: Dict) -> None:
+        # Solo la carpeta de la familia: cada seguimiento se crea en su primera escritura
+        doc_path = self.sharded_path(folder)
+        doc_path.mkdir(exist_ok=True, parents=True)
+
+        json_path = doc_path / familia_filename(familia["apellido"])
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(familia, f, ensure_ascii=False, indent=4)
+
+    def read_family(self, folder: str) -> Dict:
+        doc_path = self.family_path(folder)
+        if not doc_path.is_dir():
+            return {}
+        for file in doc_path.glob("familia_*.json"):
+            try:
+                with open(file, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return {}
+        return {}
+
+    def delete_family(self, folder: str) -> bool:
+        doc_path = self.family_path(folder)
+        if not doc_path.exists():
+            return False
+        shutil.rmtree(doc_path)
+        return True
+
+    @property
+    def trash_path(self) -> Path:
+        return self.base_path / TRASH_DIR
+
+    @property
+    def staging_path(self) -> Path:
+        # Dentro de documents/ para que confirmar sea renombrar, no copiar
+        return self.base_path / STAGING_DIR
+
+    def trash_family(self, folder: str) -> Optional[str]:
+        trash_id = new_trash_id(folder)
+        self.trash_path.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(self.family_path(folder), self.trash_path / trash_id)
+        except FileNotFoundError:
+            return None
+        return trash_id
+
+    def list_trash(self) -> List[str]:
+        if not self.trash_path.is_dir():
+            return []
+        return [
+            entry.name for entry in os.scandir(self.trash_path)
+            if entry.is_dir() and parse_trash_id(entry.name)
+        ]
+
+    def restore_family(self, trash_id: str) -> Optional[str]:
+        parsed = parse_trash_id(trash_id)
+        if parsed is None:
+            return None
+        folder = parsed[0]
+        trash_path = self.trash_path / trash_id
+        if not trash_path.is_dir():
+            return None
+        # rename() sobre una carpeta vacía existente no fallaría
+        if self.family_exists(folder):
+            raise FileExistsError(folder)
+        family_path = self.sharded_path(folder)
+        family_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(trash_path, family_path)
+        except FileNotFoundError:
+            return None
+        return folder
+
+    def purge_trash(self, trash_id: str) -> bool:
+        path = self.trash_path / _check_name(trash_id)
+        if not path.is_dir():
+            return False
+        shutil.rmtree(path)
+        return True
+
+    def seguimiento_exists(self, folder: str, seguimiento: str) -> bool:
+        # Un seguimiento sin carpeta existe igualmente (vacío) si la familia existe
+        return seguimiento in SEGUIMIENTO_NAMES and self.family_exists(folder)
+
+    def has_seguimiento_data(self, folder: str, seguimiento: str) -> bool:
+        return (self.seguimiento_path(folder, seguimiento) / "seguimiento.json").exists()
+
+    def seguimientos_with_data(self, folder: str) -> List[str]:
+        # Una sola lectura del directorio; solo se miran las carpetas que existen
+        with timer("scan_seguimientos"):
+            try:
+                entries = [entry.name for entry in os.scandir(self.family_path(folder)) if entry.is_dir()]
+            except FileNotFoundError:
+                return []
+            return [
+                name for name in sorted(entries)
+                if name in SEGUIMIENTO_NAMES and self.has_seguimiento_data(folder, name)
+            ]
+
+    def _is_placeholder(self, seguimiento_path: Path) -> bool:
+        """ True si la carpeta solo contiene la estructura vacía creada de antemano """
+        for root, dirs, files in os.walk(seguimiento_path):
+            for name in files:
+                path = Path(root) / name
+                if path == seguimiento_path / LEGACY_COMMENTS_FILE:
+                    try:
+                        with open(path, encoding="utf-8") as f:
+                            if json.load(f) == []:
+                                continue
+                    except (OSError, ValueError):
+                        pass
+                elif path == seguimiento_path / COMMENTS_LOG and path.stat().st_size == 0:
+                    continue
+                elif path == seguimiento_path / COMMENTS_COUNT_FILE:
+                    continue
+                return False
+        return True
+
+    def prune_placeholder(self, folder: str, seguimiento: str) -> bool:
+        """
+        Borra la carpeta del seguimiento si está vacía (las que creaba la
+        versión anterior al dar de alta la familia)
+        """
+        seguimiento_path = self.seguimiento_path(folder, seguimiento)
+        if not seguimiento_path.is_dir() or not self._is_placeholder(seguimiento_path):
+            return False
+        shutil.rmtree(seguimiento_path)
+        return True
+
+    def load_seguimiento(self, folder: str, seguimiento: str) -> Dict:
+        return load_seguimiento_data(self.seguimiento_path(folder, seguimiento))
+
+    def save_seguimiento(self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes] = None) -> None:
+        seguimiento_path = self.seguimiento_path(folder, seguimiento)
+        response_path = seguimiento_path / RESPONSE_FILE
+        if response is None:
+            response_path.unlink(missing_ok=True)
+        else:
+            # Primero la respuesta: si se corta antes de escribir los datos,
+            # queda más nueva que seguimiento.json y se descarta al leer
+            seguimiento_path.mkdir(parents=True, exist_ok=True)
+            temp_path = seguimiento_path / f".{RESPONSE_FILE}.tmp"
+            temp_path.write_bytes(response)
+            temp_path.replace(response_path)
+        save_seguimiento_data(seguimiento_path, data)
+
+    def commit_seguimiento(
+        self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes], images: List[Tuple[str, Path]]
+    ) -> None:
+        imagenes_path = self.seguimiento_path(folder, seguimiento) / "imagenes"
+        imagenes_path.mkdir(parents=True, exist_ok=True)
+        # (destino, archivo en staging, copia de la imagen que se reemplaza)
+        moved: List[Tuple[Path, Path, Optional[Path]]] = []
+        try:
+            # Las imágenes primero (renombrar dentro del mismo disco) y los
+            # datos al final: hasta entonces get-seguimiento ve lo anterior
+            for filename, staged in images:
+                target = imagenes_path / _check_name(filename)
+                backup = None
+                if target.exists():
+                    backup = staged.with_name(f"{staged.name}.anterior")
+                    os.replace(target, backup)
+                moved.append((target, staged, backup))
+                os.replace(staged, target)
+            self.save_seguimiento(folder, seguimiento, data, response)
+        except BaseException:
+            for target, staged, backup in reversed(moved):
+                if not staged.exists():
+                    os.replace(target, staged)
+                if backup is not None:
+                    os.replace(backup, target)
+            raise
+
+    def load_seguimiento_response(self, folder: str, seguimiento: str) -> Optional[bytes]:
+        seguimiento_path = self.seguimiento_path(folder, seguimiento)
+        try:
+            with open(seguimiento_path / RESPONSE_FILE, "rb") as f:
+                response_mtime = os.fstat(f.fileno()).st_mtime_ns
+                data_mtime = (seguimiento_path / "seguimiento.json").stat().st_mtime_ns
+                if response_mtime > data_mtime:
+                    return None
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def seguimiento_version(self, folder: str, seguimiento: str) -> Tuple[str, Optional[float]]:
+        seguimiento_path = self.seguimiento_path(folder, seguimiento)
+        parts = []
+        last_modified = None
+        for name in ("seguimiento.json", "imagenes"):
+            try:
+                stat = (seguimiento_path / name).stat()
+            except FileNotFoundError:
+                parts.append("0")
+                continue
+            parts.append(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+            last_modified = max(last_modified or 0, stat.st_mtime)
+        return "|".join(parts), last_modified
+
+    def _comments_log(self, folder: str, seguimiento: str) -> Path:
+        return self.seguimiento_path(folder, seguimiento) / COMMENTS_LOG
+
+    @staticmethod
+    def _legacy_log(legacy_path: Path) -> Optional[bytes]:
+        """ El comentarios.json antiguo como registro JSONL, o None si no existe """
+        try:
+            with open(legacy_path, encoding="utf-8") as f:
+                comentarios = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            comentarios = []
+        return "".join(json.dumps(comentario, ensure_ascii=False) + "\n" for comentario in comentarios).encode("utf-8")
+
+    def _open_comments(self, folder: str, seguimiento: str) -> Optional[BinaryIO]:
+        """
+        El registro para leer; si solo está el comentarios.json antiguo, su
+        conversión en memoria (mismos offsets que tendrá al migrarlo)
+        """
+        log_path = self._comments_log(folder, seguimiento)
+        try:
+            return open(log_path, "rb")
+        except FileNotFoundError:
+            legacy = self._legacy_log(log_path.with_name(LEGACY_COMMENTS_FILE))
+            return io.BytesIO(legacy) if legacy is not None else None
+
+    def has_legacy_comments(self, folder: str, seguimiento: str) -> bool:
+        return (self.seguimiento_path(folder, seguimiento) / LEGACY_COMMENTS_FILE).exists()
+
+    def migrate_comments(self, folder: str, seguimiento: str) -> bool:
+        log_path = self._comments_log(folder, seguimiento)
+        legacy_path = log_path.with_name(LEGACY_COMMENTS_FILE)
+        legacy = self._legacy_log(legacy_path)
+        if legacy is None:
+            return False
+        # Un registro ya existente manda: el archivo antiguo solo quedó a medio borrar
+        if not log_path.exists():
+            temp_path = log_path.with_name(f".{COMMENTS_LOG}.migrate.tmp")
+            temp_path.write_bytes(legacy)
+            os.replace(temp_path, log_path)
+        legacy_path.unlink(missing_ok=True)
+        return True
+
+    def add_comment(self, folder: str, seguimiento: str, comentario: Dict) -> None:
+        # Los comentarios antiguos ya se migraron (migrate_comments, en exclusiva)
+        log_path = self._comments_log(folder, seguimiento)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        line = (json.dumps(comentario, ensure_ascii=False) + "\n").encode("utf-8")
+        # Una sola escritura con O_APPEND: dos comentarios a la vez no se pisan
+        fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def list_comments(
+        self, folder: str, seguimiento: str, limit: int, before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        cursor = _parse_cursor(before)
+        f = self._open_comments(folder, seguimiento)
+        if f is None:
+            return [], None
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            end = size if cursor is None else min(cursor, size)
+            lines = _tail_lines(f, end, limit + 1)
+
+        has_more = len(lines) > limit
+        lines = lines[:limit]
+        comentarios = []
+        for _, raw in reversed(lines):
+            try:
+                comentarios.append(json.loads(raw))
+            except ValueError:
+                continue
+        next_cursor = str(lines[-1][0]) if has_more else None
+        return comentarios, next_cursor
+
+    def count_comments(self, folder: str, seguimiento: str) -> int:
+        log_path = self._comments_log(folder, seguimiento)
+        try:
+            f = open(log_path, "rb")
+        except FileNotFoundError:
+            legacy = self._legacy_log(log_path.with_name(LEGACY_COMMENTS_FILE))
+            return legacy.count(b"\n") if legacy is not None else 0
+
+        count_path = log_path.with_name(COMMENTS_COUNT_FILE)
+        with f:
+            stat = os.fstat(f.fileno())
+            # Se parte de la última cuenta si es de este mismo archivo (compactar lo sustituye)
+            position = count = 0
+            try:
+                inode, size, saved = map(int, count_path.read_text().split())
+                if inode == stat.st_ino and size <= stat.st_size:
+                    position, count = size, saved
+            except (FileNotFoundError, ValueError):
+                pass
+            if position == stat.st_size:
+                return count
+            # Solo lo añadido desde entonces; una escritura a medias al final no cuenta
+            f.seek(position)
+            count += sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 16), b""))
+        self._save_comment_count(count_path, stat.st_ino, stat.st_size, count)
+        return count
+
+    @staticmethod
+    def _save_comment_count(count_path: Path, inode: int, size: int, count: int):
+        temp_path = count_path.with_name(f"{count_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            temp_path.write_text(f"{inode} {size} {count}")
+            os.replace(temp_path, count_path)
+        except FileNotFoundError:
+            # La familia se movió a la papelera mientras tanto
+            temp_path.unlink(missing_ok=True)
+
+    def family_version(self, folder: str) -> str:
+        # Solo stat(): datos, registro de comentarios y cada imagen (una
+        # imagen sobrescrita con el mismo nombre no cambia la carpeta)
+        parts = []
+        family_path = self.family_path(folder)
+        for numero in range(1, MAX_SEGUIMIENTOS + 1):
+            seguimiento_path = family_path / f"seguimiento_{numero}"
+            for name in ("seguimiento.json", COMMENTS_LOG, LEGACY_COMMENTS_FILE):
+                try:
+                    stat = (seguimiento_path / name).stat()
+                    parts.append(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+                except FileNotFoundError:
+                    parts.append("0")
+            try:
+                with os.scandir(seguimiento_path / "imagenes") as entries:
+                    parts.extend(
+                        f"{entry.name}:{entry.stat().st_mtime_ns:x}-{entry.stat().st_size:x}"
+                        for entry in sorted(entries, key=lambda entry: entry.name) if entry.is_file()
+                    )
+            except FileNotFoundError:
+                pass
+            parts.append(";")
+        return "|".join(parts)
+
+    def compact_comments(self, folder: str, seguimiento: str) -> int:
+        """
+        Migra el comentarios.json antiguo y reescribe el registro sin líneas
+        dañadas (escrituras interrumpidas)
+        """
+        self.migrate_comments(folder, seguimiento)
+        log_path = self._comments_log(folder, seguimiento)
+        if not log_path.exists():
+            return 0
+        comentarios = []
+        with open(log_path, "rb") as f:
+            for raw in f:
+                try:
+                    comentarios.append(json.loads(raw))
+                except ValueError:
+                    continue
+        temp_path = log_path.with_name(f".{COMMENTS_LOG}.compact.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for comentario in comentarios:
+                f.write(json.dumps(comentario, ensure_ascii=False) + "\n")
+        os.replace(temp_path, log_path)
+        stat = log_path.stat()
+        self._save_comment_count(log_path.with_name(COMMENTS_COUNT_FILE), stat.st_ino, stat.st_size, len(comentarios))
+        return len(comentarios)
+
+    def list_images(self, folder: str, seguimiento: str) -> List[str]:
+        imagenes_path = self.seguimiento_path(folder, seguimiento) / "imagenes"
+        with timer("scan_imagenes"):
+            try:
+                return [entry.name for entry in os.scandir(imagenes_path) if entry.is_file()]
+            except FileNotFoundError:
+                return []
+
+    def save_image(self, folder: str, seguimiento: str, filename: str, fileobj: BinaryIO) -> None:
+        imagenes_path = self.seguimiento_path(folder, seguimiento) / "imagenes"
+        imagenes_path.mkdir(parents=True, exist_ok=True)
+        with open(imagenes_path / _check_name(filename), "wb") as buffer:
+            shutil.copyfileobj(fileobj, buffer)
+
+    def delete_image(self, folder: str, seguimiento: str, filename: str) -> bool:
+        file_path = self.seguimiento_path(folder, seguimiento) / "imagenes" / _check_name(filename)
+        try:
+            file_path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def local_image_path(self, folder: str, seguimiento: str, filename: str) -> Optional[Path]:
+        image_path = self.seguimiento_path(folder, seguimiento) / "imagenes" / _check_name(filename)
+        return image_path if image_path.is_file() else None
+
+
+class _BlobBackend(StorageBackend):
+    """
+    Base de los backends que no guardan las imágenes como archivos: las
+    copian bajo demanda a una carpeta local para servirlas y miniaturizarlas.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    @property
+    def staging_path(self) -> Path:
+        return self.cache_dir / STAGING_DIR
+
+    @abstractmethod
+    def _image_stat(self, folder: str, seguimiento: str, filename: str) -> Optional[Tuple[int, int]]:
+        """ (tamaño, mtime_ns) de la imagen sin leer su contenido, o None """
+
+    @abstractmethod
+    def _read_image(self, folder: str, seguimiento: str, filename: str) -> Optional[Tuple[bytes, int]]:
+        """ (contenido, mtime_ns) de la imagen, o None """
+
+    def local_image_path(self, folder: str, seguimiento: str, filename: str) -> Optional[Path]:
+        image_stat = self._image_stat(folder, seguimiento, filename)
+        if image_stat is None:
+            return None
+        size, mtime_ns = image_stat
+
+        # Copia local al día: no hace falta leer el contenido
+        path = self.cache_dir / _check_name(folder) / _check_name(seguimiento) / "imagenes" / _check_name(filename)
+        try:
+            stat = path.stat()
+            if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+                return path
+        except FileNotFoundError:
+            pass
+
+        blob = self._read_image(folder, seguimiento, filename)
+        if blob is None:
+            return None
+        content, mtime_ns = blob
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        temp_path.write_bytes(content)
+        os.utime(temp_path, ns=(mtime_ns, mtime_ns))
+        os.replace(temp_path, path)
+        return path
+
+
+class MemoryBackend(_BlobBackend):
+    """ Backend en memoria (no persiste entre reinicios) """
+
+    blocking = False
+
+    def __init__(self, cache_dir: str = ".storage_cache/memory"):
+        super().__init__(cache_dir)
+        self.families: Dict[str, Dict] = {}
+        # (folder, seguimiento) -> {"data", "version", "updated", "comments", "images"}
+        self.seguimientos: Dict[Tuple[str, str], Dict] = {}
+        # trash_id -> (familia, {seguimiento: entrada})
+        self.trash: Dict[str, Tuple[Dict, Dict[str, Dict]]] = {}
+
+    def _seguimiento(self, folder: str, seguimiento: str) -> Dict:
+        key = (folder, seguimiento)
+        if key not in self.seguimientos:
+            self.seguimientos[key] = {"data": {}, "version": 0, "updated": None, "comments": [], "images": {}}
+        return self.seguimientos[key]
+
+    def _bump(self, entry: Dict):
+        entry["version"] += 1
+        entry["updated"] = time.time()
+
+    def list_families(self) -> List[str]:
+        return list(self.families)
+
+    def family_exists(self, folder: str) -> bool:
+        return folder in self.families
+
+    def create_family(self, folder: str, familia: Dict) -> None:
+        self.families[folder] = dict(familia)
+
+    def read_family(self, folder: str) -> Dict:
+        return dict(self.families.get(folder, {}))
+
+    def delete_family(self, folder: str) -> bool:
+        if self.families.pop(folder, None) is None:
+            return False
+        for key in [key for key in self.seguimientos if key[0] == folder]:
+            del self.seguimientos[key]
+        return True
+
+    def trash_family(self, folder: str) -> Optional[str]:
+        familia = self.families.pop(folder, None)
+        if familia is None:
+            return None
+        seguimientos = {
+            key[1]: self.seguimientos.pop(key)
+            for key in [key for key in self.seguimientos if key[0] == folder]
+        }
+        trash_id = new_trash_id(folder)
+        self.trash[trash_id] = (familia, seguimientos)
+        return trash_id
+
+    def list_trash(self) -> List[str]:
+        return list(self.trash)
+
+    def restore_family(self, trash_id: str) -> Optional[str]:
+        parsed = parse_trash_id(trash_id)
+        if parsed is None or trash_id not in self.trash:
+            return None
+        folder = parsed[0]
+        if folder in self.families:
+            raise FileExistsError(folder)
+        familia, seguimientos = self.trash.pop(trash_id)
+        self.families[folder] = familia
+        for seguimiento, entry in seguimientos.items():
+            self.seguimientos[(folder, seguimiento)] = entry
+        return folder
+
+    def purge_trash(self, trash_id: str) -> bool:
+        return self.trash.pop(trash_id, None) is not None
+
+    def seguimiento_exists(self, folder: str, seguimiento: str) -> bool:
+        return folder in self.families and seguimiento in SEGUIMIENTO_NAMES
+
+    def has_seguimiento_data(self, folder: str, seguimiento: str) -> bool:
+        return bool(self.seguimientos.get((folder, seguimiento), {}).get("data"))
+
+    def load_seguimiento(self, folder: str, seguimiento: str) -> Dict:
+        entry = self.seguimientos.get((folder, seguimiento))
+        return json.loads(json.dumps(entry["data"])) if entry else {}
+
+    def save_seguimiento(self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes] = None) -> None:
+        entry = self._seguimiento(folder, seguimiento)
+        entry["data"] = json.loads(json.dumps(data))
+        entry["response"] = response
+        self._bump(entry)
+
+    def load_seguimiento_response(self, folder: str, seguimiento: str) -> Optional[bytes]:
+        entry = self.seguimientos.get((folder, seguimiento))
+        return entry.get("response") if entry else None
+
+    def commit_seguimiento(
+        self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes], images: List[Tuple[str, Path]]
+    ) -> None:
+        # Se lee todo antes de tocar la entrada
+        now_ns = time.time_ns()
+        blobs = {_check_name(filename): (staged.read_bytes(), now_ns) for filename, staged in images}
+        data = json.loads(json.dumps(data))
+        entry = self._seguimiento(folder, seguimiento)
+        entry["images"].update(blobs)
+        entry["data"] = data
+        entry["response"] = response
+        self._bump(entry)
+
+    def seguimiento_version(self, folder: str, seguimiento: str) -> Tuple[str, Optional[float]]:
+        entry = self.seguimientos.get((folder, seguimiento))
+        if entry is None:
+            return "0", None
+        return str(entry["version"]), entry["updated"]
+
+    def add_comment(self, folder: str, seguimiento: str, comentario: Dict) -> None:
+        self._seguimiento(folder, seguimiento)["comments"].append(dict(comentario))
+
+    def list_comments(
+        self, folder: str, seguimiento: str, limit: int, before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        entry = self.seguimientos.get((folder, seguimiento))
+        comments = entry["comments"] if entry else []
+        cursor = _parse_cursor(before)
+        end = len(comments) if cursor is None else min(cursor, len(comments))
+        start = max(end - limit, 0)
+        return [dict(c) for c in comments[start:end]], (str(start) if start > 0 else None)
+
+    def count_comments(self, folder: str, seguimiento: str) -> int:
+        entry = self.seguimientos.get((folder, seguimiento))
+        return len(entry["comments"]) if entry else 0
+
+    def list_images(self, folder: str, seguimiento: str) -> List[str]:
+        entry = self.seguimientos.get((folder, seguimiento))
+        return list(entry["images"]) if entry else []
+
+    def save_image(self, folder: str, seguimiento: str, filename: str, fileobj: BinaryIO) -> None:
+        entry = self._seguimiento(folder, seguimiento)
+        entry["images"][_check_name(filename)] = (fileobj.read(), time.time_ns())
+        self._bump(entry)
+
+    def delete_image(self, folder: str, seguimiento: str, filename: str) -> bool:
+        entry = self.seguimientos.get((folder, seguimiento))
+        if not entry or entry["images"].pop(filename, None) is None:
+            return False
+        self._bump(entry)
+        return True
+
+    def _image_stat(self, folder: str, seguimiento: str, filename: str) -> Optional[Tuple[int, int]]:
+        blob = self._read_image(folder, seguimiento, filename)
+        return (len(blob[0]), blob[1]) if blob else None
+
+    def _read_image(self, folder: str, seguimiento: str, filename: str) -> Optional[Tuple[bytes, int]]:
+        entry = self.seguimientos.get((folder, seguimiento))
+        return entry["images"].get(filename) if entry else None
+
+
+class SQLiteBackend(_BlobBackend):
+    """ Backend en un único archivo SQLite """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS familias (
+        folder TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS seguimientos (
+        folder TEXT NOT NULL,
+        seguimiento TEXT NOT NULL,
+        data TEXT NOT NULL,
+        updated_ns INTEGER NOT NULL,
+        response BLOB,
+        PRIMARY KEY (folder, seguimiento)
+    );
+    CREATE TABLE IF NOT EXISTS comentarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        folder TEXT NOT NULL,
+        seguimiento TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_comentarios_seguimiento ON comentarios (folder, seguimiento, id);
+    CREATE TABLE IF NOT EXISTS imagenes (
+        folder TEXT NOT NULL,
+        seguimiento TEXT NOT NULL,
+        name TEXT NOT NULL,
+        content BLOB NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        PRIMARY KEY (folder, seguimiento, name)
+    );
+    """
+
+    def __init__(self, db_path: str = "storage.db", cache_dir: str = ".storage_cache/sqlite"):
+        super().__init__(cache_dir)
+        self.db_path = db_path
+        conn = self._connect()
+        try:
+            conn.executescript(self._SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(seguimientos)")}
+            if "response" not in columns:
+                conn.execute("ALTER TABLE seguimientos ADD COLUMN response BLOB")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    # En la papelera las filas conservan todo y cambian folder por ".papelera/<trash_id>"
+    _TRASH_TABLES = ("familias", "seguimientos", "comentarios", "imagenes")
+
+    def _move_family(self, source: str, target: str) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                moved = conn.execute("UPDATE familias SET folder = ? WHERE folder = ?", (target, source)).rowcount
+                if moved:
+                    for table in self._TRASH_TABLES[1:]:
+                        conn.execute(f"UPDATE {table} SET folder = ? WHERE folder = ?", (target, source))
+        finally:
+            conn.close()
+        return bool(moved)
+
+    def list_families(self) -> List[str]:
+        return [
+            row[0] for row in self._query("SELECT folder FROM familias WHERE folder NOT LIKE ?", (f"{TRASH_DIR}/%",))
+        ]
+
+    def family_exists(self, folder: str) -> bool:
+        return bool(self._query("SELECT 1 FROM familias WHERE folder = ?", (folder,)))
+
+    def create_family(self, folder: str, familia: Dict) -> None:
+        self._query(
+            "INSERT OR REPLACE INTO familias (folder, data) VALUES (?, ?)",
+            (folder, json.dumps(familia, ensure_ascii=False))
+        )
+
+    def read_family(self, folder: str) -> Dict:
+        rows = self._query("SELECT data FROM familias WHERE folder = ?", (folder,))
+        return json.loads(rows[0][0]) if rows else {}
+
+    def delete_family(self, folder: str) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                deleted = conn.execute("DELETE FROM familias WHERE folder = ?", (folder,)).rowcount
+                for table in ("seguimientos", "comentarios", "imagenes"):
+                    conn.execute(f"DELETE FROM {table} WHERE folder = ?", (folder,))
+        finally:
+            conn.close()
+        return bool(deleted)
+
+    def trash_family(self, folder: str) -> Optional[str]:
+        trash_id = new_trash_id(folder)
+        return trash_id if self._move_family(folder, f"{TRASH_DIR}/{trash_id}") else None
+
+    def list_trash(self) -> List[str]:
+        rows = self._query("SELECT folder FROM familias WHERE folder LIKE ?", (f"{TRASH_DIR}/%",))
+        return [row[0][len(TRASH_DIR) + 1:] for row in rows]
+
+    def restore_family(self, trash_id: str) -> Optional[str]:
+        parsed = parse_trash_id(trash_id)
+        if parsed is None:
+            return None
+        folder = parsed[0]
+        if not self.family_exists(f"{TRASH_DIR}/{trash_id}"):
+            return None
+        if self.family_exists(folder):
+            raise FileExistsError(folder)
+        return folder if self._move_family(f"{TRASH_DIR}/{trash_id}", folder) else None
+
+    def purge_trash(self, trash_id: str) -> bool:
+        return self.delete_family(f"{TRASH_DIR}/{trash_id}")
+
+    def seguimiento_exists(self, folder: str, seguimiento: str) -> bool:
+        return seguimiento in SEGUIMIENTO_NAMES and self.family_exists(folder)
+
+    def has_seguimiento_data(self, folder: str, seguimiento: str) -> bool:
+        return bool(self._query(
+            "SELECT 1 FROM seguimientos WHERE folder = ? AND seguimiento = ?", (folder, seguimiento)
+        ))
+
+    def load_seguimiento(self, folder: str, seguimiento: str) -> Dict:
+        rows = self._query(
+            "SELECT data FROM seguimientos WHERE folder = ? AND seguimiento = ?", (folder, seguimiento)
+        )
+        return json.loads(rows[0][0]) if rows else {}
+
+    def save_seguimiento(self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes] = None) -> None:
+        self._query(
+            "INSERT OR REPLACE INTO seguimientos (folder, seguimiento, data, updated_ns, response) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (folder, seguimiento, json.dumps(data, ensure_ascii=False), time.time_ns(), response)
+        )
+
+    def load_seguimiento_response(self, folder: str, seguimiento: str) -> Optional[bytes]:
+        rows = self._query(
+            "SELECT response FROM seguimientos WHERE folder = ? AND seguimiento = ?", (folder, seguimiento)
+        )
+        return rows[0][0] if rows else None
+
+    def commit_seguimiento(
+        self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes], images: List[Tuple[str, Path]]
+    ) -> None:
+        now_ns = time.time_ns()
+        conn = self._connect()
+        try:
+            # Una sola transacción: las imágenes y los datos, o nada
+            with conn:
+                for filename, staged in images:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO imagenes (folder, seguimiento, name, content, mtime_ns) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (folder, seguimiento, _check_name(filename), staged.read_bytes(), now_ns)
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO seguimientos (folder, seguimiento, data, updated_ns, response) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (folder, seguimiento, json.dumps(data, ensure_ascii=False), now_ns, response)
+                )
+        finally:
+            conn.close()
+
+    def seguimiento_version(self, folder: str, seguimiento: str) -> Tuple[str, Optional[float]]:
+        rows = self._query(
+            "SELECT (SELECT updated_ns FROM seguimientos WHERE folder = ?1 AND seguimiento = ?2), "
+            "(SELECT MAX(mtime_ns) || ':' || COUNT(*) FROM imagenes WHERE folder = ?1 AND seguimiento = ?2)",
+            (folder, seguimiento)
+        )
+        updated_ns, images = rows[0]
+        last_modified = updated_ns / 1e9 if updated_ns else None
+        return f"{updated_ns or 0}|{images}", last_modified
+
+    def add_comment(self, folder: str, seguimiento: str, comentario: Dict) -> None:
+        self._query(
+            "INSERT INTO comentarios (folder, seguimiento, data) VALUES (?, ?, ?)",
+            (folder, seguimiento, json.dumps(comentario, ensure_ascii=False))
+        )
+
+    def list_comments(
+        self, folder: str, seguimiento: str, limit: int, before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        cursor = _parse_cursor(before)
+        rows = self._query(
+            "SELECT id, data FROM comentarios WHERE folder = ? AND seguimiento = ? AND id < ? "
+            "ORDER BY id DESC LIMIT ?",
+            (folder, seguimiento, cursor if cursor is not None else 2 ** 63 - 1, limit + 1)
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = str(rows[-1][0]) if has_more else None
+        return [json.loads(data) for _, data in reversed(rows)], next_cursor
+
+    def count_comments(self, folder: str, seguimiento: str) -> int:
+        return self._query(
+            "SELECT COUNT(*) FROM comentarios WHERE folder = ? AND seguimiento = ?", (folder, seguimiento)
+        )[0][0]
+
+    def family_version(self, folder: str) -> str:
+        rows = self._query(
+            "SELECT 's', seguimiento, updated_ns, 0 FROM seguimientos WHERE folder = ?1 "
+            "UNION ALL SELECT 'i', seguimiento, MAX(mtime_ns), COUNT(*) FROM imagenes WHERE folder = ?1 GROUP BY seguimiento "
+            "UNION ALL SELECT 'c', seguimiento, MAX(id), COUNT(*) FROM comentarios WHERE folder = ?1 GROUP BY seguimiento",
+            (folder,)
+        )
+        return "|".join(f"{kind}{seguimiento}:{value}:{count}" for kind, seguimiento, value, count in sorted(rows))
+
+    def list_images(self, folder: str, seguimiento: str) -> List[str]:
+        rows = self._query(
+            "SELECT name FROM imagenes WHERE folder = ? AND seguimiento = ? ORDER BY name",
+            (folder, seguimiento)
+        )
+        return [row[0] for row in rows]
+
+    def save_image(self, folder: str, seguimiento: str, filename: str, fileobj: BinaryIO) -> None:
+        self._query(
+            "INSERT OR REPLACE INTO imagenes (folder, seguimiento, name, content, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            (folder, seguimiento, _check_name(filename), fileobj.read(), time.time_ns())
+        )
+
+    def delete_image(self, folder: str, seguimiento: str, filename: str) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                return bool(conn.execute(
+                    "DELETE FROM imagenes WHERE folder = ? AND seguimiento = ? AND name = ?",
+                    (folder, seguimiento, filename)
+                ).rowcount)
+        finally:
+            conn.close()
+
+    def _image_stat(self, folder: str, seguimiento: str, filename: str) -> Optional[Tuple[int, int]]:
+        rows = self._query(
+            "SELECT length(content), mtime_ns FROM imagenes WHERE folder = ? AND seguimiento = ? AND name = ?",
+            (folder, seguimiento, filename)
+        )
+        return (rows[0][0], rows[0][1]) if rows else None
+
+    def _read_image(self, folder: str, seguimiento: str, filename: str) -> Optional[Tuple[bytes, int]]:
+        rows = self._query(
+            "SELECT content, mtime_ns FROM imagenes WHERE folder = ? AND seguimiento = ? AND name = ?",
+            (folder, seguimiento, filename)
+        )
+        return (rows[0][0], rows[0][1]) if rows else None
+
+
+class Storage:
+    """ Fachada asíncrona sobre un backend; es lo que usan las rutas """
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def _call_disk(self, method, *args):
+        # Tocan archivos también en los backends no bloqueantes (staging, subidas, caché de imágenes)
+        return await asyncio.to_thread(method, *args)
+
+    # Familias
+    async def list_families(self) -> List[str]:
+        return await self._call(self.backend.list_families)
+
+    async def family_exists(self, folder: str) -> bool:
+        return await self._call(self.backend.family_exists, folder)
+
+    async def create_family(self, folder: str, familia: Dict) -> None:
+        await self._call(self.backend.create_family, folder, familia)
+
+    async def read_family(self, folder: str) -> Dict:
+        return await self._call(self.backend.read_family, folder)
+
+    async def delete_family(self, folder: str) -> bool:
+        return await self._call(self.backend.delete_family, folder)
+
+    # Papelera
+    async def trash_family(self, folder: str) -> Optional[str]:
+        return await self._call(self.backend.trash_family, folder)
+
+    async def list_trash(self) -> List[str]:
+        return await self._call(self.backend.list_trash)
+
+    async def restore_family(self, trash_id: str) -> Optional[str]:
+        return await self._call(self.backend.restore_family, trash_id)
+
+    async def purge_trash(self, trash_id: str) -> bool:
+        return await self._call(self.backend.purge_trash, trash_id)
+
+    # Seguimientos
+    async def seguimiento_exists(self, folder: str, seguimiento: str) -> bool:
+        return await self._call(self.backend.seguimiento_exists, folder, seguimiento)
+
+    async def seguimientos_with_data(self, folder: str) -> List[str]:
+        return await self._call(self.backend.seguimientos_with_data, folder)
+
+    async def load_seguimiento(self, folder: str, seguimiento: str) -> Dict:
+        return await self._call(self.backend.load_seguimiento, folder, seguimiento)
+
+    async def save_seguimiento(self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes] = None) -> None:
+        await self._call(self.backend.save_seguimiento, folder, seguimiento, data, response)
+
+    async def load_seguimiento_response(self, folder: str, seguimiento: str) -> Optional[bytes]:
+        return await self._call(self.backend.load_seguimiento_response, folder, seguimiento)
+
+    async def commit_seguimiento(
+        self, folder: str, seguimiento: str, data: Dict, response: Optional[bytes], images: List[Tuple[str, Path]]
+    ) -> None:
+        await self._call_disk(self.backend.commit_seguimiento, folder, seguimiento, data, response, images)
+
+    @property
+    def staging_path(self) -> Path:
+        return self.backend.staging_path
+
+    async def seguimiento_version(self, folder: str, seguimiento: str) -> Tuple[str, Optional[float]]:
+        return await self._call(self.backend.seguimiento_version, folder, seguimiento)
+
+    # Comentarios
+    async def add_comment(self, folder: str, seguimiento: str, comentario: Dict) -> None:
+        await self._call(self.backend.add_comment, folder, seguimiento, comentario)
+
+    async def list_comments(
+        self, folder: str, seguimiento: str, limit: int = COMMENTS_PAGE_SIZE, before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        return await self._call(self.backend.list_comments, folder, seguimiento, limit, before)
+
+    async def count_comments(self, folder: str, seguimiento: str) -> int:
+        return await self._call(self.backend.count_comments, folder, seguimiento)
+
+    async def has_legacy_comments(self, folder: str, seguimiento: str) -> bool:
+        return await self._call(self.backend.has_legacy_comments, folder, seguimiento)
+
+    async def migrate_comments(self, folder: str, seguimiento: str) -> bool:
+        return await self._call(self.backend.migrate_comments, folder, seguimiento)
+
+    async def family_version(self, folder: str) -> str:
+        return await self._call(self.backend.family_version, folder)
+
+    # Imágenes
+    async def list_images(self, folder: str, seguimiento: str) -> List[str]:
+        return await self._call(self.backend.list_images, folder, seguimiento)
+
+    async def save_image(self, folder: str, seguimiento: str, filename: str, fileobj: BinaryIO) -> None:
+        await self._call_disk(self.backend.save_image, folder, seguimiento, filename, fileobj)
+
+    async def delete_image(self, folder: str, seguimiento: str, filename: str) -> bool:
+        return await self._call(self.backend.delete_image, folder, seguimiento, filename)
+
+    async def local_image_path(self, folder: str, seguimiento: str, filename: str) -> Optional[Path]:
+        return await self._call_disk(self.backend.local_image_path, folder, seguimiento, filename)
+
+
+def create_backend(name: str) -> StorageBackend:
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(os.getenv("STORAGE_SQLITE_PATH", "storage.db"))
+    if name == "filesystem":
+        return FileSystemBackend()
+    raise ValueError(f"Backend de almacenamiento desconocido: {name}")
+
+
+storage = Storage(create_backend(os.getenv("STORAGE_BACKEND", "filesystem")))
+
+
+def compact_all_comments() -> Tuple[int, int]:
+    """
+    Compacta los comentarios de todas las familias
+
+    Returns:
+        (seguimientos procesados, comentarios conservados)
+    """
+    backend = storage.backend
+    seguimientos = comentarios = 0
+    for folder in backend.list_families():
+        for seguimiento in sorted(SEGUIMIENTO_NAMES):
+            # Exclusivo: un comentario añadido durante la reescritura se perdería
+            with seguimiento_lock_sync(folder, seguimiento, exclusive=True):
+                comentarios += backend.compact_comments(folder, seguimiento)
+            seguimientos += 1
+    return seguimientos, comentarios
+
+
+def prune_placeholders() -> Tuple[int, int]:
+    """
+    Migración: borra los árboles de seguimiento vacíos creados de antemano
+
+    Returns:
+        (familias revisadas, carpetas borradas)
+    """
+    backend = storage.backend
+    if not isinstance(backend, FileSystemBackend):
+        return 0, 0
+    families = pruned = 0
+    for folder in backend.list_families():
+        for seguimiento in sorted(SEGUIMIENTO_NAMES):
+            with seguimiento_lock_sync(folder, seguimiento, exclusive=True):
+                pruned += backend.prune_placeholder(folder, seguimiento)
+        families += 1
+    return families, pruned
+
+
+def migrate_layout(limit: Optional[int] = None, dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Migración en línea: mueve las familias de documents/ a la disposición
+    repartida, una a una y con su bloqueo exclusivo (las peticiones sobre esa
+    familia esperan solo lo que tarda el rename)
+
+    Returns:
+        (familias planas encontradas, familias movidas)
+    """
+    backend = storage.backend
+    if not isinstance(backend, FileSystemBackend):
+        return 0, 0
+    pending = backend.list_flat_families()
+    moved = 0
+    for folder in pending[:limit]:
+        if dry_run:
+            continue
+        with document_lock_sync(folder, exclusive=True):
+            moved += backend.migrate_family(folder)
+    return len(pending), moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento del almacenamiento")
+    parser.add_argument("command", choices=["compact-comments", "prune-placeholders", "migrate-layout"])
+    parser.add_argument("--limit", type=int, default=None, help="migrate-layout: familias por ejecución")
+    parser.add_argument("--dry-run", action="store_true", help="migrate-layout: solo contar")
+    args = parser.parse_args()
+
+    if args.command == "compact-comments":
+        total_seguimientos, total_comentarios = compact_all_comments()
+        print(f"Comentarios compactados: {total_comentarios} en {total_seguimientos} seguimientos")
+    elif args.command == "prune-placeholders":
+        total_familias, total_borradas = prune_placeholders()
+        print(f"Carpetas vacías borradas: {total_borradas} en {total_familias} familias")
+    elif args.command == "migrate-layout":
+        total_planas, total_movidas = migrate_layout(args.limit, args.dry_run)
+        print(f"Familias movidas a la disposición repartida: {total_movidas} de {total_planas}")
@@ -0,0 +1,239 @@
+# back/src/utils/aggregates.py
+"""
+Agregados materializados para los informes del programa.
+
+- Tasa de completado por asesor (familias y seguimientos enviados).
+- Embudo: cuántas familias tienen enviado cada seguimiento.
+- Frecuencia de cada dimensión intervenida.
+- Compromisos por responsable.
+
+Se guardan en el archivo del catálogo. Por cada seguimiento enviado se
+conserva su aportación (agregados_hechos); al volver a guardarlo se resta la
+anterior y se suma la nueva, así los contadores se actualizan sin recorrer
+documents/. Las funciones son síncronas y las rutas las llaman con
+asyncio.to_thread; init() crea las tablas y las llena al arrancar si no
+existen. Para reconciliarlos con el almacenamiento:
+
+    python -m utils.aggregates rebuild
+"""
+import argparse
+import json
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from storage import storage, MAX_SEGUIMIENTOS
+from utils import catalog
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agregados_hechos (
+    folder TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    adviser TEXT NOT NULL,
+    dimensiones TEXT NOT NULL,
+    responsables TEXT NOT NULL,
+    PRIMARY KEY (folder, numero)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS agregados (
+    tipo TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    etiqueta TEXT NOT NULL,
+    valor INTEGER NOT NULL,
+    PRIMARY KEY (tipo, clave)
+) WITHOUT ROWID;
+"""
+
+_schema_ready = False
+
+
+def _create_schema() -> bool:
+    """ Crea las tablas si faltan; True si no existían """
+    global _schema_ready
+    with catalog.connect() as conn:
+        is_new = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'agregados'"
+        ).fetchone() is None
+        conn.executescript(_SCHEMA)
+    _schema_ready = True
+    return is_new
+
+
+def _ensure_schema():
+    if not _schema_ready:
+        _create_schema()
+
+
+def init() -> bool:
+    """
+    Prepara los agregados al arrancar: crea las tablas y, si son nuevas, las
+    llena desde el almacenamiento
+
+    Returns:
+        True si se regeneraron
+    """
+    is_new = _create_schema()
+    if is_new:
+        rebuild()
+    return is_new
+
+
+def _add(conn, tipo: str, etiqueta: str, delta: int, clave: Optional[str] = None):
+    conn.execute(
+        "INSERT INTO agregados (tipo, clave, etiqueta, valor) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(tipo, clave) DO UPDATE SET valor = valor + excluded.valor",
+        (tipo, clave if clave is not None else etiqueta, etiqueta, delta)
+    )
+
+
+def _facts(data: Dict) -> Tuple[List[str], Dict[str, int]]:
+    """ (dimensiones, compromisos por responsable) que aporta un seguimiento """
+    dimensiones = sorted({d for d in data.get("dimensiones") or [] if d})
+    responsables = Counter(
+        " ".join((c.get("responsable") or "").split())
+        for c in data.get("compromisos") or []
+    )
+    responsables.pop("", None)
+    return dimensiones, dict(responsables)
+
+
+def _apply(conn, numero: int, adviser: str,
+           dimensiones: List[str], responsables: Dict[str, int], sign: int):
+    _add(conn, "asesor_enviados", adviser, sign)
+    _add(conn, "embudo", str(numero), sign)
+    for dimension in dimensiones:
+        _add(conn, "dimension", dimension, sign, catalog.normalize_text(dimension))
+    for responsable, total in responsables.items():
+        _add(conn, "responsable", responsable, sign * total, catalog.normalize_text(responsable))
+
+
+def _retract(conn, folder: str, numero: Optional[int] = None):
+    """ Resta la aportación guardada de un seguimiento (o de toda la familia) """
+    condition, params = "folder = ?", (folder,)
+    if numero is not None:
+        condition, params = "folder = ? AND numero = ?", (folder, numero)
+    rows = conn.execute(
+        f"SELECT numero, adviser, dimensiones, responsables FROM agregados_hechos WHERE {condition}", params
+    ).fetchall()
+    for row_numero, adviser, dimensiones, responsables in rows:
+        _apply(conn, row_numero, adviser, json.loads(dimensiones), json.loads(responsables), -1)
+    conn.execute(f"DELETE FROM agregados_hechos WHERE {condition}", params)
+
+
+def _record(conn, folder: str, numero: int, data: Dict):
+    _, adviser = catalog.parse_folder(folder)
+    dimensiones, responsables = _facts(data)
+    conn.execute(
+        "INSERT INTO agregados_hechos (folder, numero, adviser, dimensiones, responsables) VALUES (?, ?, ?, ?, ?)",
+        (folder, numero, adviser, json.dumps(dimensiones, ensure_ascii=False),
+         json.dumps(responsables, ensure_ascii=False))
+    )
+    _apply(conn, numero, adviser, dimensiones, responsables, 1)
+
+
+def _cleanup(conn):
+    conn.execute("DELETE FROM agregados WHERE valor <= 0")
+
+
+def family_created(folder: str):
+    """ Una familia nueva cuenta en el total de su asesor """
+    _ensure_schema()
+    _, adviser = catalog.parse_folder(folder)
+    with catalog.connect() as conn:
+        _add(conn, "asesor_familias", adviser, 1)
+
+
+def seguimiento_saved(folder: str, numero: int, data: Dict):
+    """ Sustituye la aportación anterior del seguimiento por la de los datos nuevos """
+    _ensure_schema()
+    with catalog.connect() as conn:
+        _retract(conn, folder, numero)
+        _record(conn, folder, numero, data)
+        _cleanup(conn)
+
+
+def family_deleted(folder: str):
+    """ Resta la familia y todos sus seguimientos """
+    _ensure_schema()
+    _, adviser = catalog.parse_folder(folder)
+    with catalog.connect() as conn:
+        _retract(conn, folder)
+        _add(conn, "asesor_familias", adviser, -1)
+        _cleanup(conn)
+
+
+def report() -> Dict:
+    """ Todos los agregados; el coste depende del número de claves, no de familias """
+    _ensure_schema()
+    with catalog.connect() as conn:
+        rows = conn.execute("SELECT tipo, clave, etiqueta, valor FROM agregados").fetchall()
+
+    by_type: Dict[str, Dict[str, Tuple[str, int]]] = {}
+    for tipo, clave, etiqueta, valor in rows:
+        by_type.setdefault(tipo, {})[clave] = (etiqueta, valor)
+
+    familias = by_type.get("asesor_familias", {})
+    enviados = by_type.get("asesor_enviados", {})
+    asesores = []
+    for adviser in sorted(set(familias) | set(enviados)):
+        total_familias = familias.get(adviser, ("", 0))[1]
+        total_enviados = enviados.get(adviser, ("", 0))[1]
+        posibles = total_familias * MAX_SEGUIMIENTOS
+        asesores.append({
+            "adviser": adviser,
+            "familias": total_familias,
+            "enviados": total_enviados,
+            "tasa_completado": round(total_enviados / posibles, 4) if posibles else 0.0
+        })
+
+    embudo = by_type.get("embudo", {})
+
+    def ranking(tipo: str) -> List[Dict]:
+        items = [
+            {"clave": clave, "etiqueta": etiqueta, "total": valor}
+            for clave, (etiqueta, valor) in by_type.get(tipo, {}).items()
+        ]
+        return sorted(items, key=lambda item: (-item["total"], item["clave"]))
+
+    return {
+        "asesores": asesores,
+        "embudo": [
+            {"numero": str(i), "enviados": embudo.get(str(i), ("", 0))[1]}
+            for i in range(1, MAX_SEGUIMIENTOS + 1)
+        ],
+        "dimensiones": ranking("dimension"),
+        "responsables": ranking("responsable"),
+        "actualizado": catalog.version()[1]
+    }
+
+
+def rebuild() -> int:
+    """
+    Recalcula todos los agregados leyendo el almacenamiento
+
+    Returns:
+        Número de seguimientos enviados contabilizados
+    """
+    backend = storage.backend
+    total = 0
+    with catalog.connect() as conn:
+        conn.executescript(_SCHEMA)
+        conn.execute("DELETE FROM agregados_hechos")
+        conn.execute("DELETE FROM agregados")
+        for folder in backend.list_families():
+            _, adviser = catalog.parse_folder(folder)
+            _add(conn, "asesor_familias", adviser, 1)
+            for seguimiento in backend.seguimientos_with_data(folder):
+                data = backend.load_seguimiento(folder, seguimiento)
+                if data:
+                    _record(conn, folder, int(seguimiento.replace("seguimiento_", "")), data)
+                    total += 1
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agregados para informes del programa")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        total = rebuild()
+        print(f"Agregados regenerados: {total} seguimientos enviados")
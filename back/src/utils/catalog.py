@@ -0,0 +1,421 @@
+# back/src/utils/catalog.py
+"""
+Catálogo persistente (SQLite) de familias y seguimientos.
+
+Evita recorrer la carpeta documents/ en cada carga del dashboard: guarda por
+familia su número, asesor, apellido y el estado "enviado" de cada
+seguimiento. Se actualiza de forma incremental desde las rutas y se puede
+regenerar desde el almacenamiento (la carpeta documents/) con:
+
+    python -m utils.catalog rebuild
+
+Todas las funciones son síncronas (sqlite3 y el backend de almacenamiento):
+las rutas las llaman con asyncio.to_thread. El esquema se crea, y el
+catálogo se llena si es nuevo, con init() al arrancar la aplicación.
+
+También sirve las páginas del dashboard (page_families) con paginación por
+cursor: cada página es una consulta por índice, sin importar cuántas
+familias haya.
+"""
+import argparse
+import base64
+import json
+import sqlite3
+import time
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from storage import storage, MAX_SEGUIMIENTOS
+
+CATALOG_DB_PATH = "catalog.db"
+# Se incrementa al cambiar las tablas derivadas; el catálogo se regenera solo
+SCHEMA_VERSION = 2
+
+# Ordenaciones admitidas por page_families ("-" delante = descendente)
+SORT_COLUMNS = {
+    "doc_number": "doc_number",
+    "apellido": "apellido_norm",
+    "completados": "completados",
+}
+# Filtro por estado: condición sobre el número de seguimientos completados
+ESTADO_FILTERS = {
+    "sin_iniciar": "completados = 0",
+    "en_curso": f"completados > 0 AND completados < {MAX_SEGUIMIENTOS}",
+    "completa": f"completados >= {MAX_SEGUIMIENTOS}",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS familias (
+    folder TEXT PRIMARY KEY,
+    doc_number TEXT NOT NULL,
+    adviser TEXT NOT NULL,
+    apellido TEXT NOT NULL DEFAULT '',
+    apellido_norm TEXT NOT NULL DEFAULT '',
+    completados INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_familias_adviser ON familias (adviser, doc_number, folder);
+CREATE INDEX IF NOT EXISTS idx_familias_adviser_apellido ON familias (adviser, apellido_norm, folder);
+CREATE INDEX IF NOT EXISTS idx_familias_adviser_completados ON familias (adviser, completados, folder);
+CREATE INDEX IF NOT EXISTS idx_familias_doc_number ON familias (doc_number, folder);
+CREATE INDEX IF NOT EXISTS idx_familias_apellido ON familias (apellido_norm, folder);
+CREATE INDEX IF NOT EXISTS idx_familias_completados ON familias (completados, folder);
+CREATE TABLE IF NOT EXISTS seguimientos (
+    folder TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    enviado INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (folder, numero)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_schema_ready = False
+
+
+def parse_folder(folder: str) -> Tuple[str, str]:
+    """ Separa 'documento_{doc_number}_{adviser}' en (doc_number, adviser) """
+    base_name = folder.replace("documento_", "", 1)
+    doc_number, _, adviser = base_name.rpartition("_")
+    return doc_number, adviser
+
+
+def normalize_text(text: str) -> str:
+    """ Minúsculas y sin tildes, para ordenar y filtrar por apellido """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+def _open() -> sqlite3.Connection:
+    conn = sqlite3.connect(CATALOG_DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _touch(conn: sqlite3.Connection):
+    """ Incrementar la versión del catálogo (sirve de validador HTTP del dashboard) """
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('version', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (int(time.time()),)
+    )
+
+
+def _ensure_schema() -> bool:
+    """
+    Crea el esquema o lo actualiza si es de una versión anterior
+
+    Returns:
+        True si las tablas quedaron vacías y hay que regenerar el catálogo
+    """
+    conn = _open()
+    try:
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+            if row and row[0] == SCHEMA_VERSION:
+                return False
+            # Las tablas son derivadas del almacenamiento: se rehacen (meta conserva la versión)
+            conn.execute("DROP TABLE IF EXISTS familias")
+            conn.execute("DROP TABLE IF EXISTS seguimientos")
+            conn.executescript(_SCHEMA)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema', ?)", (SCHEMA_VERSION,))
+            return True
+    finally:
+        conn.close()
+
+
+def init() -> bool:
+    """
+    Prepara el catálogo al arrancar: crea o actualiza el esquema y, si las
+    tablas quedaron vacías, lo regenera desde el almacenamiento
+
+    Returns:
+        True si se regeneró
+    """
+    global _schema_ready
+    needs_fill = _ensure_schema()
+    _schema_ready = True
+    if needs_fill:
+        rebuild()
+    return needs_fill
+
+
+@contextmanager
+def connect():
+    """ Conexión al catálogo; crea el esquema si falta (el llenado lo hace init()) """
+    global _schema_ready
+    if not _schema_ready:
+        _ensure_schema()
+        _schema_ready = True
+
+    conn = _open()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _scan_family(folder: str) -> Tuple[Tuple, List[Tuple]]:
+    """ Lee del almacenamiento la fila de la familia y las de sus seguimientos """
+    # Backend síncrono: solo se llega aquí desde asyncio.to_thread o la línea de comandos
+    backend = storage.backend
+    doc_number, adviser = parse_folder(folder)
+    familia = (folder, doc_number, adviser, backend.read_family(folder).get("apellido", ""))
+    enviados = set(backend.seguimientos_with_data(folder))
+    seguimientos = [
+        (folder, i, int(f"seguimiento_{i}" in enviados))
+        for i in range(1, MAX_SEGUIMIENTOS + 1)
+    ]
+    return familia, seguimientos
+
+
+def _write_family(conn: sqlite3.Connection, familia: Tuple, seguimientos: List[Tuple]):
+    folder, doc_number, adviser, apellido = familia
+    completados = sum(enviado for _, _, enviado in seguimientos)
+    conn.execute(
+        "INSERT OR REPLACE INTO familias (folder, doc_number, adviser, apellido, apellido_norm, completados) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (folder, doc_number, adviser, apellido, normalize_text(apellido), completados)
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO seguimientos (folder, numero, enviado) VALUES (?, ?, ?)",
+        seguimientos
+    )
+
+
+def upsert_family(folder: str, apellido: str):
+    """ Registra una familia nueva con sus seguimientos pendientes """
+    doc_number, adviser = parse_folder(folder)
+    seguimientos = [(folder, i, 0) for i in range(1, MAX_SEGUIMIENTOS + 1)]
+    with connect() as conn:
+        conn.execute("DELETE FROM seguimientos WHERE folder = ?", (folder,))
+        _write_family(conn, (folder, doc_number, adviser, apellido), seguimientos)
+        _touch(conn)
+
+
+def index_family(folder: str):
+    """ Vuelve a leer una familia del almacenamiento y actualiza su entrada """
+    exists = storage.backend.family_exists(folder)
+    with connect() as conn:
+        conn.execute("DELETE FROM familias WHERE folder = ?", (folder,))
+        conn.execute("DELETE FROM seguimientos WHERE folder = ?", (folder,))
+        if exists:
+            _write_family(conn, *_scan_family(folder))
+        _touch(conn)
+
+
+def set_enviado(folder: str, numero: int, enviado: bool = True):
+    """ Marca el estado de envío de un seguimiento """
+    with connect() as conn:
+        known = conn.execute("SELECT 1 FROM familias WHERE folder = ?", (folder,)).fetchone()
+        if known:
+            conn.execute(
+                "INSERT OR REPLACE INTO seguimientos (folder, numero, enviado) VALUES (?, ?, ?)",
+                (folder, numero, int(enviado))
+            )
+            conn.execute(
+                "UPDATE familias SET completados = "
+                "(SELECT COUNT(*) FROM seguimientos WHERE folder = ?1 AND enviado = 1) WHERE folder = ?1",
+                (folder,)
+            )
+            _touch(conn)
+    if not known:
+        index_family(folder)
+
+
+def remove_family(folder: str):
+    """ Elimina una familia del catálogo """
+    with connect() as conn:
+        conn.execute("DELETE FROM familias WHERE folder = ?", (folder,))
+        conn.execute("DELETE FROM seguimientos WHERE folder = ?", (folder,))
+        _touch(conn)
+
+
+def version() -> Tuple[int, int]:
+    """ (versión, fecha de la última modificación) del catálogo """
+    with connect() as conn:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+    return meta.get("version", 0), meta.get("updated_at", 0)
+
+
+def list_families(adviser: Optional[str] = None) -> List[Dict]:
+    """
+    Lista las familias con sus seguimientos en una sola consulta
+
+    Args:
+        adviser: si se indica, solo las familias de ese asesor
+
+    Returns:
+        Lista con el mismo formato que espera index.html
+    """
+    query = (
+        "SELECT f.folder, f.doc_number, f.adviser, f.apellido, s.numero, s.enviado "
+        "FROM familias f LEFT JOIN seguimientos s ON s.folder = f.folder "
+    )
+    params: Tuple = ()
+    if adviser is not None:
+        query += "WHERE f.adviser = ? "
+        params = (adviser,)
+    query += "ORDER BY f.doc_number, f.folder, s.numero"
+
+    documents: List[Dict] = []
+    with connect() as conn:
+        current = None
+        for folder, doc_number, doc_adviser, apellido, numero, enviado in conn.execute(query, params):
+            if current is None or current["folder"] != folder:
+                current = {
+                    "folder": folder,
+                    "doc_adviser": doc_adviser,
+                    "doc_number": doc_number,
+                    "apellido": apellido,
+                    "seguimientos": []
+                }
+                documents.append(current)
+            if numero is not None:
+                current["seguimientos"].append({
+                    "id": f"seguimiento_{numero}",
+                    "numero": str(numero),
+                    "enviado": bool(enviado)
+                })
+    return documents
+
+
+def encode_cursor(*values) -> str:
+    """ Cursor opaco con la clave de ordenación de la última fila de una página """
+    raw = json.dumps(list(values), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor no válido")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor no válido")
+    return values
+
+
+def _seguimientos_of(conn: sqlite3.Connection, folders: List[str]) -> Dict[str, List[Dict]]:
+    placeholders = ",".join("?" * len(folders))
+    result: Dict[str, List[Dict]] = {folder: [] for folder in folders}
+    query = (
+        f"SELECT folder, numero, enviado FROM seguimientos WHERE folder IN ({placeholders}) "
+        "ORDER BY folder, numero"
+    )
+    for folder, numero, enviado in conn.execute(query, folders):
+        result[folder].append({
+            "id": f"seguimiento_{numero}",
+            "numero": str(numero),
+            "enviado": bool(enviado)
+        })
+    return result
+
+
+def page_families(
+    adviser: Optional[str] = None,
+    apellido: Optional[str] = None,
+    estado: Optional[str] = None,
+    sort: str = "doc_number",
+    limit: int = 25,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Una página de familias con paginación por cursor (keyset)
+
+    Args:
+        adviser: solo las familias de ese asesor
+        apellido: prefijo del apellido (sin distinguir mayúsculas ni tildes)
+        estado: "sin_iniciar", "en_curso" o "completa"
+        sort: clave de SORT_COLUMNS, con "-" delante para orden descendente
+        limit: tamaño de la página
+        cursor: el next_cursor de la página anterior
+
+    Returns:
+        (familias con el formato de list_families más "completados", next_cursor)
+    """
+    descending = sort.startswith("-")
+    column = SORT_COLUMNS[sort.lstrip("-")]
+    direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+
+    conditions, params = [], []
+    if adviser is not None:
+        conditions.append("adviser = ?")
+        params.append(adviser)
+    if apellido:
+        prefix = normalize_text(apellido)
+        conditions.append("apellido_norm >= ? AND apellido_norm < ?")
+        params += [prefix, prefix + "\U0010ffff"]
+    if estado:
+        conditions.append(ESTADO_FILTERS[estado])
+    if cursor:
+        conditions.append(f"({column}, folder) {comparison} (?, ?)")
+        params += decode_cursor(cursor, 2)
+
+    query = f"SELECT folder, doc_number, adviser, apellido, completados, {column} FROM familias"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {column} {direction}, folder {direction} LIMIT ?"
+    params.append(limit + 1)
+
+    with connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        seguimientos = _seguimientos_of(conn, [row[0] for row in rows]) if rows else {}
+
+    documents = [
+        {
+            "folder": folder,
+            "doc_adviser": doc_adviser,
+            "doc_number": doc_number,
+            "apellido": apellido_value,
+            "completados": completados,
+            "seguimientos": seguimientos[folder]
+        }
+        for folder, doc_number, doc_adviser, apellido_value, completados, _ in rows
+    ]
+    next_cursor = encode_cursor(rows[-1][5], rows[-1][0]) if has_more else None
+    return documents, next_cursor
+
+
+def rebuild() -> int:
+    """
+    Regenera el catálogo completo a partir del almacenamiento
+
+    Returns:
+        Número de familias indexadas
+    """
+    rows = [_scan_family(folder) for folder in storage.backend.list_families()]
+
+    _ensure_schema()
+    conn = _open()
+    try:
+        with conn:
+            conn.execute("DELETE FROM familias")
+            conn.execute("DELETE FROM seguimientos")
+            for familia, seguimientos in rows:
+                _write_family(conn, familia, seguimientos)
+            _touch(conn)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catálogo de familias y seguimientos")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        total = rebuild()
+        print(f"Catálogo regenerado: {total} familias")
@@ -0,0 +1,200 @@
+# back/src/utils/compromisos.py
+"""
+Índice de compromisos por fecha de cumplimiento.
+
+Cada compromiso de un seguimiento guardado se copia a una tabla del catálogo
+con la fecha ya normalizada (AAAA-MM-DD) e índices por (fecha), (asesor,
+fecha) y (responsable, fecha). Así "vencidos" y "próximos" son búsquedas por
+rango en un índice, con paginación por cursor, sin abrir ningún JSON.
+
+save_seguimiento lo actualiza en cada guardado (con asyncio.to_thread);
+init() lo crea y lo llena al arrancar si no existe, y para regenerarlo:
+
+    python -m utils.compromisos rebuild
+"""
+import argparse
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from storage import storage
+from utils import catalog
+from utils.helpers import parse_fecha
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS compromisos (
+    folder TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    adviser TEXT NOT NULL,
+    responsable TEXT NOT NULL,
+    responsable_norm TEXT NOT NULL,
+    descripcion TEXT NOT NULL,
+    PRIMARY KEY (folder, numero, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_compromisos_fecha ON compromisos (fecha, folder, numero, idx);
+CREATE INDEX IF NOT EXISTS idx_compromisos_adviser ON compromisos (adviser, fecha, folder, numero, idx);
+CREATE INDEX IF NOT EXISTS idx_compromisos_responsable ON compromisos (responsable_norm, fecha, folder, numero, idx);
+"""
+
+_schema_ready = False
+
+
+def _create_schema() -> bool:
+    """ Crea la tabla si falta; True si no existía """
+    global _schema_ready
+    with catalog.connect() as conn:
+        is_new = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'compromisos'"
+        ).fetchone() is None
+        conn.executescript(_SCHEMA)
+    _schema_ready = True
+    return is_new
+
+
+def _ensure_schema():
+    if not _schema_ready:
+        _create_schema()
+
+
+def init() -> bool:
+    """
+    Prepara el índice al arrancar: lo crea y, si es nuevo, lo llena
+
+    Returns:
+        True si se regeneró
+    """
+    is_new = _create_schema()
+    if is_new:
+        rebuild()
+    return is_new
+
+
+def _write(conn, folder: str, numero: int, data: Dict):
+    _, adviser = catalog.parse_folder(folder)
+    conn.execute("DELETE FROM compromisos WHERE folder = ? AND numero = ?", (folder, numero))
+    rows = []
+    for idx, compromiso in enumerate(data.get("compromisos") or []):
+        fecha = parse_fecha(compromiso.get("fecha_cumplimiento"))
+        if fecha is None:
+            # Datos antiguos con fechas libres que no se pueden interpretar
+            continue
+        responsable = " ".join((compromiso.get("responsable") or "").split())
+        rows.append((
+            folder, numero, idx, fecha.isoformat(), adviser,
+            responsable, catalog.normalize_text(responsable), compromiso.get("descripcion") or ""
+        ))
+    conn.executemany(
+        "INSERT INTO compromisos (folder, numero, idx, fecha, adviser, responsable, responsable_norm, descripcion) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+def index_seguimiento(folder: str, numero: int, data: Dict):
+    """ Sustituye los compromisos indexados de un seguimiento """
+    _ensure_schema()
+    with catalog.connect() as conn:
+        _write(conn, folder, numero, data)
+
+
+def remove_family(folder: str):
+    _ensure_schema()
+    with catalog.connect() as conn:
+        conn.execute("DELETE FROM compromisos WHERE folder = ?", (folder,))
+
+
+def query(
+    estado: str,
+    adviser: Optional[str] = None,
+    responsable: Optional[str] = None,
+    dias: int = 7,
+    limit: int = 25,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Compromisos vencidos o próximos, del más antiguo al más reciente
+
+    Args:
+        estado: "vencidos" (fecha anterior a hoy) o "proximos" (de hoy a hoy + dias)
+        adviser: solo los de las familias de ese asesor
+        responsable: solo los de ese responsable (sin distinguir mayúsculas ni tildes)
+        dias: ventana de los próximos
+        limit: tamaño de la página
+        cursor: el next_cursor de la página anterior
+
+    Returns:
+        (compromisos, next_cursor)
+    """
+    today = date.today()
+    if estado == "vencidos":
+        conditions, params = ["fecha < ?"], [today.isoformat()]
+    else:
+        conditions = ["fecha >= ?", "fecha <= ?"]
+        params = [today.isoformat(), (today + timedelta(days=dias)).isoformat()]
+    if adviser is not None:
+        conditions.append("adviser = ?")
+        params.append(adviser)
+    if responsable:
+        conditions.append("responsable_norm = ?")
+        params.append(catalog.normalize_text(" ".join(responsable.split())))
+    if cursor:
+        conditions.append("(fecha, folder, numero, idx) > (?, ?, ?, ?)")
+        params += catalog.decode_cursor(cursor, 4)
+
+    sql = (
+        "SELECT fecha, folder, numero, idx, responsable, descripcion FROM compromisos "
+        f"WHERE {' AND '.join(conditions)} ORDER BY fecha, folder, numero, idx LIMIT ?"
+    )
+    params.append(limit + 1)
+
+    _ensure_schema()
+    with catalog.connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    compromisos = []
+    for fecha, folder, numero, idx, responsable_value, descripcion in rows:
+        doc_number, doc_adviser = catalog.parse_folder(folder)
+        compromisos.append({
+            "folder": folder,
+            "doc_number": doc_number,
+            "doc_adviser": doc_adviser,
+            "seguimiento": f"seguimiento_{numero}",
+            "numero": str(numero),
+            "descripcion": descripcion,
+            "responsable": responsable_value,
+            "fecha_cumplimiento": fecha
+        })
+    next_cursor = catalog.encode_cursor(*rows[-1][:4]) if has_more else None
+    return compromisos, next_cursor
+
+
+def rebuild() -> int:
+    """
+    Regenera el índice leyendo todos los seguimientos
+
+    Returns:
+        Número de compromisos indexados
+    """
+    backend = storage.backend
+    with catalog.connect() as conn:
+        conn.executescript(_SCHEMA)
+        conn.execute("DELETE FROM compromisos")
+        for folder in backend.list_families():
+            for seguimiento in backend.seguimientos_with_data(folder):
+                data = backend.load_seguimiento(folder, seguimiento)
+                _write(conn, folder, int(seguimiento.replace("seguimiento_", "")), data)
+        (total,) = conn.execute("SELECT COUNT(*) FROM compromisos").fetchone()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de compromisos por fecha")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        total = rebuild()
+        print(f"Índice regenerado: {total} compromisos")
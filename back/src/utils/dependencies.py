@@ -1,3 +1,28 @@
 # back/src/utils/dependencies.py
+"""
+Entorno de plantillas compartido por todas las rutas.
+
+Las plantillas compiladas se guardan en disco (FileSystemBytecodeCache), así
+que un worker nuevo no vuelve a compilar index.html ni los parciales. En
+producción las plantillas no cambian con el servidor en marcha; para
+desarrollo, TEMPLATES_AUTO_RELOAD=1 las vuelve a leer si se modifican.
+"""
+import os
+from pathlib import Path
+
 from fastapi.templating import Jinja2Templates
-templates = Jinja2Templates(directory="../../front/templates")
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+TEMPLATES_DIR = Path("../../front/templates")
+TEMPLATES_CACHE_DIR = Path(os.getenv("TEMPLATES_CACHE_DIR", ".storage_cache/jinja"))
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "0") == "1"
+
+TEMPLATES_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(default=True),
+    bytecode_cache=FileSystemBytecodeCache(str(TEMPLATES_CACHE_DIR)),
+    auto_reload=TEMPLATES_AUTO_RELOAD
+)
+templates = Jinja2Templates(env=env)
@@ -0,0 +1,185 @@
+# back/src/utils/export.py
+"""
+Exportación masiva de seguimientos en CSV o JSONL.
+
+Todo es un pipeline de generadores: familias -> seguimientos -> filas ->
+bloques de bytes (opcionalmente comprimidos con gzip). Las familias salen
+del catálogo por páginas (con el índice por asesor), junto con qué
+seguimientos están enviados, así que en memoria solo hay una página de
+familias, un seguimiento y un bloque de salida a la vez, sea cual sea el
+tamaño de los datos.
+
+Cada seguimiento se aplana en filas con la columna "registro":
+
+- "seguimiento": los campos del formulario (dimensiones separadas por "; ").
+- "compromiso": una fila por compromiso (compromiso_*).
+- "participante": una fila por participante (participante_*).
+
+Desde la línea de comandos:
+
+    python -m utils.export --formato csv --gzip -o export.csv.gz
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from storage import storage
+from utils import catalog
+from utils.helpers import parse_fecha
+
+COLUMNS = (
+    "registro", "folder", "doc_number", "adviser", "seguimiento", "numero",
+    "fecha", "hora", "dimensiones", "objetivo", "aspectos", "avances", "retos", "oportunidades",
+    "compromiso_descripcion", "compromiso_fecha", "compromiso_responsable",
+    "participante_nombre", "participante_rol",
+)
+# Tamaño aproximado de cada bloque que se envía al cliente
+CHUNK_SIZE = 64 * 1024
+# Familias por consulta al catálogo
+FAMILIES_PAGE_SIZE = 200
+
+
+def flatten(folder: str, seguimiento: str, data: Dict) -> Iterator[Dict]:
+    """ Filas planas (seguimiento, compromisos y participantes) de un seguimiento """
+    doc_number, adviser = catalog.parse_folder(folder)
+    base = {
+        "folder": folder,
+        "doc_number": doc_number,
+        "adviser": adviser,
+        "seguimiento": seguimiento,
+        "numero": seguimiento.replace("seguimiento_", ""),
+    }
+    yield {
+        **base,
+        "registro": "seguimiento",
+        "fecha": data.get("fecha"),
+        "hora": data.get("hora"),
+        "dimensiones": "; ".join(data.get("dimensiones") or []),
+        **{field: data.get(field) for field in ("objetivo", "aspectos", "avances", "retos", "oportunidades")},
+    }
+    for compromiso in data.get("compromisos") or []:
+        yield {
+            **base,
+            "registro": "compromiso",
+            "compromiso_descripcion": compromiso.get("descripcion"),
+            "compromiso_fecha": compromiso.get("fecha_cumplimiento"),
+            "compromiso_responsable": compromiso.get("responsable"),
+        }
+    for participante in data.get("participantes") or []:
+        yield {
+            **base,
+            "registro": "participante",
+            "participante_nombre": participante.get("nombre"),
+            "participante_rol": participante.get("rol"),
+        }
+
+
+async def iter_rows(
+    adviser: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+) -> AsyncIterator[Dict]:
+    """
+    Filas de todos los seguimientos con datos, familia por familia
+
+    Args:
+        adviser: solo las familias de ese asesor
+        desde, hasta: rango (inclusive) de la fecha de la visita
+    """
+    cursor = None
+    while True:
+        familias, cursor = await asyncio.to_thread(
+            catalog.page_families, adviser, limit=FAMILIES_PAGE_SIZE, cursor=cursor
+        )
+        for familia in familias:
+            folder = familia["folder"]
+            for seguimiento in familia["seguimientos"]:
+                if not seguimiento["enviado"]:
+                    continue
+                data = await storage.load_seguimiento(folder, seguimiento["id"])
+                if not data:
+                    continue
+                if desde or hasta:
+                    fecha = parse_fecha(data.get("fecha"))
+                    if fecha is None or (desde and fecha < desde) or (hasta and fecha > hasta):
+                        continue
+                for row in flatten(folder, seguimiento["id"], data):
+                    yield row
+        if cursor is None:
+            break
+
+
+async def _encode(rows: AsyncIterator[Dict], formato: str) -> AsyncIterator[bytes]:
+    """ Serializa las filas y las agrupa en bloques de ~CHUNK_SIZE """
+    buffer = io.StringIO()
+    if formato == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+    async for row in rows:
+        if formato == "csv":
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps({key: row.get(key) for key in COLUMNS}, ensure_ascii=False) + "\n")
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # wbits=31: formato gzip (cabecera y CRC), no zlib crudo
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream(
+    formato: str = "csv",
+    gzip: bool = False,
+    adviser: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+) -> AsyncIterator[bytes]:
+    """ Bloques de bytes listos para un StreamingResponse o un archivo """
+    chunks = _encode(iter_rows(adviser, desde, hasta), formato)
+    return _gzip(chunks) if gzip else chunks
+
+
+def filename(formato: str, gzip: bool) -> str:
+    return f"seguimientos_{date.today().isoformat()}.{formato}" + (".gz" if gzip else "")
+
+
+async def _export_to(output, **options):
+    async for chunk in stream(**options):
+        output.write(chunk)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportar todos los seguimientos")
+    parser.add_argument("--formato", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--adviser")
+    parser.add_argument("--desde", type=date.fromisoformat)
+    parser.add_argument("--hasta", type=date.fromisoformat)
+    parser.add_argument("-o", "--output", help="archivo de salida (por defecto, la salida estándar)")
+    args = parser.parse_args()
+
+    # Fuera de la aplicación nadie ha preparado el catálogo
+    catalog.init()
+    options = dict(formato=args.formato, gzip=args.gzip, adviser=args.adviser, desde=args.desde, hasta=args.hasta)
+    if args.output:
+        with open(args.output, "wb") as f:
+            asyncio.run(_export_to(f, **options))
+    else:
+        asyncio.run(_export_to(sys.stdout.buffer, **options))
@@ -0,0 +1,55 @@
+# back/src/utils/family_cache.py
+"""
+Caché de la respuesta de /family/{folder}: los 8 seguimientos de una familia
+con sus datos, el manifiesto de imágenes y el número de comentarios, ya
+serializados.
+
+Cada entrada se guarda con storage.family_version(folder), que solo hace
+stat() (o una consulta en SQLite) y cambia con cualquier escritura, también
+las de otros workers; si no coincide, se vuelve a montar. Así no hace falta
+invalidar en cada ruta que escribe; invalidate() solo libera la memoria de
+las familias que se borran.
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class FamilyCache:
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # folder -> (versión, respuesta serializada)
+        self._entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+
+    def get(self, folder: str, version: str) -> Optional[bytes]:
+        """ Respuesta de la familia si sigue en esa versión """
+        entry = self._entries.get(folder)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(folder)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, folder: str, version: str, body: bytes):
+        self._entries[folder] = (version, body)
+        self._entries.move_to_end(folder)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, folder: str):
+        self._entries.pop(folder, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+
+family_cache = FamilyCache(max_entries=int(os.getenv("FAMILY_CACHE_MAX_ENTRIES", 500)))
@@ -0,0 +1,77 @@
+# back/src/utils/fragments.py
+"""
+Caché de fragmentos HTML: la tarjeta de cada familia del dashboard.
+
+Una tarjeta solo depende de la fila de la familia en el catálogo (documento,
+asesor, apellido, seguimientos enviados) y de si el usuario es superadmin.
+Se guarda ya renderizada junto con esos datos; si la fila cambió (por
+ejemplo, otro worker guardó un seguimiento) se vuelve a renderizar, y las
+escrituras de este worker la descartan con invalidate(). Así el dashboard es
+casi una concatenación de fragmentos.
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from markupsafe import Markup
+
+from utils.dependencies import env
+
+CARD_TEMPLATE = "partials/family_card.html"
+
+
+class FragmentCache:
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (folder, superadmin) -> (datos de la familia, plantilla, html)
+        self._entries: "OrderedDict[Tuple[str, bool], tuple]" = OrderedDict()
+
+    @staticmethod
+    def _fingerprint(doc: Dict) -> tuple:
+        return (
+            doc["doc_number"], doc["doc_adviser"], doc["apellido"],
+            tuple((seg["numero"], seg["enviado"]) for seg in doc["seguimientos"])
+        )
+
+    def card(self, doc: Dict, user_role: Optional[str]) -> str:
+        """ HTML de la tarjeta de una familia, desde la caché si no cambió """
+        key = (doc["folder"], user_role == "superadmin")
+        fingerprint = self._fingerprint(doc)
+        # Con TEMPLATES_AUTO_RELOAD una plantilla modificada es otro objeto
+        template = env.get_template(CARD_TEMPLATE)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == fingerprint and entry[1] is template:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        html = template.render(doc=doc, user_role=user_role)
+        self._entries[key] = (fingerprint, template, html)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return html
+
+    def cards(self, documents: List[Dict], user_role: Optional[str]) -> Markup:
+        """ Tarjetas de una página de familias, concatenadas """
+        return Markup("\n".join(self.card(doc, user_role) for doc in documents))
+
+    def invalidate(self, folder: str):
+        """ Descarta las tarjetas de una familia (tras crearla, guardarla o borrarla) """
+        for superadmin in (False, True):
+            self._entries.pop((folder, superadmin), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+
+fragment_cache = FragmentCache(max_entries=int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", 10000)))
@@ -14,6 +14,9 @@ import uuid
 
 class PDFGenerator:
 
+    # Cambiar cuando cambie el diseño del reporte para invalidar los PDFs en caché
+    TEMPLATE_VERSION = "1"
+
     def __init__(self, output_dir: str = "pdfs"):
         self.output_dir = output_dir
         self.ensure_output_dir()
@@ -38,20 +41,22 @@ class PDFGenerator:
 
         return f"document_{timestamp}_{unique_id}.pdf"
 
-    def create_reporte_pdf(self, reporte_data: Dict[str, Any]) -> Dict[str, str]:
+    def create_reporte_pdf(self, reporte_data: Dict[str, Any], filename: str = None) -> Dict[str, str]:
         """
         Crear PDF específico para el formato de reporte
 
         Args:
             reporte_data: Diccionario con los datos del reporte
+            filename: Nombre del archivo de salida (por defecto, basado en la fecha)
 
         Returns:
             Dict con información del archivo generado
         """
         try:
             # Generar nombre de archivo basado en fecha
-            fecha_str = reporte_data.get('fecha', '').replace('-', '')
-            filename = f"reporte_{fecha_str}_{datetime.now().strftime('%H%M%S')}.pdf"
+            if not filename:
+                fecha_str = reporte_data.get('fecha', '').replace('-', '')
+                filename = f"reporte_{fecha_str}_{datetime.now().strftime('%H%M%S')}.pdf"
             file_path = os.path.join(self.output_dir, filename)
 
             # Crear documento PDF
@@ -265,3 +270,8 @@ class PDFGenerator:
                 "filename": None,
                 "file_path": None
             }
+
+
+def render_reporte_pdf(output_dir: str, reporte_data: Dict[str, Any], filename: str = None) -> Dict[str, str]:
+    """ Punto de entrada para el pool de procesos (debe ser una función de módulo) """
+    return PDFGenerator(output_dir).create_reporte_pdf(reporte_data, filename)
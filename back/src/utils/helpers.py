@@ -1,43 +1,50 @@
-from typing import Dict
+import hashlib
+from typing import Dict, List, Optional
 from fastapi import Request, HTTPException
 from pathlib import Path
+from datetime import date, datetime
 import json
+from utils.metrics import timer
 
 DOCUMENTS_BASE_PATH = "documents"
 
+# Carpetas de familia repartidas en SHARD_LEVELS niveles de SHARD_WIDTH caracteres hex
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+def shard_dirs(name: str) -> List[str]:
+    """Subcarpetas <h0h1>/<h2h3> de un nombre, con h = sha1 del nombre"""
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+
 def is_authenticated(request: Request) -> bool:
-    auth_value = request.cookies.get("auth")
-    print(f"Cookie 'auth': {auth_value}")  # Para depuración
-    return auth_value == "true"
+    return request.cookies.get("auth") == "true"
 
 def require_auth(request: Request):
     if not is_authenticated(request):
         raise HTTPException(status_code=401, detail="Usuario no autenticado")
 
-def create_document_structure(doc_number: str, request: Request):
-    user_id = request.cookies.get("user")
-    if not user_id:
-        raise HTTPException(status_code=400, detail="Usuario no especificado en cookies")
-
-    doc_path = Path(DOCUMENTS_BASE_PATH) / f"documento_{doc_number}_{user_id}"
-    doc_path.mkdir(exist_ok=True, parents=True)
-
-    for i in range(1, 9):
-        seguimiento_path = doc_path / f"seguimiento_{i}"
-        seguimiento_path.mkdir(exist_ok=True)
-        (seguimiento_path / "imagenes").mkdir(exist_ok=True)
+# Formatos de fecha aceptados en los compromisos (el formulario envía ISO)
+FECHA_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
 
-        comments_file = seguimiento_path / "comentarios.json"
-        if not comments_file.exists():
-            with open(comments_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
+def parse_fecha(value: Optional[str]) -> Optional[date]:
+    """Convierte una fecha escrita a mano en date, o None si no se reconoce"""
+    value = (value or "").strip()
+    for fmt in FECHA_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
 
 def load_seguimiento_data(seguimiento_path: Path) -> Dict:
     data_file = seguimiento_path / "seguimiento.json"
-    if data_file.exists():
-        with open(data_file, 'r', encoding='utf-8') as f:
+    try:
+        with timer("json_load"), open(data_file, 'r', encoding='utf-8') as f:
             return json.load(f)
-    return {}
+    except FileNotFoundError:
+        # Seguimiento aún sin escribir: su carpeta se crea al guardar
+        return {}
 
 
 def save_seguimiento_data(seguimiento_path: Path, data: Dict) -> bool:
@@ -65,11 +72,12 @@ def save_seguimiento_data(seguimiento_path: Path, data: Dict) -> bool:
         # Guardar en archivo temporal primero (patrón atómico)
         temp_file = seguimiento_path / "seguimiento.tmp"
         
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        # Renombrar el archivo temporal al nombre final (operación atómica)
-        temp_file.replace(data_file)
+        with timer("json_save"):
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+            # Renombrar el archivo temporal al nombre final (operación atómica)
+            temp_file.replace(data_file)
         
         return True
         
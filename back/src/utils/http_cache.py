@@ -0,0 +1,74 @@
+# back/src/utils/http_cache.py
+"""
+Respuestas condicionales (ETag / Last-Modified) y políticas de Cache-Control.
+
+Las rutas calculan un validador barato (mtime y tamaño del archivo, o una
+versión del catálogo) y, si el cliente ya tiene esa versión, responden 304
+sin leer el cuerpo del disco ni renderizar la plantilla.
+
+La política de cada ruta se puede cambiar con la variable de entorno
+CACHE_POLICY_<RUTA>, por ejemplo CACHE_POLICY_GET_IMAGE="private, max-age=600".
+"""
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+DEFAULT_CACHE_POLICIES = {
+    "get_seguimiento": "private, no-cache",
+    "get_family": "private, no-cache",
+    "get_image": "private, max-age=3600",
+    "dashboard": "private, no-cache",
+}
+
+
+def cache_policy(route: str) -> str:
+    return os.getenv(f"CACHE_POLICY_{route.upper()}", DEFAULT_CACHE_POLICIES.get(route, "no-cache"))
+
+
+def etag_from_stat(*stats: Optional[os.stat_result], extra: str = "") -> str:
+    """ ETag fuerte a partir de mtime y tamaño de uno o varios archivos """
+    parts = [f"{s.st_mtime_ns:x}-{s.st_size:x}" if s else "0" for s in stats]
+    if extra:
+        parts.append(extra)
+    return etag_from_text("|".join(parts))
+
+
+def etag_from_text(value: str) -> str:
+    return '"' + hashlib.sha1(value.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """ True si el cliente ya tiene esta versión (If-None-Match tiene prioridad) """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def cache_headers(route: str, etag: str, last_modified: Optional[float] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_policy(route)}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,328 @@
+# back/src/utils/locks.py
+"""
+Bloqueos de lectura/escritura por familia y por seguimiento.
+
+Se usan archivos de bloqueo con flock(), así que funcionan entre varios
+workers de uvicorn. Cada operación abre su propio descriptor, de modo que
+también se excluyen dos peticiones del mismo proceso.
+
+Jerarquía (siempre en este orden, para no provocar interbloqueos):
+
+- document_lock(folder): exclusivo para crear o borrar una familia.
+- seguimiento_lock(folder, seguimiento): toma la familia en modo compartido
+  y el seguimiento en el modo pedido.
+
+Los archivos se reparten como las familias (LOCKS_DIR/<h0h1>/<h2h3>/, por el
+hash de la familia) y document_lock(..., remove=True) los borra al salir,
+antes de soltar el bloqueo, cuando la familia se mueve a la papelera o se
+purga. Quien tomó un descriptor del archivo borrado lo detecta (el inodo ya
+no es el de la ruta) y vuelve a intentarlo con el nuevo.
+
+Un escritor que tiene que esperar anuncia su intención con el archivo
+"<bloqueo>.intent": mientras lo tiene, los lectores nuevos esperan, así que
+un goteo continuo de lecturas no lo deja sin turno.
+
+Las lecturas de familias distintas no comparten ningún archivo, así que
+nunca se esperan entre sí. Si fcntl no está disponible (Windows) se usa un
+bloqueo equivalente solo dentro del proceso.
+
+La espera se hace con reintentos no bloqueantes desde el event loop: los
+archivos se abren una vez al empezar (la carpeta de un shard nuevo se crea
+en un hilo) y cada reintento solo hace flock sobre esos descriptores, más un
+stat cuando lo consigue. Si supera LOCK_TIMEOUT segundos se responde 503.
+"""
+import asyncio
+import glob
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from utils.helpers import DOCUMENTS_BASE_PATH, shard_dirs
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+LOCKS_DIR = Path(os.getenv("LOCKS_DIR", Path(DOCUMENTS_BASE_PATH) / ".locks"))
+LOCK_TIMEOUT = float(os.getenv("LOCK_TIMEOUT", 30))
+INTENT_SUFFIX = ".intent"
+# Espera entre reintentos: empieza en 1 ms y crece hasta 20 ms
+_MIN_BACKOFF = 0.001
+_MAX_BACKOFF = 0.02
+
+# Estado de los bloqueos dentro del proceso cuando no hay fcntl:
+# ruta -> [lectores, escritor, escritores esperando]
+_local_locks: Dict[Path, list] = {}
+
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _lock_path(*parts: str) -> Path:
+    """ LOCKS_DIR/<h0h1>/<h2h3>/<parte>@<parte>.lock, repartido por la primera parte """
+    for part in parts:
+        if not part or Path(part).name != part or part in (".", ".."):
+            raise HTTPException(status_code=400, detail="Nombre no válido")
+    return LOCKS_DIR.joinpath(*shard_dirs(parts[0]), "@".join(parts) + ".lock")
+
+
+def _intent_path(path: Path) -> Path:
+    return path.with_name(path.name + INTENT_SUFFIX)
+
+
+def _flock(fd: int, operation: int) -> bool:
+    """ flock no bloqueante; False si está ocupado """
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _local_state(path: Path) -> list:
+    return _local_locks.setdefault(path, [0, False, 0])
+
+
+def _local_cleanup(path: Path):
+    state = _local_locks.get(path)
+    if state is not None and not state[0] and not state[1] and not state[2]:
+        del _local_locks[path]
+
+
+class _Attempt:
+    """
+    Un bloqueo que se está intentando tomar. El archivo de bloqueo y el de
+    intención se abren una sola vez; cada reintento solo hace flock sobre esos
+    descriptores.
+    """
+
+    def __init__(self, path: Path, exclusive: bool):
+        self.path = path
+        self.exclusive = exclusive
+        self.fd: Optional[int] = None
+        self.ino: Optional[int] = None
+        self.intent: Optional[int] = None
+        self.announced = False
+
+    def open(self):
+        """ Abre (creando si faltan) los dos archivos; FileNotFoundError si falta la carpeta """
+        if fcntl is None:
+            return
+        self.intent = os.open(_intent_path(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.ino = os.fstat(self.fd).st_ino
+
+    def try_lock(self):
+        """ Intenta tomar el bloqueo sin esperar; devuelve un handle o None """
+        if fcntl is None:
+            state = _local_state(self.path)
+            if state[1] or (self.exclusive and state[0]) or (not self.exclusive and state[2]):
+                return None
+            if self.exclusive:
+                state[1] = True
+            else:
+                state[0] += 1
+            return (self.path, self.exclusive)
+
+        # Con un escritor esperando, el archivo de intención está tomado en exclusiva
+        if not self.exclusive and not _flock(self.intent, fcntl.LOCK_SH):
+            return None
+        try:
+            if not _flock(self.fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH):
+                return None
+            # Si entretanto se borró (remove=True), este descriptor es de un archivo huérfano
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current != self.ino:
+                self.close()
+                self.open()
+                return None
+            handle, self.fd = self.fd, None
+            return handle
+        finally:
+            if not self.exclusive and self.intent is not None:
+                fcntl.flock(self.intent, fcntl.LOCK_UN)
+
+    def announce(self):
+        """ Intención de escribir: cierra el paso a lectores nuevos (cuando se consigue) """
+        if self.announced:
+            return
+        if fcntl is None:
+            _local_state(self.path)[2] += 1
+            self.announced = True
+            return
+        self.announced = _flock(self.intent, fcntl.LOCK_EX)
+
+    def close(self):
+        """ Suelta la intención y los descriptores que no se entregaron """
+        if fcntl is None:
+            if self.announced:
+                _local_locks[self.path][2] -= 1
+                _local_cleanup(self.path)
+            self.announced = False
+            return
+        for fd in (self.fd, self.intent):
+            if fd is not None:
+                os.close(fd)
+        self.fd = self.intent = None
+        self.announced = False
+
+
+def _release(handle):
+    if fcntl is None:
+        path, exclusive = handle
+        state = _local_locks[path]
+        if exclusive:
+            state[1] = False
+        else:
+            state[0] -= 1
+        _local_cleanup(path)
+        return
+    # Cerrar el descriptor libera el flock
+    os.close(handle)
+
+
+def _remove_files(folder: str):
+    """ Borra los archivos de bloqueo de una familia (con su bloqueo exclusivo tomado) """
+    if fcntl is None:
+        return
+    path = _lock_path(folder)
+    # Los de sus seguimientos: nadie los tiene, se toman con la familia en modo compartido
+    for seguimiento_path in path.parent.glob(glob.escape(f"{folder}@seguimiento_") + "*"):
+        seguimiento_path.unlink(missing_ok=True)
+    _intent_path(path).unlink(missing_ok=True)
+    path.unlink(missing_ok=True)
+
+
+def _record(scope: str, waited: float, contended: bool, timed_out: bool = False):
+    stats = _stats.setdefault(scope, {
+        "acquired": 0, "contended": 0, "timeouts": 0, "wait_total": 0.0, "wait_max": 0.0
+    })
+    if timed_out:
+        stats["timeouts"] += 1
+        return
+    stats["acquired"] += 1
+    if contended:
+        stats["contended"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+
+async def _acquire(scope: str, path: Path, exclusive: bool, timeout: Optional[float]):
+    attempt = _Attempt(path, exclusive)
+    try:
+        try:
+            attempt.open()
+        except FileNotFoundError:
+            # Primer bloqueo de este shard: la carpeta se crea fuera del event loop
+            await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+            attempt.open()
+        handle = attempt.try_lock()
+        if handle is not None:
+            _record(scope, 0.0, False)
+            return handle
+
+        start = time.perf_counter()
+        deadline = start + (LOCK_TIMEOUT if timeout is None else timeout)
+        backoff = _MIN_BACKOFF
+        while True:
+            if exclusive:
+                attempt.announce()
+            await asyncio.sleep(backoff)
+            handle = attempt.try_lock()
+            if handle is not None:
+                _record(scope, time.perf_counter() - start, True)
+                return handle
+            if time.perf_counter() >= deadline:
+                _record(scope, 0.0, True, timed_out=True)
+                raise HTTPException(status_code=503, detail="Recurso ocupado, inténtelo de nuevo")
+            backoff = min(backoff * 2, _MAX_BACKOFF)
+    finally:
+        attempt.close()
+
+
+@asynccontextmanager
+async def document_lock(
+    folder: str, exclusive: bool = False, timeout: Optional[float] = None, remove: bool = False
+):
+    """
+    Bloqueo de una familia completa
+
+    Args:
+        remove: al salir borra sus archivos de bloqueo (requiere exclusive);
+            para cuando la familia o la entrada de la papelera dejan de existir
+    """
+    path = _lock_path(folder)
+    handle = await _acquire("documento", path, exclusive, timeout)
+    try:
+        yield
+    finally:
+        try:
+            if remove and exclusive:
+                _remove_files(folder)
+        finally:
+            _release(handle)
+
+
+@asynccontextmanager
+async def seguimiento_lock(folder: str, seguimiento: str, exclusive: bool = False, timeout: Optional[float] = None):
+    """ Bloqueo de un seguimiento (con la familia en modo compartido) """
+    async with document_lock(folder, timeout=timeout):
+        handle = await _acquire("seguimiento", _lock_path(folder, seguimiento), exclusive, timeout)
+        try:
+            yield
+        finally:
+            _release(handle)
+
+
+@contextmanager
+def _hold_sync(*locks_to_take):
+    handles = []
+    try:
+        for path, exclusive in locks_to_take:
+            attempt = _Attempt(path, exclusive)
+            try:
+                try:
+                    attempt.open()
+                except FileNotFoundError:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    attempt.open()
+                while (handle := attempt.try_lock()) is None:
+                    if exclusive:
+                        attempt.announce()
+                    time.sleep(_MAX_BACKOFF)
+            finally:
+                attempt.close()
+            handles.append(handle)
+        yield
+    finally:
+        for handle in reversed(handles):
+            _release(handle)
+
+
+def document_lock_sync(folder: str, exclusive: bool = False):
+    """ Versión bloqueante de document_lock para las herramientas de línea de comandos """
+    return _hold_sync((_lock_path(folder), exclusive))
+
+
+def seguimiento_lock_sync(folder: str, seguimiento: str, exclusive: bool = False):
+    """ Versión bloqueante para las herramientas de línea de comandos """
+    return _hold_sync((_lock_path(folder), False), (_lock_path(folder, seguimiento), exclusive))
+
+
+def stats() -> Dict:
+    """ Contadores de espera por tipo de bloqueo (de este worker) """
+    result = {"pid": os.getpid(), "backend": "flock" if fcntl is not None else "local"}
+    for scope, values in _stats.items():
+        contended = values["contended"]
+        result[scope] = {
+            **values,
+            "wait_avg": values["wait_total"] / contended if contended else 0.0
+        }
+    return result
@@ -0,0 +1,221 @@
+# back/src/utils/metrics.py
+"""
+Métricas en formato de texto de Prometheus, sin dependencias externas.
+
+- MetricsMiddleware (ASGI) registra por ruta (la plantilla, p. ej.
+  /seguimientos/get-seguimiento/{folder}/{follow_up}, no la URL concreta):
+  latencia, tamaño de la respuesta, peticiones por código de estado,
+  excepciones no controladas y peticiones en curso.
+- timer("operacion") mide operaciones internas: generación de PDFs, lectura
+  y escritura de JSON, recorridos de directorios...
+
+Los valores son de cada worker (como /pdf-cache/stats); Prometheus los
+distingue por la instancia que raspa. Se exponen en /seguimientos/metrics.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Peticiones que no llegan a ninguna ruta (404): una sola etiqueta para no
+# crear una serie por cada URL inventada
+UNMATCHED_ROUTE = "(sin ruta)"
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        # Se actualizan también desde los hilos de asyncio.to_thread
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [cuentas por cubeta (la última es +Inf), suma]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "seguimientos_http_request_duration_seconds", "Latencia de las peticiones HTTP", ("method", "route")
+)
+RESPONSE_SIZE = Histogram(
+    "seguimientos_http_response_size_bytes", "Tamaño del cuerpo de las respuestas HTTP", ("method", "route"),
+    buckets=SIZE_BUCKETS
+)
+REQUESTS = Counter(
+    "seguimientos_http_requests_total", "Peticiones HTTP por código de estado", ("method", "route", "status")
+)
+EXCEPTIONS = Counter(
+    "seguimientos_http_exceptions_total", "Excepciones no controladas en las peticiones HTTP", ("method", "route")
+)
+IN_FLIGHT = Gauge("seguimientos_http_requests_in_flight", "Peticiones HTTP en curso")
+OPERATION_DURATION = Histogram(
+    "seguimientos_operation_duration_seconds",
+    "Duración de operaciones internas (PDFs, JSON, recorridos de directorios)", ("operacion",)
+)
+
+IN_FLIGHT.set(value=0)
+
+_metrics: List[_Metric] = [REQUEST_DURATION, RESPONSE_SIZE, REQUESTS, EXCEPTIONS, IN_FLIGHT, OPERATION_DURATION]
+# Funciones que devuelven [(nombre, ayuda, tipo, [(etiquetas, valor)])] al exportar
+_collectors: List[Callable[[], List[tuple]]] = []
+
+
+def register_collector(collector: Callable):
+    """ Añade valores que se leen al exportar (contadores de cachés, colas...) """
+    _collectors.append(collector)
+
+
+@contextmanager
+def timer(operacion: str):
+    """ Mide una operación interna en seguimientos_operation_duration_seconds """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_DURATION.observe(time.perf_counter() - start, operacion)
+
+
+def render() -> str:
+    """ Todas las métricas en formato de texto de Prometheus """
+    lines: List[str] = []
+    for metric in _metrics:
+        lines += metric.render()
+    for collector in _collectors:
+        for name, help_text, kind, samples in collector():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _route_label(scope: Dict, root_path: str) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", UNMATCHED_ROUTE)
+    # Un Mount (archivos estáticos) deja su prefijo en root_path
+    if scope.get("root_path", "") != root_path:
+        return scope["root_path"]
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ Middleware ASGI que mide cada petición HTTP """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        root_path = scope.get("root_path", "")
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            EXCEPTIONS.inc(scope["method"], _route_label(scope, root_path))
+            raise
+        finally:
+            IN_FLIGHT.dec()
+            route = _route_label(scope, root_path)
+            method = scope["method"]
+            REQUEST_DURATION.observe(time.perf_counter() - start, method, route)
+            RESPONSE_SIZE.observe(size, method, route)
+            REQUESTS.inc(method, route, str(status))
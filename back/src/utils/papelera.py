@@ -0,0 +1,187 @@
+# back/src/utils/papelera.py
+"""
+Papelera de familias borradas.
+
+Borrar una familia solo la mueve a la papelera del backend (en el sistema de
+archivos, un rename a documents/.papelera/<folder>@<ns>) y la quita del
+catálogo y de los índices, así que la petición no espera a borrar fotos.
+Durante TRASH_RETENTION_DAYS se puede restaurar; al restaurarla se vuelve a
+indexar desde el almacenamiento.
+
+El borrado definitivo lo hace reaper(), una tarea en segundo plano que
+arranca con la aplicación: cada TRASH_REAPER_INTERVAL segundos purga como
+mucho TRASH_REAPER_BATCH familias caducadas, con una pausa de
+TRASH_REAPER_PAUSE segundos entre una y otra para no saturar el disco. Cada
+purga toma el bloqueo de esa entrada, así que varios workers no se pisan.
+También se puede lanzar a mano (p. ej. desde cron):
+
+    python -m utils.papelera purge
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from storage import storage, parse_trash_id
+from utils import aggregates, catalog, locks, search
+from utils import compromisos as compromisos_index
+from utils.family_cache import family_cache
+from utils.fragments import fragment_cache
+
+TRASH_RETENTION = float(os.getenv("TRASH_RETENTION_DAYS", 30)) * 86400
+REAPER_INTERVAL = float(os.getenv("TRASH_REAPER_INTERVAL", 3600))
+REAPER_BATCH = int(os.getenv("TRASH_REAPER_BATCH", 20))
+REAPER_PAUSE = float(os.getenv("TRASH_REAPER_PAUSE", 1.0))
+
+logger = logging.getLogger(__name__)
+
+
+def _expires_at(deleted_ns: int) -> float:
+    return deleted_ns / 1e9 + TRASH_RETENTION
+
+
+def _entry(trash_id: str) -> Dict:
+    folder, deleted_ns = parse_trash_id(trash_id)
+    doc_number, doc_adviser = catalog.parse_folder(folder)
+    return {
+        "trash_id": trash_id,
+        "folder": folder,
+        "doc_number": doc_number,
+        "doc_adviser": doc_adviser,
+        "eliminado": datetime.fromtimestamp(deleted_ns / 1e9),
+        "expira": datetime.fromtimestamp(_expires_at(deleted_ns))
+    }
+
+
+def _check_owner(folder: str, adviser: Optional[str]):
+    """ Los asesores (adviser indicado) solo pueden tocar sus propias familias """
+    if adviser is not None and catalog.parse_folder(folder)[1] != adviser:
+        raise PermissionError(folder)
+
+
+async def trash(folder: str, adviser: Optional[str] = None) -> Dict:
+    """
+    Mueve la familia a la papelera y la quita del catálogo y los índices
+
+    Raises:
+        PermissionError: si la familia no es de `adviser`
+    """
+    _check_owner(folder, adviser)
+    # Nadie más puede estar leyendo o escribiendo la familia mientras se mueve;
+    # al terminar se borran sus archivos de bloqueo (la restauración los vuelve a crear)
+    async with locks.document_lock(folder, exclusive=True, remove=True):
+        trash_id = await storage.trash_family(folder)
+        if trash_id is None:
+            raise HTTPException(status_code=404, detail="Documento no encontrado")
+    await asyncio.to_thread(catalog.remove_family, folder)
+    await asyncio.to_thread(search.remove_family, folder)
+    await asyncio.to_thread(aggregates.family_deleted, folder)
+    await asyncio.to_thread(compromisos_index.remove_family, folder)
+    fragment_cache.invalidate(folder)
+    family_cache.invalidate(folder)
+    return _entry(trash_id)
+
+
+async def _reindex(folder: str):
+    """ Vuelve a dar de alta en el catálogo y los índices una familia restaurada """
+    await asyncio.to_thread(catalog.index_family, folder)
+    await asyncio.to_thread(aggregates.family_created, folder)
+    for seguimiento in await storage.seguimientos_with_data(folder):
+        data = await storage.load_seguimiento(folder, seguimiento)
+        numero = int(seguimiento.replace("seguimiento_", ""))
+        await asyncio.to_thread(search.index_seguimiento, folder, numero, data)
+        await asyncio.to_thread(aggregates.seguimiento_saved, folder, numero, data)
+        await asyncio.to_thread(compromisos_index.index_seguimiento, folder, numero, data)
+    fragment_cache.invalidate(folder)
+
+
+async def restore(trash_id: str, adviser: Optional[str] = None) -> str:
+    """
+    Devuelve una familia de la papelera a su sitio
+
+    Raises:
+        PermissionError: si la familia no es de `adviser`
+        HTTPException: 404 si no está en la papelera, 410 si ya caducó,
+            409 si entretanto se creó otra familia con el mismo documento
+    """
+    parsed = parse_trash_id(trash_id)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="No está en la papelera")
+    folder, deleted_ns = parsed
+    _check_owner(folder, adviser)
+    if time.time() >= _expires_at(deleted_ns):
+        raise HTTPException(status_code=410, detail="El plazo para restaurar la familia ha vencido")
+
+    # Primero la entrada de la papelera (la purga la toma igual) y luego la familia
+    async with locks.document_lock(trash_id, exclusive=True, remove=True):
+        async with locks.document_lock(folder, exclusive=True):
+            try:
+                restored = await storage.restore_family(trash_id)
+            except FileExistsError:
+                raise HTTPException(status_code=409, detail="Ya existe una familia con ese documento")
+    if restored is None:
+        raise HTTPException(status_code=404, detail="No está en la papelera")
+    await _reindex(folder)
+    return folder
+
+
+async def list_entries(adviser: Optional[str] = None) -> List[Dict]:
+    """ Familias en la papelera (de un asesor, si se indica), de la más reciente a la más antigua """
+    entries = [_entry(trash_id) for trash_id in await storage.list_trash()]
+    if adviser is not None:
+        entries = [entry for entry in entries if entry["doc_adviser"] == adviser]
+    return sorted(entries, key=lambda entry: entry["eliminado"], reverse=True)
+
+
+async def purge_expired(limit: int = REAPER_BATCH, pause: float = REAPER_PAUSE) -> int:
+    """
+    Borra definitivamente hasta `limit` familias caducadas
+
+    Returns:
+        Número de familias purgadas
+    """
+    now = time.time()
+    expired = sorted(
+        (parsed[1], trash_id) for trash_id in await storage.list_trash()
+        if (parsed := parse_trash_id(trash_id)) and now >= _expires_at(parsed[1])
+    )
+    purged = 0
+    for _, trash_id in expired[:limit]:
+        if purged:
+            await asyncio.sleep(pause)
+        try:
+            # Si otro worker ya la está purgando (o restaurando), se deja
+            async with locks.document_lock(trash_id, exclusive=True, timeout=0, remove=True):
+                if await storage.purge_trash(trash_id):
+                    purged += 1
+        except HTTPException:
+            continue
+    return purged
+
+
+async def reaper():
+    """ Tarea en segundo plano: purga periódicamente la papelera caducada """
+    while True:
+        try:
+            purged = await purge_expired()
+            if purged:
+                logger.info("Papelera: %d familias purgadas", purged)
+        except Exception:
+            logger.exception("Error purgando la papelera")
+        await asyncio.sleep(REAPER_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Papelera de familias borradas")
+    parser.add_argument("command", choices=["purge"])
+    parser.add_argument("--limit", type=int, default=REAPER_BATCH)
+    args = parser.parse_args()
+
+    if args.command == "purge":
+        total = asyncio.run(purge_expired(args.limit))
+        print(f"Papelera: {total} familias purgadas")
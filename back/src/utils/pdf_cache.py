@@ -0,0 +1,210 @@
+# back/src/utils/pdf_cache.py
+"""
+Caché de reportes PDF direccionada por contenido.
+
+La clave es un hash de los datos del seguimiento más la versión de la
+plantilla, así que un seguimiento que no cambió se sirve directamente desde
+disco. El tamaño total está acotado y se desaloja por LRU (la fecha de
+modificación del archivo se actualiza en cada acierto, de modo que el orden
+se comparte entre los workers de uvicorn).
+
+Las operaciones que tocan el disco (get, put, abandoned, remove) son
+bloqueantes: desde el event loop se llaman con asyncio.to_thread, y un
+threading.Lock protege el índice en memoria.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+from utils.generate_pdf import PDFGenerator, render_reporte_pdf
+from utils.metrics import timer
+from utils.process_pool import pdf_pool
+
+# Cada cuántas inserciones se vuelve a leer el directorio (otros workers también escriben)
+RESYNC_EVERY = 256
+# Temporales más viejos que esto son de renders abandonados (tiempo agotado, proceso muerto)
+TEMP_MAX_AGE = float(os.getenv("PDF_CACHE_TEMP_MAX_AGE", 3600))
+
+
+class PDFCache:
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # nombre -> tamaño
+        self._lock = threading.Lock()
+        self._puts_since_sync = 0
+        self._sync()
+
+    @staticmethod
+    def key(reporte_data: Dict[str, Any]) -> str:
+        """ Hash estable de los datos del reporte y la versión de la plantilla """
+        payload = json.dumps(reporte_data, sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(PDFGenerator.TEMPLATE_VERSION.encode())
+        digest.update(payload.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def filename(key: str) -> str:
+        return f"reporte_{key[:32]}.pdf"
+
+    def temp_filename(self, key: str) -> str:
+        """ Nombre temporal para generar el PDF antes de publicarlo en la caché """
+        return f".{self.filename(key)}.{uuid.uuid4().hex[:8]}.tmp"
+
+    def _sync(self):
+        """ Reconstruir el índice LRU a partir del directorio y borrar temporales abandonados """
+        files = []
+        stale_before = time.time() - TEMP_MAX_AGE
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".pdf"):
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+            elif entry.name.endswith(".tmp") and stat.st_mtime < stale_before:
+                Path(entry.path).unlink(missing_ok=True)
+        files.sort()
+        with self._lock:
+            self._entries = OrderedDict((name, size) for _, name, size in files)
+            self._puts_since_sync = 0
+
+    def get(self, key: str) -> Optional[Path]:
+        """ Ruta del PDF en caché, o None si hay que generarlo """
+        name = self.filename(key)
+        path = self.directory / name
+        try:
+            os.utime(path)
+            size = path.stat().st_size
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(name, None)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._entries[name] = size
+            self._entries.move_to_end(name)
+            self.hits += 1
+        return path
+
+    def put(self, key: str, generated_path: str) -> Path:
+        """ Publicar un PDF recién generado bajo su clave y aplicar el límite de tamaño """
+        name = self.filename(key)
+        path = self.directory / name
+        os.replace(generated_path, path)
+        size = path.stat().st_size
+
+        with self._lock:
+            self._entries[name] = size
+            self._entries.move_to_end(name)
+            self._puts_since_sync += 1
+            resync = self._puts_since_sync >= RESYNC_EVERY
+        if resync:
+            self._sync()
+        self._evict(keep=name)
+        return path
+
+    def abandoned(self):
+        """ Un render se dio por perdido con su temporal a medias: cuenta para la próxima limpieza """
+        with self._lock:
+            self._puts_since_sync += 1
+            resync = self._puts_since_sync >= RESYNC_EVERY
+        if resync:
+            self._sync()
+
+    def _evict(self, keep: str):
+        victims = []
+        with self._lock:
+            total = sum(self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                name, size = next(iter(self._entries.items()))
+                if name == keep:
+                    break
+                del self._entries[name]
+                total -= size
+                victims.append(name)
+        for name in victims:
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.evictions += 1
+
+    def remove(self, filename: str) -> bool:
+        """ Eliminar una entrada por nombre de archivo """
+        if Path(filename).name != filename:
+            return False
+        with self._lock:
+            self._entries.pop(filename, None)
+        try:
+            (self.directory / filename).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": sum(self._entries.values()),
+                "max_bytes": self.max_bytes
+            }
+
+
+pdf_cache = PDFCache(
+    directory=os.getenv("PDF_CACHE_DIR", "pdfs"),
+    max_bytes=int(os.getenv("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+)
+
+
+async def get_or_render(reporte_data: Dict[str, Any]) -> Path:
+    """
+    Devolver el PDF del reporte desde la caché, generándolo en el pool si falta
+
+    Raises:
+        HTTPException: si el pool está saturado, se agota el tiempo o falla ReportLab
+    """
+    key = pdf_cache.key(reporte_data)
+    cached_path = await asyncio.to_thread(pdf_cache.get, key)
+    if cached_path is not None:
+        return cached_path
+
+    temp_name = pdf_cache.temp_filename(key)
+    try:
+        with timer("pdf_render"):
+            result = await pdf_pool.run(render_reporte_pdf, str(pdf_cache.directory), reporte_data, temp_name)
+    except HTTPException as e:
+        # Con el tiempo agotado el proceso sigue escribiendo el temporal:
+        # borrarlo ahora no sirve, lo recoge _sync cuando caduca
+        if e.status_code == 504:
+            await asyncio.to_thread(pdf_cache.abandoned)
+        else:
+            await asyncio.to_thread((pdf_cache.directory / temp_name).unlink, missing_ok=True)
+        raise
+    try:
+        if not result["success"]:
+            raise HTTPException(status_code=500, detail=result["message"])
+        return await asyncio.to_thread(pdf_cache.put, key, result["file_path"])
+    finally:
+        await asyncio.to_thread((pdf_cache.directory / temp_name).unlink, missing_ok=True)
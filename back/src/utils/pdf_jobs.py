@@ -0,0 +1,254 @@
+# back/src/utils/pdf_jobs.py
+"""
+Trabajos en segundo plano para exportar PDFs de una familia o de un asesor.
+
+- Alcance "familia": un único PDF con todos los seguimientos enviados.
+- Alcance "asesor": un ZIP con el PDF combinado de cada una de sus familias.
+
+Cada seguimiento se obtiene de la caché de reportes (get_or_render), así que
+las partes ya generadas se reutilizan; en cuanto llega, cada parte se enlaza
+en la carpeta de trabajos para que el LRU de la caché no la desaloje antes de
+unirla. El estado del trabajo se guarda en disco (con quién lo pidió y de qué
+asesor son los documentos) para que cualquier worker pueda responder a las
+consultas y comprobar permisos. Todo el acceso a disco (estado, limpieza,
+enlaces y uniones) va por asyncio.to_thread.
+
+Las partes son trabajo de fondo: si el pool de PDFs está lleno (503, por
+ejemplo mientras los usuarios descargan reportes), esperan y reintentan en
+lugar de dar el trabajo por fallido.
+"""
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from pypdf import PdfWriter
+
+from storage import storage, MAX_SEGUIMIENTOS
+from utils.pdf_cache import pdf_cache, get_or_render
+from utils.process_pool import pdf_pool
+
+JOBS_DIR = pdf_cache.directory / "jobs"
+# Tiempo que se conservan los artefactos terminados
+JOB_TTL_SECONDS = int(os.getenv("PDF_JOB_TTL", 24 * 3600))
+# Espera antes de reintentar una parte con el pool lleno: se duplica hasta el máximo
+RETRY_DELAY = float(os.getenv("PDF_JOB_RETRY_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("PDF_JOB_RETRY_MAX_DELAY", 10))
+
+# Referencias a las tareas en curso para que no las recoja el GC
+_tasks = set()
+
+
+def _status_path(job_id: str) -> Path:
+    return JOBS_DIR / f"{job_id}.json"
+
+
+def _write_status(job: Dict):
+    temp_file = JOBS_DIR / f".{job['id']}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False)
+    temp_file.replace(_status_path(job["id"]))
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """ Estado de un trabajo, o None si no existe """
+    if Path(job_id).name != job_id:
+        return None
+    try:
+        with open(_status_path(job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def artifact_path(job: Dict) -> Path:
+    return JOBS_DIR / job["filename"]
+
+
+def _cleanup_expired():
+    """ Borrar estados y artefactos de trabajos vencidos """
+    limit = time.time() - JOB_TTL_SECONDS
+    for entry in os.scandir(JOBS_DIR):
+        if entry.is_file() and entry.stat().st_mtime < limit:
+            Path(entry.path).unlink(missing_ok=True)
+
+
+def can_access(job: Dict, user: Optional[str], user_role: Optional[str]) -> bool:
+    """ El superadmin ve todos los trabajos; los demás, los que pidieron o los de sus familias """
+    if user_role == "superadmin":
+        return True
+    return user is not None and user in (job.get("requested_by"), job.get("adviser"))
+
+
+def _prepare_jobs_dir():
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    _cleanup_expired()
+
+
+async def submit(scope: str, target: str, folders: List[str], requested_by: str, adviser: str) -> Dict:
+    """
+    Registrar un trabajo de exportación y lanzarlo en segundo plano
+
+    Args:
+        scope: "familia" o "asesor"
+        target: carpeta de la familia o identificador del asesor
+        folders: carpetas de las familias a exportar
+        requested_by: usuario que lo pide
+        adviser: asesor dueño de los documentos
+
+    Returns:
+        Estado inicial del trabajo
+    """
+    await asyncio.to_thread(_prepare_jobs_dir)
+
+    job_id = uuid.uuid4().hex
+    extension = "pdf" if scope == "familia" else "zip"
+    job = {
+        "id": job_id,
+        "scope": scope,
+        "target": target,
+        "requested_by": requested_by,
+        "adviser": adviser,
+        "status": "pendiente",
+        "total": 0,
+        "done": 0,
+        "filename": f"{scope}_{target}_{job_id[:8]}.{extension}",
+        "error": None,
+        "created": datetime.now().isoformat()
+    }
+    await asyncio.to_thread(_write_status, job)
+
+    task = asyncio.create_task(_run(job, folders))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+async def _family_seguimientos(folder: str) -> List[Dict]:
+    """ Datos de los seguimientos enviados de una familia, en orden """
+    seguimientos = []
+    for i in range(1, MAX_SEGUIMIENTOS + 1):
+        data = await storage.load_seguimiento(folder, f"seguimiento_{i}")
+        if data:
+            seguimientos.append(data)
+    return seguimientos
+
+
+def _pin_part(path: Path, pinned: Path):
+    """ Enlace duro de una parte de la caché (o copia, si el sistema de archivos no los admite) """
+    try:
+        os.link(path, pinned)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(path, pinned)
+
+
+def _remove_files(paths: List[Path]):
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def _merge_pdfs(parts: List[Path], output: Path):
+    """ Unir varios PDFs en uno, escribiendo directamente a disco """
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(str(part))
+    with open(output, "wb") as f:
+        writer.write(f)
+    writer.close()
+
+
+def _write_zip(members: List[tuple], output: Path):
+    """ Empaquetar (nombre, ruta) en un ZIP; los PDFs ya van comprimidos """
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as zf:
+        for arcname, path in members:
+            zf.write(path, arcname)
+
+
+async def _run(job: Dict, folders: List[str]):
+    # Limitar las partes en vuelo al tamaño del pool para no llenar su cola
+    semaphore = asyncio.Semaphore(pdf_pool.max_workers)
+    status_lock = asyncio.Lock()
+    temp_files: List[Path] = []
+
+    async def save_status():
+        # En orden y con una copia: las partes siguen avanzando mientras se escribe
+        async with status_lock:
+            await asyncio.to_thread(_write_status, dict(job))
+
+    async def render_part(folder: str, index: int, data: Dict) -> Path:
+        pinned = JOBS_DIR / f".{job['id']}_{folder}_{index}.pdf"
+        delay = RETRY_DELAY
+        async with semaphore:
+            while True:
+                try:
+                    path = await get_or_render(data)
+                except HTTPException as e:
+                    if e.status_code != 503:
+                        raise
+                    # Pool lleno: el trabajo espera su turno en lugar de fallar
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RETRY_MAX_DELAY)
+                    continue
+                try:
+                    await asyncio.to_thread(_pin_part, path, pinned)
+                    break
+                except FileNotFoundError:
+                    # La caché la desalojó antes del enlace: se vuelve a pedir
+                    continue
+        temp_files.append(pinned)
+        job["done"] += 1
+        if job["status"] == "en_proceso":
+            await save_status()
+        return pinned
+
+    async def render_family(folder: str, seguimientos: List[Dict]) -> Optional[Path]:
+        if not seguimientos:
+            return None
+        parts = await asyncio.gather(
+            *(render_part(folder, index, data) for index, data in enumerate(seguimientos))
+        )
+        merged = JOBS_DIR / f".{job['id']}_{folder}.pdf"
+        temp_files.append(merged)
+        await asyncio.to_thread(_merge_pdfs, list(parts), merged)
+        return merged
+
+    try:
+        families = {
+            folder: await _family_seguimientos(folder) for folder in folders
+        }
+        job["status"] = "en_proceso"
+        job["total"] = sum(len(segs) for segs in families.values())
+        await save_status()
+
+        # Las familias se generan en paralelo
+        merged = await asyncio.gather(
+            *(render_family(folder, segs) for folder, segs in families.items())
+        )
+
+        output = artifact_path(job)
+        if job["scope"] == "familia":
+            if merged[0] is None:
+                raise ValueError("La familia no tiene seguimientos enviados")
+            await asyncio.to_thread(merged[0].replace, output)
+        else:
+            members = [
+                (f"{folder}.pdf", path) for folder, path in zip(families, merged) if path is not None
+            ]
+            await asyncio.to_thread(_write_zip, members, output)
+
+        job["status"] = "completado"
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = str(getattr(e, "detail", e))
+    finally:
+        await asyncio.to_thread(_remove_files, list(temp_files))
+        await save_status()
@@ -0,0 +1,93 @@
+# back/src/utils/process_pool.py
+"""
+Pool de procesos para trabajo intensivo en CPU (por ejemplo, generar PDFs).
+
+Las rutas async esperan el resultado con `await pool.run(fn, *args)` sin
+bloquear el event loop. La cola es acotada: si hay demasiados trabajos
+pendientes se responde 503, y cada trabajo tiene un tiempo máximo (504).
+Un trabajo que supera el tiempo sigue ocupando su hueco en la cola hasta que
+el proceso lo termina, así que la cota refleja los procesos realmente ocupados.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+
+class ProcessPool:
+
+    def __init__(self, name: str, max_workers: int, max_pending: int, timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls, name: str, default_timeout: float = 60) -> "ProcessPool":
+        """ Crear un pool configurado con variables de entorno {NAME}_WORKERS, etc. """
+        prefix = name.upper()
+        max_workers = int(os.getenv(f"{prefix}_WORKERS", os.cpu_count() or 1))
+        max_pending = int(os.getenv(f"{prefix}_MAX_PENDING", max_workers * 4))
+        timeout = float(os.getenv(f"{prefix}_TIMEOUT", default_timeout))
+        return cls(name, max_workers, max_pending, timeout)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Se crea al primer uso para no lanzar procesos al importar el módulo
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Ejecutar fn(*args) en un proceso del pool y esperar el resultado
+
+        Raises:
+            HTTPException 503: si la cola de trabajos pendientes está llena
+            HTTPException 504: si el trabajo supera el tiempo máximo
+        """
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503, detail="Servidor ocupado, intente nuevamente en unos segundos")
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.pending -= 1
+            raise
+        # El hueco se libera cuando el proceso termina de verdad, no al rendirse
+        # esperando: cancel() no detiene un trabajo que ya está en ejecución
+        future.add_done_callback(lambda _: self._release_threadsafe(loop))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise HTTPException(
+                status_code=504, detail=f"Tiempo de espera agotado en {self.name}")
+
+    def _release(self):
+        self.pending -= 1
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop):
+        # Los futures del pool se completan desde su hilo de gestión
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # Event loop ya cerrado (apagado del servidor)
+            self._release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pdf_pool = ProcessPool.from_env("pdf_pool")
+image_pool = ProcessPool.from_env("image_pool", default_timeout=30)
@@ -0,0 +1,206 @@
+# back/src/utils/profiling.py
+"""
+Perfilado por muestreo de peticiones concretas, bajo demanda.
+
+Un perfil se activa de dos maneras:
+- Cabecera "X-Profile: 1" enviada por un superadmin: se muestrea la petición
+  entera y la respuesta lleva "X-Profile-Id" con el nombre del perfil.
+- PROFILE_SLOW_MS > 0: si una petición sigue en curso pasado ese umbral, se
+  empieza a muestrear hasta que termine (se pierde el principio, pero se ve
+  en qué se está yendo el tiempo).
+
+Mientras dura el perfil, un hilo toma cada PROFILE_INTERVAL_MS la pila del
+bucle de eventos y de los hilos de trabajo (asyncio.to_thread y los endpoints
+síncronos). El trabajo de los pools de procesos (PDFs, miniaturas) aparece
+como espera en el bucle de eventos. Si hay otras peticiones a la vez, sus
+muestras también entran en el perfil.
+
+Cada perfil son dos archivos en PROFILE_DIR: <id>.collapsed, pilas en formato
+"colapsado" (flamegraph.pl, speedscope, inferno...), y <id>.json con la ruta,
+los parámetros y la duración. Se conservan los PROFILE_KEEP más recientes y
+solo se hace un perfil a la vez. Sin cabecera y sin umbral, el coste por
+petición es recorrer sus cabeceras.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.requests import cookie_parser
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_HEADER = b"x-profile"
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))
+
+# Hilos que se muestrean además del bucle de eventos: el ejecutor por defecto
+# de asyncio (asyncio.to_thread) y el de AnyIO (endpoints síncronos)
+WORKER_THREAD_PREFIXES = ("asyncio_", "AnyIO worker")
+
+# Un solo perfil a la vez: acota el coste y evita mezclar muestras
+_active = threading.Lock()
+
+
+def _frame_label(code, cache: Dict) -> str:
+    label = cache.get(code)
+    if label is None:
+        path = Path(code.co_filename)
+        try:
+            filename = str(path.relative_to(Path.cwd()))
+        except ValueError:
+            filename = "/".join(path.parts[-2:])
+        # El formato colapsado separa los marcos con ";"
+        label = cache[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+    return label
+
+
+class Sampler:
+    """ Hilo que acumula pilas colapsadas hasta que se llama a stop() """
+
+    def __init__(self, loop_thread: int, interval: float = PROFILE_INTERVAL):
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self._labels: Dict = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> float:
+        """ Detiene el muestreo y devuelve los segundos muestreados """
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "")
+                if ident == own:
+                    continue
+                if ident == self.loop_thread:
+                    name = "bucle de eventos"
+                elif not name.startswith(WORKER_THREAD_PREFIXES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code, self._labels))
+                    frame = frame.f_back
+                stack.append(name)
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+def _profile_id(method: str, path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:80] or "raiz"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000:06d}_{method}_{slug}"
+
+
+def _prune():
+    profiles = sorted(PROFILE_DIR.glob("*.json"), key=lambda path: path.stat().st_mtime)
+    for old in profiles[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".collapsed").unlink(missing_ok=True)
+
+
+def save_profile(profile_id: str, sampler: Sampler, meta: Dict) -> Path:
+    """ Escribe <id>.collapsed y <id>.json en PROFILE_DIR """
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    collapsed = PROFILE_DIR / f"{profile_id}.collapsed"
+    collapsed.write_text(
+        "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.most_common()), encoding="utf-8"
+    )
+    meta = {**meta, "muestras": sampler.samples, "intervalo_ms": sampler.interval * 1000}
+    (PROFILE_DIR / f"{profile_id}.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    _prune()
+    return collapsed
+
+
+def _requested_by_admin(scope: Dict) -> bool:
+    """ Cabecera X-Profile de un superadmin autenticado """
+    requested = cookies = None
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            requested = value
+        elif name == b"cookie":
+            cookies = value
+    if requested not in (b"1", b"true") or cookies is None:
+        return False
+    parsed = cookie_parser(cookies.decode("latin-1"))
+    return parsed.get("auth") == "true" and parsed.get("role") == "superadmin"
+
+
+class ProfilingMiddleware:
+    """ Middleware ASGI que perfila las peticiones pedidas por cabecera o lentas """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        on_demand = _requested_by_admin(scope)
+        if not on_demand and PROFILE_SLOW_MS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        profile_id = _profile_id(scope["method"], scope["path"])
+        sampler: Optional[Sampler] = None
+        watchdog = None
+
+        def begin():
+            nonlocal sampler
+            if _active.acquire(blocking=False):
+                sampler = Sampler(threading.get_ident()).start()
+
+        if on_demand:
+            begin()
+        else:
+            watchdog = asyncio.get_running_loop().call_later(PROFILE_SLOW_MS / 1000, begin)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and on_demand and sampler is not None:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            if sampler is not None:
+                sampled = sampler.stop()
+                _active.release()
+                route = scope.get("route")
+                meta = {
+                    "id": profile_id,
+                    "disparo": "cabecera" if on_demand else "lenta",
+                    "metodo": scope["method"],
+                    "ruta": getattr(route, "path", None),
+                    "url": scope["path"],
+                    "parametros": scope.get("path_params", {}),
+                    "query": scope.get("query_string", b"").decode("latin-1"),
+                    "duracion_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "muestreado_ms": round(sampled * 1000, 1),
+                    "fecha": time.strftime("%Y-%m-%d %H:%M:%S")
+                }
+                await asyncio.to_thread(save_profile, profile_id, sampler, meta)
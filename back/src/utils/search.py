@@ -0,0 +1,217 @@
+# back/src/utils/search.py
+"""
+Índice de texto completo (SQLite FTS5) sobre los campos narrativos de los
+seguimientos: objetivo, aspectos, avances, retos, oportunidades y las
+descripciones de los compromisos.
+
+Vive en el mismo archivo que el catálogo. FTS5 ya quita las tildes
+(unicode61 remove_diacritics 2); además cada palabra se reduce a su raíz con
+un stemmer ligero para español, tanto al indexar como al buscar, de modo que
+"educación", "educativo" y "educar" se encuentran entre sí.
+
+save_seguimiento actualiza el índice en cada guardado (con
+asyncio.to_thread, como el catálogo); init() lo crea y lo llena al arrancar
+si no existe, y para regenerarlo a mano:
+
+    python -m utils.search rebuild
+"""
+import argparse
+import re
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from storage import storage, SEGUIMIENTO_NAMES
+from utils import catalog
+
+SEARCH_FIELDS = ("objetivo", "aspectos", "avances", "retos", "oportunidades")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS busqueda (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    UNIQUE (folder, numero)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_fts USING fts5(
+    objetivo, aspectos, avances, retos, oportunidades, compromisos,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Sufijos que se quitan (el primero que coincida), de más largo a más corto
+_SUFFIXES = (
+    "amientos", "imientos", "amiento", "imiento", "aciones", "uciones", "idades",
+    "ciones", "adoras", "adores", "ancias", "encias", "amente", "mente",
+    "acion", "ucion", "cion", "ancia", "encia", "adora", "ador", "idad",
+    "ables", "ibles", "able", "ible", "istas", "ista", "ativos", "ativas", "ativo", "ativa",
+    "ivos", "ivas", "ivo", "iva",
+    "osos", "osas", "oso", "osa", "ando", "iendo", "ados", "idos", "adas", "idas",
+    "ado", "ido", "ada", "ida", "ar", "er", "ir", "es", "s",
+)
+_MIN_STEM = 3
+_WORD_RE = re.compile(r"\w+")
+
+_schema_ready = False
+
+
+def stem(word: str) -> str:
+    """ Raíz aproximada de una palabra en español (ya en minúsculas y sin tildes) """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > _MIN_STEM and word[-1] in "aeo":
+        word = word[:-1]
+    return word
+
+
+def _terms(text: str) -> List[str]:
+    return [stem(word) for word in _WORD_RE.findall(catalog.normalize_text(text))]
+
+
+def _stemmed(text: Optional[str]) -> str:
+    return " ".join(_terms(text or ""))
+
+
+def _create_schema() -> bool:
+    """ Crea las tablas si faltan; True si no existían """
+    global _schema_ready
+    with catalog.connect() as conn:
+        is_new = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'busqueda_fts'"
+        ).fetchone() is None
+        conn.executescript(_SCHEMA)
+    _schema_ready = True
+    return is_new
+
+
+def _ensure_schema():
+    if not _schema_ready:
+        _create_schema()
+
+
+def init() -> bool:
+    """
+    Prepara el índice al arrancar: lo crea y, si es nuevo, lo llena
+
+    Returns:
+        True si se regeneró
+    """
+    is_new = _create_schema()
+    if is_new:
+        rebuild()
+    return is_new
+
+
+def _write(conn, folder: str, numero: int, data: Dict):
+    conn.execute(
+        "INSERT INTO busqueda (folder, numero) VALUES (?, ?) ON CONFLICT DO NOTHING", (folder, numero)
+    )
+    (doc_id,) = conn.execute(
+        "SELECT id FROM busqueda WHERE folder = ? AND numero = ?", (folder, numero)
+    ).fetchone()
+    conn.execute("DELETE FROM busqueda_fts WHERE rowid = ?", (doc_id,))
+    compromisos = " ".join(c.get("descripcion", "") for c in data.get("compromisos") or [])
+    conn.execute(
+        "INSERT INTO busqueda_fts (rowid, objetivo, aspectos, avances, retos, oportunidades, compromisos) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (doc_id, *(_stemmed(data.get(field)) for field in SEARCH_FIELDS), _stemmed(compromisos))
+    )
+
+
+def index_seguimiento(folder: str, numero: int, data: Dict):
+    """ Indexa (o reindexa) un seguimiento recién guardado """
+    _ensure_schema()
+    with catalog.connect() as conn:
+        _write(conn, folder, numero, data)
+
+
+def remove_family(folder: str):
+    """ Quita del índice todos los seguimientos de una familia """
+    _ensure_schema()
+    with catalog.connect() as conn:
+        conn.execute(
+            "DELETE FROM busqueda_fts WHERE rowid IN (SELECT id FROM busqueda WHERE folder = ?)", (folder,)
+        )
+        conn.execute("DELETE FROM busqueda WHERE folder = ?", (folder,))
+
+
+def search(query: str, adviser: Optional[str] = None, limit: int = 20) -> List[Dict]:
+    """
+    Busca seguimientos por su texto, ordenados por relevancia (bm25)
+
+    Args:
+        query: palabras a buscar; todas deben aparecer (por prefijo de su raíz)
+        adviser: si se indica, solo familias de ese asesor
+        limit: número máximo de resultados
+
+    Returns:
+        Lista de resultados con familia, seguimiento y puntuación
+    """
+    terms = [term for term in _terms(query) if term]
+    if not terms:
+        raise HTTPException(status_code=400, detail="La búsqueda está vacía")
+    match = " ".join(f'"{term}"*' for term in terms)
+
+    _ensure_schema()
+    sql = (
+        "SELECT b.folder, f.doc_number, f.adviser, f.apellido, b.numero, bm25(busqueda_fts) AS score "
+        "FROM busqueda_fts JOIN busqueda b ON b.id = busqueda_fts.rowid "
+        "JOIN familias f ON f.folder = b.folder "
+        "WHERE busqueda_fts MATCH ? "
+    )
+    params: list = [match]
+    if adviser is not None:
+        sql += "AND f.adviser = ? "
+        params.append(adviser)
+    sql += "ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    with catalog.connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [
+        {
+            "folder": folder,
+            "doc_number": doc_number,
+            "doc_adviser": doc_adviser,
+            "apellido": apellido,
+            "seguimiento": f"seguimiento_{numero}",
+            "numero": str(numero),
+            # bm25 es negativo: cuanto menor, más relevante
+            "score": round(-score, 4)
+        }
+        for folder, doc_number, doc_adviser, apellido, numero, score in rows
+    ]
+
+
+def rebuild() -> int:
+    """
+    Regenera el índice completo leyendo todos los seguimientos
+
+    Returns:
+        Número de seguimientos indexados
+    """
+    backend = storage.backend
+    total = 0
+    with catalog.connect() as conn:
+        conn.executescript(_SCHEMA)
+        conn.execute("DELETE FROM busqueda_fts")
+        conn.execute("DELETE FROM busqueda")
+        for folder in backend.list_families():
+            for seguimiento in backend.seguimientos_with_data(folder):
+                data = backend.load_seguimiento(folder, seguimiento)
+                if seguimiento in SEGUIMIENTO_NAMES and data:
+                    _write(conn, folder, int(seguimiento.replace("seguimiento_", "")), data)
+                    total += 1
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de búsqueda de seguimientos")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        total = rebuild()
+        print(f"Índice regenerado: {total} seguimientos")
@@ -0,0 +1,179 @@
+# back/src/utils/staging.py
+"""
+Recepción de guardados multipart (datos del seguimiento + imágenes).
+
+El cuerpo se lee en streaming con python-multipart: el campo "data" (JSON de
+SeguimientoData) se valida en cuanto termina de llegar, y cada archivo del
+campo "files" se escribe directamente en una carpeta propia de la petición
+dentro de storage.staging_path, sin pasar por memoria ni por los temporales
+de Starlette. Con todo recibido y validado, la ruta confirma con
+storage.commit_seguimiento; al salir, la carpeta de staging se borra pase lo
+que pase. Las carpetas que deje un proceso muerto se borran pasadas
+STAGING_MAX_AGE segundos, en el siguiente guardado.
+"""
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, List, Optional, Tuple
+
+import python_multipart
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+from storage import storage
+
+DATA_FIELD = "data"
+FILES_FIELD = "files"
+MAX_DATA_BYTES = int(os.getenv("STAGING_MAX_DATA_BYTES", 1024 * 1024))
+MAX_FILE_BYTES = int(float(os.getenv("STAGING_MAX_FILE_MB", 25)) * 1024 * 1024)
+STAGING_MAX_AGE = float(os.getenv("STAGING_MAX_AGE", 3600))
+
+
+class StagedSave:
+    """ Lo recibido en un guardado multipart """
+
+    def __init__(self, directory: Path, validate: Callable[[bytes], Any]):
+        self.directory = directory
+        self.validate = validate
+        self.data: Any = None
+        # (nombre original, archivo en staging), en el orden recibido
+        self.images: List[Tuple[str, Path]] = []
+        # Parte en curso
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._field: Optional[bytes] = None
+        self._buffer = bytearray()
+        self._file: Optional[BinaryIO] = None
+        self._size = 0
+
+    # Callbacks de python_multipart.MultipartParser (en el hilo de parse)
+    def on_part_begin(self):
+        self._disposition = b""
+        self._field = None
+        self._buffer = bytearray()
+        self._size = 0
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        self._field = options.get(b"name")
+        filename = options.get(b"filename")
+        if self._field == FILES_FIELD.encode():
+            # Un input de archivo vacío llega sin filename y se ignora
+            if filename:
+                # Nombre en staging propio: el original se comprueba al confirmar
+                name = filename.decode("utf-8", errors="replace")
+                path = self.directory / f"{len(self.images):04d}"
+                self.images.append((name, path))
+                self._file = open(path, "wb")
+        elif self._field != DATA_FIELD.encode():
+            raise HTTPException(status_code=400, detail="Campo no esperado en el formulario")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self._size += end - start
+        if self._file is not None:
+            if self._size > MAX_FILE_BYTES:
+                raise HTTPException(status_code=413, detail="Imagen demasiado grande")
+            self._file.write(data[start:end])
+        else:
+            if self._size > MAX_DATA_BYTES:
+                raise HTTPException(status_code=413, detail="Datos del seguimiento demasiado grandes")
+            self._buffer += data[start:end]
+
+    def on_part_end(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        elif self._field == DATA_FIELD.encode():
+            # Se valida ya: si los datos no sirven, no se escriben las imágenes que vengan detrás
+            self.data = self.validate(bytes(self._buffer))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _purge_stale(root: Path):
+    """ Borra carpetas de staging abandonadas (proceso muerto a mitad de un guardado) """
+    limit = time.time() - STAGING_MAX_AGE
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < limit:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            continue
+
+
+def _open_directory() -> Path:
+    root = storage.staging_path
+    _purge_stale(root)
+    directory = root / uuid.uuid4().hex
+    directory.mkdir(parents=True)
+    return directory
+
+
+@asynccontextmanager
+async def receive(request: Request, validate: Callable[[bytes], Any]):
+    """
+    Lee el cuerpo multipart de la petición en una carpeta de staging
+
+    Args:
+        validate: recibe el JSON del campo "data" y devuelve los datos validados
+
+    Raises:
+        HTTPException: 400 si no es multipart, está mal formado o falta "data";
+            413 si algo excede los límites
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Se esperaba multipart/form-data")
+
+    directory = await asyncio.to_thread(_open_directory)
+    staged = StagedSave(directory, validate)
+    parser = python_multipart.MultipartParser(boundary, {
+        "on_part_begin": staged.on_part_begin,
+        "on_part_data": staged.on_part_data,
+        "on_part_end": staged.on_part_end,
+        "on_header_field": staged.on_header_field,
+        "on_header_value": staged.on_header_value,
+        "on_header_end": staged.on_header_end,
+        "on_headers_finished": staged.on_headers_finished,
+    })
+    try:
+        # Parse y escritura en disco fuera del event loop, trozo a trozo
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await asyncio.to_thread(parser.write, chunk)
+            await asyncio.to_thread(parser.finalize)
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Formulario multipart mal formado")
+        if staged.data is None:
+            raise HTTPException(status_code=400, detail="Faltan los datos del seguimiento")
+        yield staged
+    finally:
+        staged.close()
+        await asyncio.to_thread(shutil.rmtree, directory, True)
@@ -0,0 +1,187 @@
+# back/src/utils/thumbnails.py
+"""
+Variantes reducidas (miniatura y mediana) de las imágenes de un seguimiento.
+
+Se generan bajo demanda en el pool de procesos y se guardan en
+seguimiento_k/miniaturas/, junto a imagenes/. El nombre de cada variante
+incluye la versión del original (mtime y tamaño), de modo que al reemplazar
+la imagen la variante anterior deja de usarse y se borra.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+
+from utils.process_pool import image_pool
+
+VARIANTS_DIRNAME = "miniaturas"
+MANIFEST_FILENAME = "manifest.json"
+# Anchos permitidos; cualquier ?w= se ajusta al más cercano por arriba
+VARIANT_WIDTHS = (256, 1024)
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+
+
+def snap_width(width: int) -> int:
+    """ Ajustar el ancho pedido a una de las variantes disponibles """
+    for allowed in VARIANT_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return VARIANT_WIDTHS[-1]
+
+
+def image_version(stat: os.stat_result) -> str:
+    """ Identificador corto que cambia cuando cambia el archivo original """
+    return f"{stat.st_mtime_ns:x}{stat.st_size:x}"
+
+
+def choose_format(accept: Optional[str]) -> str:
+    """ WebP si el cliente lo acepta; JPEG en caso contrario """
+    return "webp" if accept and "image/webp" in accept else "jpeg"
+
+
+def variant_path(original: Path, width: int, fmt: str, version: str) -> Path:
+    variants_dir = original.parent.parent / VARIANTS_DIRNAME
+    extension = "webp" if fmt == "webp" else "jpg"
+    return variants_dir / f"{original.name}.{width}.{version}.{extension}"
+
+
+def render_variant(source: str, destination: str, width: int, fmt: str) -> str:
+    """ Generar una variante (se ejecuta en el pool de procesos) """
+    destination_path = Path(destination)
+    destination_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((width, width * 4))
+
+        temp_path = destination_path.with_name(f".{destination_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        if fmt == "webp":
+            img.save(temp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(temp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(temp_path, destination_path)
+
+    # Borrar variantes de versiones anteriores del mismo original y ancho
+    prefix = f"{Path(source).name}.{width}."
+    current = f"{prefix}{image_version(os.stat(source))}."
+    for old in destination_path.parent.iterdir():
+        if old.name.startswith(prefix) and not old.name.startswith(current):
+            old.unlink(missing_ok=True)
+    return destination
+
+
+def _existing_variant(original: Path, width: int, fmt: str) -> Tuple[Path, bool]:
+    version = image_version(original.stat())
+    path = variant_path(original, width, fmt, version)
+    return path, path.exists()
+
+
+async def get_variant(original: Path, width: int, fmt: str) -> Path:
+    """
+    Ruta de la variante del original, generándola si aún no existe
+
+    Args:
+        original: ruta de la imagen en imagenes/
+        width: ancho ya ajustado con snap_width
+        fmt: "webp" o "jpeg"
+    """
+    path, exists = await asyncio.to_thread(_existing_variant, original, width, fmt)
+    if exists:
+        return path
+
+    await image_pool.run(render_variant, str(original), str(path), width, fmt)
+    return path
+
+def probe_image(source: str) -> dict:
+    """ Dimensiones y hash de contenido de un original (se ejecuta en el pool) """
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    with Image.open(source) as img:
+        width, height = ImageOps.exif_transpose(img).size
+    return {"width": width, "height": height, "sha256": digest.hexdigest()}
+
+
+def _load_manifest_cache(variants_dir: Path) -> dict:
+    try:
+        with open(variants_dir / MANIFEST_FILENAME, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_manifest_cache(variants_dir: Path, cache: dict):
+    variants_dir.mkdir(parents=True, exist_ok=True)
+    temp_file = variants_dir / f".{MANIFEST_FILENAME}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(temp_file, variants_dir / MANIFEST_FILENAME)
+
+
+def _stat_images(paths: List[Path], variants_dir: Path) -> Tuple[List[dict], dict]:
+    images = []
+    for path in sorted(paths, key=lambda p: p.name):
+        stat = path.stat()
+        images.append({"name": path.name, "size": stat.st_size, "version": image_version(stat)})
+    return images, _load_manifest_cache(variants_dir)
+
+
+async def describe_images(paths: List[Path]) -> List[dict]:
+    """
+    Metadatos de las imágenes (originales) de un seguimiento
+
+    Las dimensiones y el hash se calculan una sola vez por versión del
+    original y se guardan en miniaturas/manifest.json.
+
+    Returns:
+        Lista de dicts con name, size, version, width, height y sha256
+    """
+    if not paths:
+        return []
+
+    variants_dir = paths[0].parent.parent / VARIANTS_DIRNAME
+    images, cache = await asyncio.to_thread(_stat_images, paths, variants_dir)
+    by_name = {path.name: path for path in paths}
+
+    missing = [
+        img for img in images
+        if cache.get(img["name"], {}).get("version") != img["version"]
+    ]
+    if missing:
+        # Limitar las sondas en vuelo al tamaño del pool para no llenar su cola
+        semaphore = asyncio.Semaphore(image_pool.max_workers)
+
+        async def probe(img: dict) -> dict:
+            async with semaphore:
+                return await image_pool.run(probe_image, str(by_name[img["name"]]))
+
+        probes = await asyncio.gather(*(probe(img) for img in missing), return_exceptions=True)
+        for img, result in zip(missing, probes):
+            if isinstance(result, HTTPException):
+                # Pool saturado (503) o tiempo agotado (504): no se guarda y se
+                # vuelve a intentar en la próxima petición
+                continue
+            if isinstance(result, Exception):
+                # El archivo no se puede leer como imagen: no cambiará hasta que se reemplace
+                result = {"width": None, "height": None, "sha256": None}
+            cache[img["name"]] = {"version": img["version"], **result}
+        # Olvidar imágenes que ya no existen
+        cache = {name: meta for name, meta in cache.items() if name in by_name}
+        await asyncio.to_thread(_save_manifest_cache, variants_dir, cache)
+
+    for img in images:
+        meta = cache.get(img["name"])
+        if meta is None or meta["version"] != img["version"]:
+            meta = {"width": None, "height": None, "sha256": None}
+        img.update(width=meta["width"], height=meta["height"], sha256=meta["sha256"])
+    return images
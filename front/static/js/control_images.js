@@ -143,29 +143,16 @@ class MultiImageUpload {
         this.updateUI();
     }
 
-    async loadImagesFromBackend(folderName, trackingName, imagesList, endpointGetImage) {
+    async loadImagesFromBackend(folderName, trackingName) {
         try {
-            const imagesNames = imagesList.split(',');
-
-            // Cargar cada imagen
-            const loadPromises = imagesNames.map(imageName =>
-                this.loadSingleImageFromBackend(folderName, trackingName, imageName, endpointGetImage)
-            );
-
-            const results = await Promise.allSettled(loadPromises);
-
-            // Procesar resultados
-            const successCount = results.filter(result => result.status === 'fulfilled').length;
-            const errorCount = results.filter(result => result.status === 'rejected').length;
-
-            if (successCount > 0) {
-                this.updateUI();
-                this.showSuccess(`${successCount} imagen(es) cargada(s) desde el servidor`);
+            // Un solo pedido con el manifiesto del seguimiento (miniaturas incluidas)
+            const response = await fetch(`/seguimientos/image-manifest/${folderName}/${trackingName}?inline=true`);
+            if (!response.ok) {
+                throw new Error(`Error al cargar el manifiesto de imágenes: ${response.status}`);
             }
 
-            if (errorCount > 0) {
-                console.warn(`${errorCount} imágenes no pudieron cargarse`);
-            }
+            const manifest = await response.json();
+            this.loadImagesFromManifest(manifest.imagenes);
 
         } catch (error) {
             console.error('Error al cargar imágenes desde backend:', error);
@@ -173,58 +160,28 @@ class MultiImageUpload {
         }
     }
 
-    async loadSingleImageFromBackend(folderName, trackingName, imageName, endpointGetImage) {
-        try {
+    loadImagesFromManifest(imagenes) {
+        this.images = [];
+        this.imagesGrid.innerHTML = '';
 
-            if (!imageName) {
-                this.images = [];
-                this.imagesGrid.innerHTML = '';
-                this.updateUI();
-            }else {
-                this.images = [];
-                this.imagesGrid.innerHTML = '';
-
-                // const imageUrl = `${endpointGetImage}/seguimientos/${folderName}/${trackingName}/${imageName}`;
-
-                const imageUrl = `/seguimientos${endpointGetImage}/${folderName}/${trackingName}/${imageName}`;
-
-                const response = await fetch(imageUrl);
-                if (!response.ok) {
-                    throw new Error(`Error al cargar imagen ${imageName}: ${response.status}`);
-                }
-
-                const blob = await response.blob();
-
-                // Verificar que sea una imagen válida
-                if (!blob.type.startsWith('image/')) {
-                    throw new Error(`El archivo ${imageName} no es una imagen válida`);
-                }
-
-                // Crear objeto de imagen para el backend
-                const imageData = {
-                    id: Date.now() + Math.random(),
-                    file: null, // Las imágenes del backend no tienen file object
-                    name: imageName,
-                    size: blob.size,
-                    url: URL.createObjectURL(blob),
-                    // isFromBackend: true,
-                    // blob: blob // Guardamos el blob para uso posterior
-                };
-
-                // Verificar si ya existe
-                const existingImage = this.images.find(img =>
-                    img.name === imageName && img.isFromBackend
-                );
-
-                if (!existingImage) {
-                    this.images.push(imageData);
-                    this.renderImageCard(imageData);
-                }
-
-                return imageData;
-            }
-        } catch (error) {
-            throw error;
+        imagenes.forEach(imagen => {
+            // Las imágenes del backend no tienen file object
+            const imageData = {
+                id: Date.now() + Math.random(),
+                file: null,
+                name: imagen.name,
+                size: imagen.size,
+                url: imagen.thumbnail || imagen.thumbnail_url,
+                fullUrl: imagen.url
+            };
+
+            this.images.push(imageData);
+            this.renderImageCard(imageData);
+        });
+
+        this.updateUI();
+        if (imagenes.length > 0) {
+            this.showSuccess(`${imagenes.length} imagen(es) cargada(s) desde el servidor`);
         }
     }
 
@@ -265,7 +222,7 @@ class MultiImageUpload {
     viewImage(id) {
         const image = this.images.find(img => img.id == id);
         if (image) {
-            this.modalImage.src = image.url;
+            this.modalImage.src = image.fullUrl || image.url;
             this.modal.style.display = 'block';
         }
     }
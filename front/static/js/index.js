@@ -4,28 +4,38 @@ let currentasviserId = null;
 let currentSeguimiento = 1;
 const MAX_SEGUIMIENTOS = 8; // Número total de seguimientos
 
+// Familia abierta: sus seguimientos, cargados de una sola vez
+let currentFamily = null;
+
+// Funcion para traer la familia completa (datos, imágenes y comentarios de cada seguimiento)
+async function loadFamily(familyId, adviserId) {
+  const folder = `documento_${familyId}_${adviserId}`;
+  if (currentFamily && currentFamily.folder === folder) {
+    return currentFamily;
+  }
+
+  const response = await fetch(`/seguimientos/family/${folder}`);
+  if (!response.ok) {
+    throw new Error(`Error al cargar la familia ${familyId}`);
+  }
+  currentFamily = await response.json();
+  return currentFamily;
+}
+
 // Funcion para cargar el formulario con datos
 async function loadSeguimiento(familyId, adviserId) {
   try {
-    const response = await fetch(`/seguimientos/get-seguimiento/documento_${familyId}_${adviserId}/seguimiento_${currentSeguimiento}`);
-    if (!response.ok) {
-      throw new Error(!response.ok ? `Error al cargar el seguimiento ${currentSeguimiento}` : 'Error de red');
-    }
+    // Moverse entre seguimientos no pide nada al servidor
+    const family = await loadFamily(familyId, adviserId);
+    const seguimiento = family.seguimientos[currentSeguimiento - 1];
 
-    const data = await response.json();
-
-    updateFormWithData(data);
+    updateFormWithData(seguimiento.datos);
     updateProgressIndicator();
     updateFormTitle();
 
-    // Cargar las imágenes asociadas
+    // Imágenes asociadas, desde el manifiesto que trae la familia
     if (imageUploader) {
-      await imageUploader.loadImagesFromBackend(
-        `documento_${familyId}_${adviserId}`,
-        `seguimiento_${currentSeguimiento}`,
-        `${data.imagenes}`,
-        '/image'           
-      );
+      imageUploader.loadImagesFromManifest(seguimiento.imagenes);
     }
   } catch (error) {
     Swal.fire({
@@ -53,6 +63,7 @@ function toggleFollowUps(familyId, adviser) {
   if (!isActive) {
     followUpList.classList.add('active');
     document.querySelector('.form-container').style.display = 'block'; // Mostrar el formulario
+    currentFamily = null; // Al abrir una familia se trae de nuevo (con ETag suele ser un 304)
     loadSeguimiento(familyId, adviser); // Cargar
   }
 }
@@ -126,74 +137,41 @@ async function saveAndContinue() {
 
   try {
     const formData = collectFormData();
+    const imagesToUpload = imageUploader.getImages();
 
-    // 1. Enviar datos del formulario
-    const response = await fetch(`/seguimientos/save-seguimiento/documento_${currentDocId}_${currentasviserId}/seguimiento_${currentSeguimiento}`, {
+    // Datos e imágenes en una sola petición: se guarda todo o nada
+    const body = new FormData();
+    body.append('data', JSON.stringify(formData));
+    imagesToUpload.forEach(file => body.append('files', file));
+
+    const response = await fetch(`/seguimientos/save-seguimiento-with-files/documento_${currentDocId}_${currentasviserId}/seguimiento_${currentSeguimiento}`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'credentials': 'include',
-      },
-      body: JSON.stringify(formData)
+      credentials: 'include',
+      body
     });
 
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
-      throw new Error(errorData.message || 'Error al guardar los datos del seguimiento');
+      const detail = typeof errorData.detail === 'string' ? errorData.detail : null;
+      throw new Error(detail || errorData.message || 'Error al guardar los datos del seguimiento');
     }
 
-    // 2. Enviar imágenes usando el imageUploader
-    const imagesToUpload = imageUploader.getImages();
+    const result = await response.json();
+    // Lo guardado cambia la familia: se vuelve a pedir al cargar el siguiente
+    currentFamily = null;
 
-    if (imagesToUpload.length > 0) {
+    if (result.files.length > 0) {
+      imageUploader.images = [];
+      imageUploader.imagesGrid.innerHTML = '';
 
-      const formDataImages = new FormData();
-      imagesToUpload.forEach((file, index) => {
-        formDataImages.append('files', file);
-        console.log(`Añadida imagen ${index + 1}: ${file.name} (${file.size} bytes)`);
+      Swal.fire({
+        icon: 'success',
+        title: '¡Datos guardados!',
+        text: `Seguimiento ${currentSeguimiento} guardado correctamente. Se han subido ${result.files.length} imágenes.`,
+        confirmButtonText: 'Aceptar'
       });
-
-      try {
-        const uploadResponse = await fetch(`/seguimientos/upload-file/${currentDocId}_${currentasviserId}/${currentSeguimiento}`, {
-          method: 'POST',
-          credentials: 'include',
-          body: formDataImages
-        });
-
-
-        if (!uploadResponse.ok) {
-          const uploadError = await uploadResponse.json().catch(() => ({}));
-          throw new Error(uploadError.message || 'Error al subir las imágenes');
-        }
-
-        const uploadResult = await uploadResponse.json();
-
-        imageUploader.images = [];
-        imageUploader.imagesGrid.innerHTML = '';
-        // imageUploader.updateUI();
-
-        Swal.fire({
-          icon: 'success',
-          title: '¡Datos guardados!',
-          text: `Seguimiento ${currentSeguimiento} guardado correctamente. Se han subido ${uploadResult.files.length} imágenes.`,
-          confirmButtonText: 'Aceptar'
-        });
-
-      } catch (uploadError) {
-        console.error("Error al subir imágenes:", uploadError);
-        Swal.fire({
-          icon: 'error',
-          title: 'Error con las imágenes',
-          text: 'Los datos se guardaron pero hubo un problema subiendo las imágenes: ' + uploadError.message,
-          confirmButtonText: 'Aceptar'
-        });
-      }
-    } else {
-      console.log("No hay imágenes para subir");
     }
 
-    const result = await response.json();
-
     // Manejar siguiente seguimiento
     if (result.next_seguimiento) {
       currentSeguimiento = result.next_seguimiento;
@@ -241,14 +219,19 @@ async function deleteFamily(familyId, adviserId) {
         const errorData = await response.json().catch(() => ({}));
         throw new Error(errorData.message || 'Error al eliminar la familia');
       } 
-      Swal.fire({
+      const { trash_id: trashId } = await response.json();
+      const { isDenied: undo } = await Swal.fire({
         icon: 'success',
         title: 'Familia eliminada',
-        text: 'Todos los seguimientos y datos asociados han sido eliminados correctamente.',
+        text: 'La familia se movió a la papelera; todavía puedes deshacer la eliminación.',
+        showDenyButton: true,
+        denyButtonText: 'Deshacer',
         confirmButtonText: 'Aceptar'
-      }).then(() => {
-        window.location.reload(); // Recargar la página para reflejar los cambios
       });
+      if (undo) {
+        await restoreFamily(trashId);
+      }
+      window.location.reload(); // Recargar la página para reflejar los cambios
     } catch (error) {
       Swal.fire({
         icon: 'error',
@@ -260,6 +243,21 @@ async function deleteFamily(familyId, adviserId) {
   }
 }
 
+async function restoreFamily(trashId) {
+  const response = await fetch(`/seguimientos/restore-document/${encodeURIComponent(trashId)}`, {
+    method: 'POST',
+    credentials: 'include'
+  });
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    await Swal.fire({
+      icon: 'error',
+      title: 'Error al restaurar',
+      text: errorData.detail || 'No se pudo restaurar la familia.',
+      confirmButtonText: 'Aceptar'
+    });
+  }
+}
 
 // Funcion para cargar seguimiento de listado
 function loadFollowUpList(familyId, adviserId, seguimiento) {
@@ -443,11 +441,85 @@ async function Download_pdf (familyId, adviserId, seguiId) {
   }
 }
 
+// Listado de familias por páginas
+let familiesCursor = null;
+let familiesLoading = false;
+let familiesRequest = 0;
+
+function familyFilters() {
+  const params = new URLSearchParams();
+  const apellido = document.getElementById('filterApellido').value.trim();
+  const estado = document.getElementById('filterEstado').value;
+  const adviser = document.getElementById('filterAdviser');
+  if (apellido) params.set('apellido', apellido);
+  if (estado) params.set('estado', estado);
+  if (adviser && adviser.value.trim()) params.set('adviser', adviser.value.trim());
+  params.set('sort', document.getElementById('filterSort').value);
+  return params;
+}
+
+async function loadFamiliesPage(reset = false) {
+  if (familiesLoading && !reset) return;
+  if (!reset && !familiesCursor) return;
+
+  const list = document.getElementById('familyList');
+  const loadMore = document.getElementById('loadMoreFamilies');
+  const params = familyFilters();
+  if (!reset) params.set('cursor', familiesCursor);
+
+  // Si cambian los filtros mientras llega una página, se descarta la respuesta vieja
+  const request = ++familiesRequest;
+  familiesLoading = true;
+  try {
+    const response = await fetch(`/seguimientos/api/families/cards?${params}`);
+    if (!response.ok) throw new Error('Error al cargar las familias');
+    const html = await response.text();
+    if (request !== familiesRequest) return;
+
+    if (reset) list.innerHTML = '';
+    list.insertAdjacentHTML('beforeend', html);
+    familiesCursor = response.headers.get('X-Next-Cursor');
+    loadMore.hidden = !familiesCursor;
+  } catch (error) {
+    console.error(error);
+  } finally {
+    if (request === familiesRequest) familiesLoading = false;
+  }
+}
+
+function setupFamilyList() {
+  const list = document.getElementById('familyList');
+  const loadMore = document.getElementById('loadMoreFamilies');
+  familiesCursor = list.dataset.nextCursor || null;
+
+  loadMore.addEventListener('click', () => loadFamiliesPage());
+  // Cargar la siguiente página al acercarse al final de la lista
+  if ('IntersectionObserver' in window) {
+    new IntersectionObserver(entries => {
+      if (entries.some(entry => entry.isIntersecting)) loadFamiliesPage();
+    }, { rootMargin: '200px' }).observe(loadMore);
+  }
+
+  let debounce = null;
+  const reload = () => {
+    clearTimeout(debounce);
+    debounce = setTimeout(() => loadFamiliesPage(true), 300);
+  };
+  ['filterApellido', 'filterAdviser'].forEach(id => {
+    const input = document.getElementById(id);
+    if (input) input.addEventListener('input', reload);
+  });
+  ['filterEstado', 'filterSort'].forEach(id => {
+    document.getElementById(id).addEventListener('change', () => loadFamiliesPage(true));
+  });
+}
+
 // Inicialización al cargar la página
 document.addEventListener('DOMContentLoaded', () => {
   // Configurar botones
   document.querySelector('.btn-primary').addEventListener('click', saveAndContinue);
   document.querySelector('.btn-secondary').addEventListener('click', goBack);
+  setupFamilyList();
 });
 
 // Función para regresar